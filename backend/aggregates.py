@@ -0,0 +1,147 @@
+"""
+Portfolio KPI aggregates for Al Fozan Insights Platform
+The project_kpis row and the project_cube cells are adjusted by delta
+triggers whenever a project is inserted, updated or deleted, so reading the
+KPIs or a breakdown costs the same no matter how many projects exist
+"""
+
+import math
+
+KPI_COLUMNS = ('total_projects', 'total_revenue', 'total_units', 'total_units_sold')
+
+CUBE_DIMENSIONS = ('location', 'type', 'status')
+CUBE_MEASURES = ('project_count', 'units', 'units_sold', 'budget', 'revenue')
+
+CUBE_RECOMPUTE_SQL = """
+    SELECT location, type, status, COUNT(*), SUM(units), COALESCE(SUM(units_sold), 0),
+           SUM(budget), SUM(budget * COALESCE(progress, 0) / 100.0)
+    FROM projects
+    GROUP BY location, type, status
+"""
+
+RECOMPUTE_SQL = """
+    SELECT COUNT(*),
+           COALESCE(SUM(budget * COALESCE(progress, 0) / 100.0), 0),
+           COALESCE(SUM(units), 0),
+           COALESCE(SUM(units_sold), 0)
+    FROM projects
+"""
+
+# Revenue is accumulated in floating point, allow for rounding drift
+REVENUE_REL_TOLERANCE = 1e-9
+
+
+def with_sales_rate(kpis):
+    """Add the derived sales_rate percentage to a KPI dict"""
+    total_units = kpis['total_units']
+    kpis['sales_rate'] = (kpis['total_units_sold'] / total_units * 100) if total_units > 0 else 0
+    return kpis
+
+
+def get_kpis(conn):
+    """Read the maintained KPI totals"""
+    row = conn.execute(f"SELECT {', '.join(KPI_COLUMNS)} FROM project_kpis WHERE id = 1").fetchone()
+    if row is None:
+        return rebuild_kpis(conn)
+    return with_sales_rate(dict(zip(KPI_COLUMNS, row)))
+
+
+def compute_kpis(conn):
+    """Compute the KPI totals from scratch with a full scan of projects"""
+    row = conn.execute(RECOMPUTE_SQL).fetchone()
+    return with_sales_rate(dict(zip(KPI_COLUMNS, row)))
+
+
+def rebuild_kpis(conn):
+    """Recompute the KPI totals and store them"""
+    with conn:
+        conn.execute(f"""
+            INSERT OR REPLACE INTO project_kpis (id, {', '.join(KPI_COLUMNS)})
+            SELECT 1, * FROM ({RECOMPUTE_SQL})
+        """)
+    return get_kpis(conn)
+
+
+def check_kpis(conn, repair=False):
+    """Compare the maintained totals with a full recomputation
+
+    Returns a dict of {column: (stored, actual)} for every column that
+    differs; with repair=True the totals are rebuilt when a difference is found.
+    """
+    stored = get_kpis(conn)
+    actual = compute_kpis(conn)
+
+    mismatches = {}
+    for column in KPI_COLUMNS:
+        if column == 'total_revenue':
+            matches = math.isclose(stored[column], actual[column], rel_tol=REVENUE_REL_TOLERANCE, abs_tol=0.01)
+        else:
+            matches = stored[column] == actual[column]
+        if not matches:
+            mismatches[column] = (stored[column], actual[column])
+
+    if mismatches and repair:
+        rebuild_kpis(conn)
+    return mismatches
+
+
+def query_cube(conn, group_by=(), filters=None):
+    """Roll the cube up to `group_by` dimensions, restricted to equality `filters`
+
+    Returns one dict per group with the summed measures and the derived
+    sales_rate, largest project count first.
+    """
+    filters = filters or {}
+    unknown = (set(group_by) | set(filters)) - set(CUBE_DIMENSIONS)
+    if unknown:
+        raise ValueError(f"Unknown cube dimensions: {', '.join(sorted(unknown))}")
+
+    group_by = list(dict.fromkeys(group_by))
+    measures = ', '.join(f'SUM({m}) AS {m}' for m in CUBE_MEASURES)
+    select = ', '.join([*group_by, measures])
+    where = ' AND '.join(f'{d} = ?' for d in filters) or '1'
+    group = f"GROUP BY {', '.join(group_by)}" if group_by else ''
+    rows = conn.execute(
+        f'SELECT {select} FROM project_cube WHERE {where} {group} ORDER BY project_count DESC',
+        tuple(filters.values())
+    ).fetchall()
+
+    cells = []
+    for row in rows:
+        cell = dict(row)
+        if cell['project_count'] is None:
+            continue
+        units = cell['units']
+        cell['sales_rate'] = round(cell['units_sold'] * 100.0 / units, 1) if units else 0
+        cells.append(cell)
+    return cells
+
+
+def rebuild_cube(conn):
+    """Recompute every cube cell from the projects table"""
+    with conn:
+        conn.execute('DELETE FROM project_cube')
+        conn.execute(f'INSERT INTO project_cube {CUBE_RECOMPUTE_SQL}')
+
+
+def check_cube(conn, repair=False):
+    """Compare the cube with a full GROUP BY over projects
+
+    Returns the (location, type, status) keys of the cells that differ;
+    with repair=True the cube is rebuilt when any do.
+    """
+    # Values are (project_count, units, units_sold, budget, revenue): the counts
+    # must match exactly, the sums of floats within a tolerance
+    stored = {tuple(row[:3]): tuple(row[3:]) for row in conn.execute('SELECT * FROM project_cube')}
+    actual = {tuple(row[:3]): tuple(row[3:]) for row in conn.execute(CUBE_RECOMPUTE_SQL)}
+
+    mismatches = []
+    for key in stored.keys() | actual.keys():
+        a, b = stored.get(key), actual.get(key)
+        if a is None or b is None or a[:3] != b[:3] or not all(
+                math.isclose(x, y, rel_tol=REVENUE_REL_TOLERANCE, abs_tol=0.01) for x, y in zip(a[3:], b[3:])):
+            mismatches.append(key)
+
+    if mismatches and repair:
+        rebuild_cube(conn)
+    return sorted(mismatches)
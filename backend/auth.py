@@ -0,0 +1,192 @@
+"""
+Authentication for Al Fozan Insights Platform
+Passwords are stored as salted PBKDF2 hashes. Login issues a stateless
+token: a base64 JSON payload signed with HMAC-SHA256 under JWT_SECRET_KEY.
+Every gunicorn worker verifies tokens on its own, and recently verified
+tokens are kept in a small LRU so a repeat request only checks the expiry.
+Tokens are only required on /api/ routes with AUTH_REQUIRED=true, since the
+dashboard's API clients do not send them yet.
+"""
+
+import base64
+import hashlib
+import hmac
+import json
+import logging
+import os
+import secrets
+import threading
+import time
+from collections import OrderedDict
+
+from flask import g, jsonify, request
+
+PASSWORD_ITERATIONS = 260000
+TOKEN_TTL = int(os.environ.get('AUTH_TOKEN_TTL', 8 * 3600))
+VERIFY_CACHE_SIZE = int(os.environ.get('AUTH_CACHE_SIZE', 4096))
+STREAM_TOKEN_TTL = int(os.environ.get('STREAM_TOKEN_TTL', 60))
+AUTH_REQUIRED = os.environ.get('AUTH_REQUIRED', 'false').lower() == 'true'
+
+# Routes under /api/ that can be called without a token
+PUBLIC_PATHS = {'/api/auth/login'}
+
+# Routes that take a stream token as ?access_token=, for EventSource clients
+# which cannot set headers. Query strings end up in proxy and access logs, so
+# only short-lived stream tokens are accepted there, and nowhere else.
+QUERY_TOKEN_PATHS = {'/api/stream'}
+STREAM_SCOPE = 'stream'
+
+# Demo accounts; the passwords are the documented demo ones, stored hashed
+USERS = {
+    'admin': {
+        'password_hash': 'pbkdf2_sha256$260000$HBOJg2v76ANOBy3u7uN_sw$kK5QAeoD4JQEnav2Lu2jnUDWizllIHs3S5KzPpP0uE0',
+        'role': 'admin',
+        'name': 'Admin User'
+    },
+    'manager': {
+        'password_hash': 'pbkdf2_sha256$260000$dIpF0HgE9-dZ3ks5h1NBjw$T5napB1MA5LYcGOcE4npkRf6IP_exdyc_qSxnfaBm4c',
+        'role': 'manager',
+        'name': 'Manager User'
+    },
+    'analyst': {
+        'password_hash': 'pbkdf2_sha256$260000$z2gpLej330k0OQ3bmqrzkQ$TJySHn9_tX0-lVDkRWbMhSnKXocFEl21MFyzzeEVVaA',
+        'role': 'analyst',
+        'name': 'Analyst User'
+    }
+}
+
+logger = logging.getLogger(__name__)
+
+
+def load_secret():
+    secret = os.environ.get('JWT_SECRET_KEY')
+    if secret:
+        return secret.encode()
+    if os.environ.get('FLASK_ENV') != 'development':
+        # Every worker must sign with the same key, or a token issued by one
+        # is rejected by the others
+        raise RuntimeError('JWT_SECRET_KEY must be set outside development')
+    # Tokens signed with a per-process key are only accepted by the worker
+    # that issued them, which is enough for a single development server
+    logger.warning("JWT_SECRET_KEY is not set; using a random key for this process")
+    return secrets.token_bytes(32)
+
+
+SECRET_KEY = load_secret()
+
+
+def b64encode(data):
+    return base64.urlsafe_b64encode(data).decode().rstrip('=')
+
+
+def b64decode(text):
+    return base64.urlsafe_b64decode(text + '=' * (-len(text) % 4))
+
+
+def hash_password(password, salt=None, iterations=PASSWORD_ITERATIONS):
+    """Return a 'pbkdf2_sha256$iterations$salt$hash' string for `password`"""
+    salt = salt or secrets.token_bytes(16)
+    digest = hashlib.pbkdf2_hmac('sha256', password.encode(), salt, iterations)
+    return f"pbkdf2_sha256${iterations}${b64encode(salt)}${b64encode(digest)}"
+
+
+def verify_password(password, encoded):
+    try:
+        algorithm, iterations, salt, expected = encoded.split('$')
+    except ValueError:
+        return False
+    if algorithm != 'pbkdf2_sha256':
+        return False
+    digest = hashlib.pbkdf2_hmac('sha256', password.encode(), b64decode(salt), int(iterations))
+    return hmac.compare_digest(b64encode(digest), expected)
+
+
+def authenticate(username, password):
+    """Return the user record for valid credentials, otherwise None"""
+    user = USERS.get(username)
+    if user is None or not isinstance(password, str) or not verify_password(password, user['password_hash']):
+        return None
+    return user
+
+
+def sign(payload):
+    return b64encode(hmac.new(SECRET_KEY, payload.encode(), hashlib.sha256).digest())
+
+
+def issue_token(username, role, ttl=TOKEN_TTL, scope=None):
+    """Return a signed token for `username` that expires after `ttl` seconds"""
+    claims = {'sub': username, 'role': role, 'exp': int(time.time()) + ttl}
+    if scope is not None:
+        claims['scope'] = scope
+    payload = b64encode(json.dumps(claims, separators=(',', ':')).encode())
+    return f"{payload}.{sign(payload)}"
+
+
+class TokenVerifier:
+    """Verifies signed tokens, remembering the claims of recently seen ones"""
+
+    def __init__(self, max_size=VERIFY_CACHE_SIZE):
+        self.max_size = max_size
+        self.verified = OrderedDict()
+        self.lock = threading.Lock()
+
+    def verify(self, token):
+        """Return the token's claims, or None if it is malformed, forged or expired"""
+        with self.lock:
+            claims = self.verified.get(token)
+            if claims is not None:
+                self.verified.move_to_end(token)
+
+        if claims is None:
+            claims = self.decode(token)
+            if claims is None:
+                return None
+            with self.lock:
+                self.verified[token] = claims
+                if len(self.verified) > self.max_size:
+                    self.verified.popitem(last=False)
+
+        if claims['exp'] <= time.time():
+            with self.lock:
+                self.verified.pop(token, None)
+            return None
+        return claims
+
+    @staticmethod
+    def decode(token):
+        payload, _, signature = token.partition('.')
+        # compare_digest only takes str operands that are ASCII
+        if not signature or not hmac.compare_digest(sign(payload).encode(), signature.encode()):
+            return None
+        try:
+            claims = json.loads(b64decode(payload))
+        except ValueError:
+            return None
+        if not isinstance(claims, dict) or not isinstance(claims.get('exp'), int):
+            return None
+        return claims
+
+
+verifier = TokenVerifier()
+
+
+def require_auth(app):
+    """Reject /api/ requests without a valid bearer token; claims are kept in g.user"""
+    @app.before_request
+    def check_token():
+        if not AUTH_REQUIRED:
+            return None
+        if request.method == 'OPTIONS' or not request.path.startswith('/api/') or request.path in PUBLIC_PATHS:
+            return None
+
+        scheme, _, token = request.headers.get('Authorization', '').partition(' ')
+        from_query = not scheme and request.path in QUERY_TOKEN_PATHS
+        if from_query:
+            scheme, token = 'bearer', request.args.get('access_token', '')
+        claims = verifier.verify(token.strip()) if scheme.lower() == 'bearer' else None
+        if claims is None or (claims.get('scope') == STREAM_SCOPE) != from_query:
+            response = jsonify({"success": False, "error": "Authentication required"})
+            response.status_code = 401
+            response.headers['WWW-Authenticate'] = 'Bearer'
+            return response
+        g.user = claims
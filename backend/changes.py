@@ -0,0 +1,90 @@
+"""
+Project change log for Al Fozan Insights Platform
+Triggers append a row to project_changes for every project insert, update
+and delete, whoever makes it. Each consumer keeps the sequence number it
+has processed up to in job_checkpoints and reads only the entries after
+it, so its work scales with the number of changes rather than the table.
+"""
+
+import os
+from datetime import datetime, timedelta, timezone
+
+# Entries every consumer has processed are kept this long before pruning,
+# so late readers can still look back over recent changes
+RETENTION_HOURS = int(os.environ.get('CHANGE_LOG_RETENTION_HOURS', 24))
+
+
+def latest_seq(conn):
+    """Return the sequence number of the newest change, 0 when the log is empty"""
+    row = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'project_changes'").fetchone()
+    return row[0] if row else 0
+
+
+def get_checkpoint(conn, job):
+    """Return the last sequence number `job` has processed, or None if it never ran"""
+    row = conn.execute('SELECT last_seq FROM job_checkpoints WHERE job = ?', (job,)).fetchone()
+    return row[0] if row else None
+
+
+def set_checkpoint(conn, job, seq):
+    conn.execute("""
+        INSERT INTO job_checkpoints (job, last_seq, updated_at) VALUES (?, ?, CURRENT_TIMESTAMP)
+        ON CONFLICT(job) DO UPDATE SET last_seq = excluded.last_seq, updated_at = excluded.updated_at
+    """, (job, seq))
+
+
+def read_changes(conn, after_seq, limit=None):
+    """Return the change rows after `after_seq`, oldest first"""
+    sql = 'SELECT seq, project_id, op, columns, changed_at FROM project_changes WHERE seq > ? ORDER BY seq'
+    params = [after_seq]
+    if limit is not None:
+        sql += ' LIMIT ?'
+        params.append(limit)
+    return conn.execute(sql, params).fetchall()
+
+
+def count_changes(conn, after_seq):
+    return conn.execute('SELECT COUNT(*) FROM project_changes WHERE seq > ?', (after_seq,)).fetchone()[0]
+
+
+def changed_projects(conn, after_seq, columns=None):
+    """Return the ids of projects still present that changed after `after_seq`
+
+    With `columns` only inserts and updates touching one of them count.
+    """
+    sql = """
+        SELECT DISTINCT c.project_id FROM project_changes AS c
+        WHERE c.seq > ? AND c.op != 'delete'
+          AND EXISTS (SELECT 1 FROM projects AS p WHERE p.id = c.project_id)
+    """
+    params = [after_seq]
+    if columns:
+        # columns holds the changed names comma separated, with no spaces
+        matches = ' OR '.join("instr(',' || c.columns || ',', ?) > 0" for _ in columns)
+        sql += f" AND (c.op = 'insert' OR {matches})"
+        params.extend(f',{column},' for column in columns)
+    return {row[0] for row in conn.execute(sql, params)}
+
+
+def ran_today(conn, job):
+    """Return whether `job`'s checkpoint was set today (UTC)"""
+    row = conn.execute(
+        "SELECT updated_at >= date('now') FROM job_checkpoints WHERE job = ?", (job,)
+    ).fetchone()
+    return bool(row and row[0])
+
+
+def prune(conn, retention_hours=RETENTION_HOURS):
+    """Delete entries every checkpoint has passed and older than the retention window
+
+    Returns the number of entries removed.
+    """
+    row = conn.execute('SELECT MIN(last_seq) FROM job_checkpoints').fetchone()
+    if row[0] is None:
+        return 0
+    cutoff = (datetime.now(timezone.utc) - timedelta(hours=retention_hours)).strftime('%Y-%m-%d %H:%M:%S')
+    with conn:
+        cursor = conn.execute(
+            'DELETE FROM project_changes WHERE seq <= ? AND changed_at < ?', (row[0], cutoff)
+        )
+    return cursor.rowcount
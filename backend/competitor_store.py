@@ -0,0 +1,166 @@
+"""
+Competitor repository for Al Fozan Insights Platform
+Competitors live in the `competitors` table that the data processor
+updates; triggers append every change of market share or digital presence
+to competitor_history, keyed on (competitor, time). Trajectories are range
+scans of that key, and the biggest movers over a window are picked with a
+bounded heap instead of sorting every competitor.
+"""
+
+import heapq
+import json
+from itertools import groupby
+
+from db import DB_PATH, connection
+from downsample import METHODS, downsample
+from project_store import ValidationError, parse_project_id
+from timeseries import parse_timestamp
+
+# Tracked columns that history and movers can be computed for
+HISTORY_METRICS = ('market_share', 'digital_presence')
+
+# Most competitors one history request may ask for
+MAX_HISTORY_COMPETITORS = 50
+
+DEFAULT_TOP = 10
+MAX_TOP = 100
+
+# Reading of `metric` at or before a time; a competitor that only appeared
+# within the window falls back to its first reading in it
+VALUE_AT_SQL = """
+    (SELECT {metric} FROM competitor_history
+     WHERE competitor_id = competitors.id AND recorded_at <= :{bound}
+     ORDER BY recorded_at DESC LIMIT 1)
+"""
+FIRST_IN_WINDOW_SQL = """
+    (SELECT {metric} FROM competitor_history
+     WHERE competitor_id = competitors.id AND recorded_at > :start AND recorded_at <= :end
+     ORDER BY recorded_at LIMIT 1)
+"""
+
+
+def check_metric(metric):
+    if metric not in HISTORY_METRICS:
+        raise ValidationError(f"Unknown metric: {metric}; expected one of {', '.join(HISTORY_METRICS)}")
+
+
+class CompetitorStore:
+    def __init__(self, db_path=DB_PATH):
+        self.db_path = db_path
+
+    def list(self):
+        """Return all competitors ordered by market share"""
+        with connection(self.db_path) as conn:
+            rows = conn.execute('SELECT * FROM competitors ORDER BY market_share DESC, id').fetchall()
+        return [dict(row) for row in rows]
+
+    def seed(self, competitors):
+        """Insert `competitors` if the table is empty; safe to call from every worker"""
+        with connection(self.db_path) as conn:
+            with conn:
+                conn.execute('BEGIN IMMEDIATE')
+                if conn.execute('SELECT 1 FROM competitors LIMIT 1').fetchone() is None:
+                    for competitor in competitors:
+                        conn.execute(
+                            f"INSERT INTO competitors ({', '.join(competitor)}) "
+                            f"VALUES ({', '.join('?' for _ in competitor)})",
+                            tuple(competitor.values())
+                        )
+
+    def history(self, competitor_ids, metric='market_share', start=None, end=None, points=None, method='lttb'):
+        """Return the trajectory of `metric` for each competitor over [start, end)
+
+        With `points` each trajectory is reduced to about that many readings.
+        """
+        check_metric(metric)
+        if method not in METHODS:
+            raise ValidationError(f"Unknown downsampling method: {method}; expected one of {', '.join(METHODS)}")
+        ids = sorted({parse_project_id(value) for value in competitor_ids})
+        if not ids:
+            raise ValidationError('Expected at least one competitor id')
+        if len(ids) > MAX_HISTORY_COMPETITORS:
+            raise ValidationError(f'At most {MAX_HISTORY_COMPETITORS} competitors per request')
+
+        conditions = ['competitor_id IN (SELECT value FROM json_each(?))']
+        params = [json.dumps(ids)]
+        if start:
+            conditions.append('recorded_at >= ?')
+            params.append(parse_timestamp(start, 'start'))
+        if end:
+            conditions.append('recorded_at < ?')
+            params.append(parse_timestamp(end, 'end'))
+
+        with connection(self.db_path) as conn:
+            names = dict(conn.execute(
+                'SELECT id, name FROM competitors WHERE id IN (SELECT value FROM json_each(?))', (json.dumps(ids),)
+            ).fetchall())
+            rows = conn.execute(f"""
+                SELECT competitor_id, recorded_at, {metric} FROM competitor_history
+                WHERE {' AND '.join(conditions)}
+                ORDER BY competitor_id, recorded_at
+            """, params).fetchall()
+
+        trajectories = []
+        for competitor_id, readings in groupby(rows, key=lambda row: row[0]):
+            readings = [{"recorded_at": row[1], "value": row[2]} for row in readings]
+            if points and points < len(readings):
+                keep = downsample(range(len(readings)), [r['value'] or 0 for r in readings], points, method)
+                readings = [readings[i] for i in keep]
+            trajectories.append({"id": competitor_id, "name": names.get(competitor_id), "points": readings})
+        return trajectories
+
+    def top_movers(self, metric='market_share', start=None, end=None, top=DEFAULT_TOP):
+        """Return the `top` gainers and losers of `metric` between `start` and `end`
+
+        A competitor's change is its last reading at or before `end` minus
+        its last reading at or before `start`. Each competitor costs two
+        index seeks, and the heaps never hold more than `top` entries.
+        """
+        check_metric(metric)
+        if not 1 <= top <= MAX_TOP:
+            raise ValidationError(f'top must be between 1 and {MAX_TOP}')
+        start = parse_timestamp(start, 'start') if start else '0000-01-01 00:00:00'
+        end = parse_timestamp(end, 'end') if end else '9999-12-31 23:59:59'
+        if start >= end:
+            raise ValidationError("'start' must be before 'end'")
+
+        before = VALUE_AT_SQL.format(metric=metric, bound='start')
+        first = FIRST_IN_WINDOW_SQL.format(metric=metric)
+        after = VALUE_AT_SQL.format(metric=metric, bound='end')
+        with connection(self.db_path) as conn:
+            rows = conn.execute(f"""
+                SELECT id, name, COALESCE({before}, {first}) AS value_from, {after} AS value_to
+                FROM competitors
+            """, {"start": start, "end": end})
+
+            # Min-heaps holding the `top` largest gains and the `top` largest losses
+            gainers, losers = [], []
+            for row in rows:
+                if row['value_from'] is None or row['value_to'] is None:
+                    continue
+                change = row['value_to'] - row['value_from']
+                if not change:
+                    continue
+                heap = gainers if change > 0 else losers
+                entry = (abs(change), row['id'], dict(row))
+                if len(heap) < top:
+                    heapq.heappush(heap, entry)
+                else:
+                    heapq.heappushpop(heap, entry)
+
+        def describe(entries):
+            return [{
+                "id": row['id'],
+                "name": row['name'],
+                "from": row['value_from'],
+                "to": row['value_to'],
+                "change": row['value_to'] - row['value_from']
+            } for _, _, row in sorted(entries, reverse=True)]
+
+        return {
+            "metric": metric,
+            "start": start,
+            "end": end,
+            "gainers": describe(gainers),
+            "losers": describe(losers)
+        }
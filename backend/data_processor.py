@@ -3,14 +3,23 @@ Automated Data Processing Script for Al Fozan Insights Platform
 This script handles automated data updates, calculations, and maintenance tasks
 """
 
-import sqlite3
+import numpy as np
 import pandas as pd
 from datetime import datetime, timedelta
-import random
 import json
-import schedule
-import time
 import logging
+import os
+from contextlib import nullcontext
+
+from aggregates import check_cube, check_kpis, get_kpis
+from changes import changed_projects, count_changes, get_checkpoint, latest_seq, prune, ran_today, set_checkpoint
+from db import DB_PATH, connection, init_db
+from metrics import start_http_server, timed_job
+from scheduler import MISFIRE_RUN_ONCE, JobScheduler
+from search import optimize_indexes
+from simulation import simulate_sales
+from snapshots import write_snapshot
+from timeseries import record_sample
 
 # Setup logging
 logging.basicConfig(
@@ -22,183 +31,223 @@ logging.basicConfig(
     ]
 )
 
+# Project columns each job's output depends on; a change to any of them (or
+# a new project) puts the project back in the job's queue
+PROGRESS_INPUTS = ('status', 'start_date', 'end_date')
+# Checkpoint of the last full progress run; expected progress moves with the
+# date, so the first run each day recomputes every active project
+FULL_PROGRESS_CHECKPOINT = 'update_project_progress_full'
+SALES_INPUTS = ('status', 'type', 'progress', 'units', 'units_sold')
+
 class DataProcessor:
-    def __init__(self, db_path='alfozan_insights.db'):
+    def __init__(self, db_path=DB_PATH, seed=None, scheduler=None):
         self.db_path = db_path
+        self.scheduler = scheduler
         self.logger = logging.getLogger(__name__)
+        # Every simulated value is drawn from this generator, so a fixed
+        # seed makes a run reproducible
+        self.rng = np.random.default_rng(seed)
+        init_db(db_path)
     
     def get_connection(self):
-        """Get database connection"""
-        return sqlite3.connect(self.db_path)
+        """Check out a pooled database connection for a with block"""
+        return connection(self.db_path)
     
-    def update_project_progress(self):
-        """Update project progress based on time elapsed and milestones"""
+    def exclusive(self, job):
+        """Hold `job`'s scheduler lock, so calling it directly never overlaps a scheduled run"""
+        return self.scheduler.exclusive(job) if self.scheduler else nullcontext()
+    
+    def read_pending(self, conn, job, query, inputs, full=False):
+        """Run `query` over the projects `job` has to process
+
+        A full run, or the first run of a job, reads every project matching
+        the query; otherwise only those whose `inputs` changed after the
+        job's checkpoint. Call inside the job's write transaction, so no
+        change can land between this read and the checkpoint update.
+        """
+        checkpoint = None if full else get_checkpoint(conn, job)
+        if checkpoint is None:
+            return pd.read_sql_query(query, conn)
+        ids = sorted(changed_projects(conn, checkpoint, inputs))
+        return pd.read_sql_query(f"{query} AND id IN (SELECT value FROM json_each(?))", conn,
+                                 params=(json.dumps(ids),))
+    
+    def advance_checkpoint(self, conn, job):
+        """Mark every change so far, including the job's own writes, as processed by `job`"""
+        set_checkpoint(conn, job, latest_seq(conn))
+    
+    @timed_job('update_project_progress')
+    def update_project_progress(self, full=False):
+        """Update project progress based on time elapsed and milestones
+
+        Scheduled runs only revisit projects whose schedule or status changed
+        since the last run, except the first run of the day; `full`
+        recomputes every active project.
+        """
         try:
-            conn = self.get_connection()
-            cursor = conn.cursor()
-            
-            # Get all active projects
-            cursor.execute("""
-                SELECT id, name, start_date, end_date, progress, status
-                FROM projects 
-                WHERE status IN ('In Progress', 'Planning')
-            """)
-            
-            projects = cursor.fetchall()
-            updated_count = 0
-            
-            for project in projects:
-                project_id, name, start_date, end_date, current_progress, status = project
-                
-                if start_date and end_date:
-                    start = datetime.strptime(start_date, '%Y-%m-%d')
-                    end = datetime.strptime(end_date, '%Y-%m-%d')
-                    now = datetime.now()
-                    
-                    # Calculate expected progress based on time
-                    total_duration = (end - start).days
-                    elapsed_duration = (now - start).days
-                    
-                    if total_duration > 0:
-                        expected_progress = min(100, max(0, int((elapsed_duration / total_duration) * 100)))
-                        
-                        # Add some realistic variation
-                        actual_progress = expected_progress + random.randint(-5, 10)
-                        actual_progress = min(100, max(0, actual_progress))
-                        
-                        # Update status based on progress
-                        new_status = status
-                        if actual_progress >= 100:
-                            new_status = 'Completed'
-                        elif actual_progress > 0:
-                            new_status = 'In Progress'
-                        
-                        # Update database
-                        cursor.execute("""
-                            UPDATE projects 
-                            SET progress = ?, status = ?
-                            WHERE id = ?
-                        """, (actual_progress, new_status, project_id))
-                        
-                        updated_count += 1
-                        self.logger.info(f"Updated {name}: {current_progress}% -> {actual_progress}%")
-            
-            conn.commit()
-            conn.close()
-            
-            self.logger.info(f" Updated progress for {updated_count} projects")
+            with self.get_connection() as conn:
+                conn.execute('BEGIN IMMEDIATE')
+                full = full or not ran_today(conn, FULL_PROGRESS_CHECKPOINT)
+                # Get the active projects to update
+                projects = self.read_pending(conn, 'update_project_progress', """
+                    SELECT id, start_date, end_date, progress, status, version
+                    FROM projects 
+                    WHERE status IN ('In Progress', 'Planning')
+                      AND start_date IS NOT NULL AND end_date IS NOT NULL
+                """, PROGRESS_INPUTS, full)
+            
+                # Calculate expected progress based on time for every project at once
+                start = pd.to_datetime(projects['start_date'], format='%Y-%m-%d', errors='coerce')
+                end = pd.to_datetime(projects['end_date'], format='%Y-%m-%d', errors='coerce')
+                now = pd.Timestamp.now()
+                total_duration = (end - start).dt.days
+                elapsed_duration = (now - start).dt.days
+            
+                projects = projects[total_duration > 0]
+                expected_progress = np.trunc(elapsed_duration[projects.index] / total_duration[projects.index] * 100).clip(0, 100)
+            
+                # Add some realistic variation
+                variation = self.rng.integers(-5, 11, size=len(projects))
+                actual_progress = (expected_progress + variation).clip(0, 100).astype(int)
+            
+                # Update status based on progress
+                new_status = np.where(
+                    actual_progress >= 100, 'Completed',
+                    np.where(actual_progress > 0, 'In Progress', projects['status'])
+                )
+            
+                # Write every row back with one prepared statement, skipping
+                # projects that were edited since they were read
+                cursor = conn.executemany("""
+                    UPDATE projects 
+                    SET progress = ?, status = ?, version = version + 1
+                    WHERE id = ? AND version = ?
+                """, zip(actual_progress.tolist(), new_status.tolist(), projects['id'].tolist(),
+                         projects['version'].tolist()))
+                self.advance_checkpoint(conn, 'update_project_progress')
+                if full:
+                    self.advance_checkpoint(conn, FULL_PROGRESS_CHECKPOINT)
+                conn.commit()
+            
+            updated_count = cursor.rowcount
+            skipped = len(projects) - updated_count
+            if skipped:
+                self.logger.info(f" Skipped {skipped} projects changed concurrently; they are retried next run")
+            if updated_count:
+                change = actual_progress - projects['progress'].fillna(0)
+                completed = int((new_status == 'Completed').sum())
+                self.logger.info(
+                    f" Updated progress for {updated_count} projects "
+                    f"(mean change {change.mean():+.1f}%, {completed} completed)"
+                )
+            else:
+                self.logger.info(" Updated progress for 0 projects")
             return updated_count
             
         except Exception as e:
             self.logger.error(f" Error updating project progress: {e}")
             return 0
     
-    def update_sales_data(self):
-        """Update units sold based on market conditions and project progress"""
+    @timed_job('update_sales_data')
+    def update_sales_data(self, full=False):
+        """Update units sold based on market conditions and project progress
+
+        Scheduled runs only simulate sales for projects whose progress,
+        units or status changed since the last run; `full` covers every
+        project with units left.
+        """
         try:
-            conn = self.get_connection()
-            cursor = conn.cursor()
-            
-            # Get projects with available units
-            cursor.execute("""
-                SELECT id, name, units, units_sold, progress, type
-                FROM projects 
-                WHERE units_sold < units AND status != 'Planning'
-            """)
-            
-            projects = cursor.fetchall()
-            updated_count = 0
-            
-            for project in projects:
-                project_id, name, total_units, current_sold, progress, project_type = project
-                available_units = total_units - current_sold
+            with self.get_connection() as conn:
+                conn.execute('BEGIN IMMEDIATE')
+                # Get projects with available units
+                projects = self.read_pending(conn, 'update_sales_data', """
+                    SELECT id, units, units_sold, progress, type, version
+                    FROM projects 
+                    WHERE units_sold < units AND status != 'Planning'
+                """, SALES_INPUTS, full)
                 
-                if available_units > 0 and progress > 20:  # Only sell if project is progressing
-                    # Calculate sales based on project type and progress
-                    base_sales_rate = {
-                        'Residential': 0.15,
-                        'Commercial': 0.08,
-                        'Industrial': 0.05
-                    }.get(project_type, 0.10)
-                    
-                    # Adjust sales rate based on progress
-                    progress_multiplier = min(2.0, progress / 50)
-                    adjusted_sales_rate = base_sales_rate * progress_multiplier
-                    
-                    # Calculate new sales (with some randomness)
-                    max_new_sales = int(available_units * adjusted_sales_rate)
-                    new_sales = random.randint(0, max(1, max_new_sales))
-                    
-                    if new_sales > 0:
-                        new_total_sold = current_sold + new_sales
-                        
-                        cursor.execute("""
-                            UPDATE projects 
-                            SET units_sold = ?
-                            WHERE id = ?
-                        """, (new_total_sold, project_id))
-                        
-                        updated_count += 1
-                        self.logger.info(f"Updated sales for {name}: +{new_sales} units (Total: {new_total_sold})")
-            
-            conn.commit()
-            conn.close()
-            
-            self.logger.info(f"Updated sales data for {updated_count} projects")
+                new_sales = simulate_sales(
+                    projects['units'], projects['units_sold'], projects['progress'],
+                    projects['type'], self.rng
+                )
+                sold = new_sales > 0
+                new_total_sold = projects['units_sold'].to_numpy()[sold] + new_sales[sold]
+                
+                # Write every changed row back with one prepared statement,
+                # skipping projects that were edited since they were read
+                cursor = conn.executemany("""
+                    UPDATE projects 
+                    SET units_sold = ?, version = version + 1
+                    WHERE id = ? AND version = ?
+                """, zip(new_total_sold.tolist(), projects['id'].to_numpy()[sold].tolist(),
+                         projects['version'].to_numpy()[sold].tolist()))
+                self.advance_checkpoint(conn, 'update_sales_data')
+                conn.commit()
+            
+            updated_count = cursor.rowcount
+            self.logger.info(f"Updated sales data for {updated_count} projects (+{int(new_sales.sum())} units)")
             return updated_count
             
         except Exception as e:
             self.logger.error(f"Error updating sales data: {e}")
             return 0
     
+    @timed_job('update_analytics_metrics')
     def update_analytics_metrics(self):
-        """Update analytics metrics with current data"""
+        """Update analytics metrics with current data
+
+        Totals come from the trigger-maintained KPI row rather than a scan
+        of projects; the checkpoint records how many project changes each
+        run took in.
+        """
         try:
-            conn = self.get_connection()
-            cursor = conn.cursor()
+            with self.get_connection() as conn:
+                conn.execute('BEGIN IMMEDIATE')
+                cursor = conn.cursor()
             
-            current_month = datetime.now().strftime('%Y-%b')
+                current_month = datetime.now().strftime('%Y-%b')
+                checkpoint = get_checkpoint(conn, 'update_analytics_metrics')
+                changes = count_changes(conn, checkpoint) if checkpoint is not None else None
             
-            # Calculate total revenue (based on progress and budget)
-            cursor.execute("""
-                SELECT SUM(budget * progress / 100) as total_revenue
-                FROM projects
-            """)
-            total_revenue = cursor.fetchone()[0] or 0
+                # Revenue (based on progress and budget) and units sold to date
+                kpis = get_kpis(conn)
+                total_revenue = kpis['total_revenue']
+                total_units_sold = kpis['total_units_sold']
             
-            # Calculate total units sold this month
-            cursor.execute("""
-                SELECT SUM(units_sold) as total_units_sold
-                FROM projects
-            """)
-            total_units_sold = cursor.fetchone()[0] or 0
-            
-            # Update or insert revenue metric
-            cursor.execute("""
-                INSERT OR REPLACE INTO analytics 
-                (metric_type, metric_value, period, category, recorded_at)
-                VALUES (?, ?, ?, ?, ?)
-            """, ('revenue', total_revenue, current_month, 'financial', datetime.now()))
-            
-            # Update or insert units sold metric
-            cursor.execute("""
-                INSERT OR REPLACE INTO analytics 
-                (metric_type, metric_value, period, category, recorded_at)
-                VALUES (?, ?, ?, ?, ?)
-            """, ('units_sold', total_units_sold, current_month, 'sales', datetime.now()))
-            
-            # Calculate and update market share (simulated)
-            market_share = 17 + random.uniform(-1, 1)  # Base 17% with variation
-            cursor.execute("""
-                INSERT OR REPLACE INTO analytics 
-                (metric_type, metric_value, period, category, recorded_at)
-                VALUES (?, ?, ?, ?, ?)
-            """, ('market_share', market_share, current_month, 'market', datetime.now()))
+                # Update or insert revenue metric
+                cursor.execute("""
+                    INSERT OR REPLACE INTO analytics 
+                    (metric_type, metric_value, period, category, recorded_at)
+                    VALUES (?, ?, ?, ?, ?)
+                """, ('revenue', total_revenue, current_month, 'financial', datetime.now()))
             
-            conn.commit()
-            conn.close()
+                # Update or insert units sold metric
+                cursor.execute("""
+                    INSERT OR REPLACE INTO analytics 
+                    (metric_type, metric_value, period, category, recorded_at)
+                    VALUES (?, ?, ?, ?, ?)
+                """, ('units_sold', total_units_sold, current_month, 'sales', datetime.now()))
             
-            self.logger.info(f"Updated analytics metrics for {current_month}")
+                # Calculate and update market share (simulated)
+                market_share = 17 + self.rng.uniform(-1, 1)  # Base 17% with variation
+                cursor.execute("""
+                    INSERT OR REPLACE INTO analytics 
+                    (metric_type, metric_value, period, category, recorded_at)
+                    VALUES (?, ?, ?, ?, ?)
+                """, ('market_share', market_share, current_month, 'market', datetime.now()))
+
+                # Keep every reading in the time-series store as well; the
+                # analytics row above only holds the latest one per month
+                now = datetime.now()
+                record_sample(conn, 'revenue', total_revenue, now)
+                record_sample(conn, 'units_sold', total_units_sold, now)
+                record_sample(conn, 'market_share', market_share, now)
+            
+                self.advance_checkpoint(conn, 'update_analytics_metrics')
+                conn.commit()
+            
+            self.logger.info(f"Updated analytics metrics for {current_month}"
+                             + (f" ({changes} project changes since last run)" if changes is not None else ""))
             self.logger.info(f"   Revenue: {total_revenue/1000000:.1f}M SAR")
             self.logger.info(f"   Units Sold: {total_units_sold}")
             self.logger.info(f"   Market Share: {market_share:.1f}%")
@@ -209,41 +258,41 @@ class DataProcessor:
             self.logger.error(f"Error updating analytics metrics: {e}")
             return False
     
+    @timed_job('update_competitor_data')
     def update_competitor_data(self):
         """Update competitor market share and digital presence"""
         try:
-            conn = self.get_connection()
-            cursor = conn.cursor()
+            with self.get_connection() as conn:
+                cursor = conn.cursor()
             
-            # Get all competitors
-            cursor.execute("SELECT id, name, market_share, digital_presence FROM competitors")
-            competitors = cursor.fetchall()
+                # Get all competitors
+                cursor.execute("SELECT id, name, market_share, digital_presence FROM competitors")
+                competitors = cursor.fetchall()
             
-            updated_count = 0
+                updated_count = 0
             
-            for competitor in competitors:
-                comp_id, name, current_share, current_digital = competitor
+                for competitor in competitors:
+                    comp_id, name, current_share, current_digital = competitor
                 
-                # Simulate market share changes (small variations)
-                share_change = random.uniform(-0.5, 0.5)
-                new_share = max(0, min(50, current_share + share_change))
+                    # Simulate market share changes (small variations)
+                    share_change = self.rng.uniform(-0.5, 0.5)
+                    new_share = max(0, min(50, current_share + share_change))
                 
-                # Simulate digital presence changes
-                digital_change = random.randint(-2, 3)
-                new_digital = max(0, min(100, current_digital + digital_change))
+                    # Simulate digital presence changes
+                    digital_change = int(self.rng.integers(-2, 3, endpoint=True))
+                    new_digital = max(0, min(100, current_digital + digital_change))
                 
-                # Update database
-                cursor.execute("""
-                    UPDATE competitors 
-                    SET market_share = ?, digital_presence = ?
-                    WHERE id = ?
-                """, (new_share, new_digital, comp_id))
+                    # Update database
+                    cursor.execute("""
+                        UPDATE competitors 
+                        SET market_share = ?, digital_presence = ?
+                        WHERE id = ?
+                    """, (new_share, new_digital, comp_id))
                 
-                updated_count += 1
-                self.logger.info(f"Updated {name}: Share {current_share:.1f}% -> {new_share:.1f}%")
+                    updated_count += 1
+                    self.logger.info(f"Updated {name}: Share {current_share:.1f}% -> {new_share:.1f}%")
             
-            conn.commit()
-            conn.close()
+                conn.commit()
             
             self.logger.info(f"Updated {updated_count} competitors")
             return updated_count
@@ -252,69 +301,132 @@ class DataProcessor:
             self.logger.error(f" Error updating competitor data: {e}")
             return 0
     
+    @timed_job('verify_aggregates')
+    def verify_aggregates(self):
+        """Check the maintained KPI totals and cube against a full recomputation and repair drift"""
+        try:
+            with self.get_connection() as conn:
+                mismatches = check_kpis(conn, repair=True)
+                cube_mismatches = check_cube(conn, repair=True)
+
+            for column, (stored, actual) in mismatches.items():
+                self.logger.warning(f"KPI {column} drifted: stored {stored}, actual {actual} (rebuilt)")
+            if cube_mismatches:
+                self.logger.warning(f"{len(cube_mismatches)} project cube cell(s) drifted (rebuilt)")
+            if not mismatches and not cube_mismatches:
+                self.logger.info("KPI aggregates are consistent")
+            return not mismatches and not cube_mismatches
+
+        except Exception as e:
+            self.logger.error(f"Error verifying KPI aggregates: {e}")
+            return False
+
+    @timed_job('prune_change_log')
+    def prune_change_log(self):
+        """Drop change log entries every job has processed and that are past retention"""
+        try:
+            with self.get_connection() as conn:
+                removed = prune(conn)
+            self.logger.info(f"Pruned {removed} change log entries")
+            return removed
+
+        except Exception as e:
+            self.logger.error(f"Error pruning change log: {e}")
+            return 0
+
+    @timed_job('optimize_search_indexes')
+    def optimize_search_indexes(self):
+        """Merge the full-text index segments written by the day's inserts and updates"""
+        try:
+            with self.get_connection() as conn:
+                optimize_indexes(conn)
+            self.logger.info("Optimized full-text search indexes")
+            return True
+
+        except Exception as e:
+            self.logger.error(f"Error optimizing search indexes: {e}")
+            return False
+
+    @timed_job('generate_daily_report')
     def generate_daily_report(self):
         """Generate daily summary report"""
         try:
-            conn = self.get_connection()
-            cursor = conn.cursor()
-            
-            # Get summary statistics
-            cursor.execute("""
-                SELECT 
-                    COUNT(*) as total_projects,
-                    AVG(progress) as avg_progress,
-                    SUM(units_sold) as total_units_sold,
-                    SUM(budget) as total_budget
-                FROM projects
-            """)
-            
-            stats = cursor.fetchone()
-            total_projects, avg_progress, total_units_sold, total_budget = stats
+            with self.get_connection() as conn:
+                cursor = conn.cursor()
             
-            # Create report
-            report = {
-                'date': datetime.now().strftime('%Y-%m-%d'),
-                'summary': {
-                    'total_projects': total_projects,
-                    'average_progress': round(avg_progress, 2) if avg_progress else 0,
-                    'total_units_sold': total_units_sold or 0,
-                    'total_budget': total_budget or 0
-                },
-                'generated_at': datetime.now().isoformat()
-            }
-            
-            # Save report to file
-            report_filename = f"daily_report_{datetime.now().strftime('%Y%m%d')}.json"
-            with open(f"reports/{report_filename}", 'w') as f:
-                json.dump(report, f, indent=2)
-            
-            conn.close()
+                # Get summary statistics
+                cursor.execute("""
+                    SELECT 
+                        COUNT(*) as total_projects,
+                        AVG(progress) as avg_progress,
+                        SUM(units_sold) as total_units_sold,
+                        SUM(budget) as total_budget
+                    FROM projects
+                """)
+            
+                stats = cursor.fetchone()
+                total_projects, avg_progress, total_units_sold, total_budget = stats
+            
+                # Create report
+                report = {
+                    'date': datetime.now().strftime('%Y-%m-%d'),
+                    'summary': {
+                        'total_projects': total_projects,
+                        'average_progress': round(avg_progress, 2) if avg_progress else 0,
+                        'total_units_sold': total_units_sold or 0,
+                        'total_budget': total_budget or 0
+                    },
+                    'generated_at': datetime.now().isoformat()
+                }
+            
+                # Save report to file
+                report_filename = f"daily_report_{datetime.now().strftime('%Y%m%d')}.json"
+                os.makedirs('reports', exist_ok=True)
+                with open(f"reports/{report_filename}", 'w') as f:
+                    json.dump(report, f, indent=2)
+
+                # Keep a columnar copy of the day's data for historical queries
+                snapshot = write_snapshot(conn, report['date'])
             
             self.logger.info(f"Generated daily report: {report_filename}")
+            self.logger.info(
+                "Wrote snapshot for " + report['date'] + ": " +
+                ', '.join(f"{table} {info['rows']} rows" for table, info in snapshot['tables'].items())
+            )
             return report_filename
             
         except Exception as e:
             self.logger.error(f"Error generating daily report: {e}")
             return None
     
+    @timed_job('run_full_update')
     def run_full_update(self):
-        """Run all data processing tasks"""
+        """Run all data processing tasks over every project"""
         self.logger.info("🚀 Starting full data processing cycle...")
         
-        # Update project progress
-        projects_updated = self.update_project_progress()
+        # Each step holds its scheduled job's lock, so the job's own schedule
+        # waits for it instead of failing on the database lock
+        
+        # Update project progress; the daily sweep also advances projects
+        # that only moved with the calendar
+        with self.exclusive('update_project_progress'):
+            projects_updated = self.update_project_progress(full=True)
         
         # Update sales data
-        sales_updated = self.update_sales_data()
+        with self.exclusive('update_sales_data'):
+            sales_updated = self.update_sales_data(full=True)
         
         # Update analytics
-        analytics_updated = self.update_analytics_metrics()
+        with self.exclusive('update_analytics_metrics'):
+            analytics_updated = self.update_analytics_metrics()
         
         # Update competitors
-        competitors_updated = self.update_competitor_data()
+        with self.exclusive('update_competitor_data'):
+            competitors_updated = self.update_competitor_data()
         
         # Generate daily report
-        report_generated = self.generate_daily_report()
+        with self.exclusive('generate_daily_report'):
+            report_generated = self.generate_daily_report()
         
         self.logger.info(" Full data processing cycle completed!")
         self.logger.info(f"   Projects updated: {projects_updated}")
@@ -325,33 +437,49 @@ class DataProcessor:
 
 def main():
     """Main function to run scheduled data processing"""
-    processor = DataProcessor()
+    metrics_port = os.environ.get('METRICS_PORT')
+    if metrics_port:
+        start_http_server(int(metrics_port))
+    
+    # Schedule tasks; independent jobs run concurrently on the worker pool
+    scheduler = JobScheduler(max_workers=int(os.environ.get('DATA_PROCESSOR_WORKERS', 4)),
+                             logger=logging.getLogger(__name__))
+    seed = os.environ.get('DATA_PROCESSOR_SEED')
+    processor = DataProcessor(seed=int(seed) if seed else None, scheduler=scheduler)
     
-    # Schedule tasks
-    schedule.every().hour.do(processor.update_project_progress)
-    schedule.every(2).hours.do(processor.update_sales_data)
-    schedule.every(4).hours.do(processor.update_analytics_metrics)
-    schedule.every(6).hours.do(processor.update_competitor_data)
-    schedule.every().day.at("08:00").do(processor.generate_daily_report)
-    schedule.every().day.at("18:00").do(processor.run_full_update)
+    scheduler.every(timedelta(hours=1), 'update_project_progress', processor.update_project_progress,
+                    timeout=30 * 60)
+    scheduler.every(timedelta(hours=2), 'update_sales_data', processor.update_sales_data,
+                    timeout=60 * 60)
+    scheduler.every(timedelta(hours=4), 'update_analytics_metrics', processor.update_analytics_metrics,
+                    timeout=30 * 60)
+    scheduler.every(timedelta(hours=6), 'update_competitor_data', processor.update_competitor_data,
+                    timeout=60 * 60)
+    scheduler.daily('03:00', 'verify_aggregates', processor.verify_aggregates,
+                    timeout=60 * 60)
+    scheduler.daily('03:30', 'prune_change_log', processor.prune_change_log,
+                    timeout=30 * 60)
+    scheduler.daily('04:00', 'optimize_search_indexes', processor.optimize_search_indexes,
+                    timeout=30 * 60)
+    scheduler.daily('08:00', 'generate_daily_report', processor.generate_daily_report,
+                    timeout=60 * 60, misfire=MISFIRE_RUN_ONCE)
+    scheduler.daily('18:00', 'run_full_update', processor.run_full_update,
+                    timeout=3 * 60 * 60, misfire=MISFIRE_RUN_ONCE)
     
     print(" Al Fozan Data Processor Started")
     print(" Scheduled tasks:")
-    print("   - Project progress: Every hour")
-    print("   - Sales data: Every 2 hours")
-    print("   - Analytics: Every 4 hours")
-    print("   - Competitors: Every 6 hours")
-    print("   - Daily report: 8:00 AM")
-    print("   - Full update: 6:00 PM")
+    for job in scheduler.jobs:
+        print(f"   - {job.name}: {job.describe()} (timeout {job.timeout // 60} min, misfire: {job.misfire})")
     print("\n Running scheduled tasks...")
     
     # Run initial update
-    processor.run_full_update()
+    scheduler.run_now('run_full_update')
     
     # Keep running scheduled tasks
-    while True:
-        schedule.run_pending()
-        time.sleep(60)  # Check every minute
+    try:
+        scheduler.run_forever()
+    except KeyboardInterrupt:
+        scheduler.stop()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,153 @@
+"""
+Database access for Al Fozan Insights Platform
+Shared by the Flask API and the data processor so every gunicorn worker
+and scheduled job reads and writes the same SQLite file.
+
+Connections are tuned for concurrent use (WAL journaling, so readers keep
+running while a batch job commits) and kept in a small bounded pool per
+process, which also keeps each connection's prepared statement cache warm.
+"""
+
+import os
+import queue
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+from metrics import TimedConnection
+from schema import migrate
+
+DB_PATH = os.environ.get('DATABASE_PATH', 'alfozan_insights.db')
+
+POOL_SIZE = int(os.environ.get('DATABASE_POOL_SIZE', 8))
+POOL_TIMEOUT = 30
+
+# Number of prepared statements sqlite3 keeps per connection
+STATEMENT_CACHE_SIZE = 256
+
+# SQLite VM instructions between deadline checks
+DEADLINE_CHECK_INTERVAL = 10000
+
+PRAGMAS = (
+    'PRAGMA journal_mode = WAL',
+    # Safe with WAL: a power loss can only drop the most recent commits
+    'PRAGMA synchronous = NORMAL',
+    'PRAGMA cache_size = -65536',
+    'PRAGMA mmap_size = 268435456',
+    'PRAGMA temp_store = MEMORY',
+)
+
+
+def connect(db_path=DB_PATH):
+    """Open a tuned, instrumented connection that returns rows as sqlite3.Row"""
+    conn = sqlite3.connect(
+        db_path,
+        timeout=30,
+        cached_statements=STATEMENT_CACHE_SIZE,
+        check_same_thread=False,
+        factory=TimedConnection
+    )
+    conn.row_factory = sqlite3.Row
+    for pragma in PRAGMAS:
+        conn.execute(pragma)
+    return conn
+
+
+# Per-thread deadline set by deadline(), as a time.monotonic() value
+_deadlines = threading.local()
+
+
+@contextmanager
+def deadline(seconds):
+    """Interrupt SQL this thread runs on pooled connections after `seconds`
+
+    A statement still running at the deadline, or started after it, fails
+    with sqlite3.OperationalError and the connection's transaction is rolled
+    back when it returns to the pool. None sets no deadline.
+    """
+    previous = getattr(_deadlines, 'at', None)
+    _deadlines.at = None if seconds is None else time.monotonic() + seconds
+    try:
+        yield
+    finally:
+        _deadlines.at = previous
+
+
+class ConnectionPool:
+    """Bounded pool of connections to one database file
+
+    A connection is only ever used by the thread that checked it out; at
+    most `max_size` are open at once and callers wait for a free one.
+    """
+
+    def __init__(self, db_path=DB_PATH, max_size=POOL_SIZE):
+        self.db_path = db_path
+        self.max_size = max_size
+        self.slots = threading.BoundedSemaphore(max_size)
+        self.idle = queue.LifoQueue()
+        self.pid = os.getpid()
+
+    def _reset_after_fork(self):
+        # Connections must not cross a fork (e.g. gunicorn --preload)
+        if self.pid != os.getpid():
+            self.pid = os.getpid()
+            self.idle = queue.LifoQueue()
+            self.slots = threading.BoundedSemaphore(self.max_size)
+
+    @contextmanager
+    def connection(self):
+        self._reset_after_fork()
+        if not self.slots.acquire(timeout=POOL_TIMEOUT):
+            raise sqlite3.OperationalError('Timed out waiting for a database connection')
+        try:
+            try:
+                conn = self.idle.get_nowait()
+            except queue.Empty:
+                conn = connect(self.db_path)
+
+            expires = getattr(_deadlines, 'at', None)
+            if expires is not None:
+                conn.set_progress_handler(lambda: time.monotonic() > expires, DEADLINE_CHECK_INTERVAL)
+            try:
+                yield conn
+            finally:
+                # Hand the connection back clean, whatever the caller left behind
+                if expires is not None:
+                    conn.set_progress_handler(None, 0)
+                if conn.in_transaction:
+                    conn.rollback()
+                self.idle.put(conn)
+        finally:
+            self.slots.release()
+
+    def close(self):
+        while True:
+            try:
+                self.idle.get_nowait().close()
+            except queue.Empty:
+                break
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(db_path=DB_PATH):
+    """Return the process-wide pool for `db_path`"""
+    with _pools_lock:
+        pool = _pools.get(db_path)
+        if pool is None:
+            pool = _pools[db_path] = ConnectionPool(db_path)
+        return pool
+
+
+def connection(db_path=DB_PATH):
+    """Check out a pooled connection for the duration of a with block"""
+    return get_pool(db_path).connection()
+
+
+def init_db(db_path=DB_PATH):
+    """Create or upgrade the schema"""
+    with connection(db_path) as conn:
+        return migrate(conn)
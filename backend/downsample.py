@@ -0,0 +1,78 @@
+"""
+Series downsampling for Al Fozan Insights Platform
+Both functions return the indices of the points to keep, in order, so
+several series sharing an x axis can be reduced with the same selection.
+"""
+
+
+def lttb(xs, ys, threshold):
+    """Largest-Triangle-Three-Buckets: keep the points that best preserve the shape of the line
+
+    The first and last points are always kept; every bucket in between
+    contributes the point forming the largest triangle with the point kept
+    from the previous bucket and the average of the next bucket.
+    """
+    count = len(ys)
+    if threshold >= count:
+        return list(range(count))
+    if threshold < 3:
+        return [0, count - 1][:threshold]
+
+    bucket_size = (count - 2) / (threshold - 2)
+    selected = [0]
+    previous = 0
+    for bucket in range(threshold - 2):
+        start = int(bucket * bucket_size) + 1
+        end = int((bucket + 1) * bucket_size) + 1
+
+        next_start = end
+        next_end = min(int((bucket + 2) * bucket_size) + 1, count)
+        next_x = sum(xs[next_start:next_end]) / (next_end - next_start)
+        next_y = sum(ys[next_start:next_end]) / (next_end - next_start)
+
+        best, best_area = start, -1.0
+        for i in range(start, end):
+            area = abs((xs[previous] - next_x) * (ys[i] - ys[previous])
+                       - (xs[previous] - xs[i]) * (next_y - ys[previous]))
+            if area > best_area:
+                best, best_area = i, area
+        selected.append(best)
+        previous = best
+
+    selected.append(count - 1)
+    return selected
+
+
+def minmax(ys, threshold):
+    """Keep the minimum and maximum of each of threshold / 2 equal buckets
+
+    Cheaper than LTTB and never drops a peak or a trough, at the cost of a
+    less even spacing along the x axis.
+    """
+    count = len(ys)
+    if threshold >= count:
+        return list(range(count))
+
+    buckets = max(1, threshold // 2)
+    bucket_size = count / buckets
+    selected = []
+    for bucket in range(buckets):
+        start = int(bucket * bucket_size)
+        end = int((bucket + 1) * bucket_size)
+        indices = range(start, end)
+        low = min(indices, key=ys.__getitem__)
+        high = max(indices, key=ys.__getitem__)
+        selected.extend(sorted({low, high}))
+    return selected
+
+
+METHODS = ('lttb', 'minmax')
+
+
+def downsample(xs, ys, threshold, method='lttb'):
+    """Return the indices kept by `method` when reducing the series to `threshold` points"""
+    if method == 'lttb':
+        return lttb(xs, ys, threshold)
+    if method == 'minmax':
+        return minmax(ys, threshold)
+    raise ValueError(f"Unknown downsampling method: {method}")
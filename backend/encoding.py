@@ -0,0 +1,150 @@
+"""
+Response encoding for Al Fozan Insights Platform
+JSON is serialized with orjson when it is installed and with the standard
+library otherwise. Responses above a size threshold are compressed with
+the best codec the client accepts: zstd and brotli when their packages
+are installed, gzip always. Streamed responses such as exports are
+compressed chunk by chunk as they are sent.
+"""
+
+import gzip
+import os
+import zlib
+
+from flask import request
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# 'stdlib' forces the standard library encoder even when orjson is available
+JSON_BACKEND = os.environ.get('JSON_BACKEND', 'orjson' if orjson else 'stdlib')
+
+# Responses smaller than this are sent uncompressed; below roughly one
+# packet compression saves nothing on the wire
+MIN_COMPRESS_BYTES = int(os.environ.get('RESPONSE_COMPRESS_MIN_BYTES', 1024))
+
+COMPRESSIBLE_MIMETYPES = {'application/json', 'text/csv', 'text/plain', 'text/html', 'application/x-ndjson'}
+
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+ZSTD_LEVEL = 3
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """Flask JSON provider backed by orjson, with the same output rules as the default one"""
+
+    # Sorted keys like the default provider (non-string keys sort as their
+    # string form); datetimes and other types are left to
+    # DefaultJSONProvider.default so they serialize the same way. Unlike the
+    # default, non-ASCII text is sent as UTF-8 rather than \u escapes.
+    options = (orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+               if orjson else 0)
+
+    def dumps(self, obj, **kwargs):
+        if JSON_BACKEND != 'orjson' or kwargs:
+            return super().dumps(obj, **kwargs)
+        return orjson.dumps(obj, default=self.default, option=self.options).decode()
+
+    def response(self, *args, **kwargs):
+        if JSON_BACKEND != 'orjson':
+            return super().response(*args, **kwargs)
+        obj = self._prepare_response_obj(args, kwargs)
+        body = orjson.dumps(obj, default=self.default, option=self.options | orjson.OPT_APPEND_NEWLINE)
+        return self._app.response_class(body, mimetype=self.mimetype)
+
+
+def gzip_stream(chunks):
+    compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode() if isinstance(chunk, str) else chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def brotli_stream(chunks):
+    compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+    for chunk in chunks:
+        data = compressor.process(chunk.encode() if isinstance(chunk, str) else chunk)
+        if data:
+            yield data
+    yield compressor.finish()
+
+
+def zstd_stream(chunks):
+    compressor = zstandard.ZstdCompressor(level=ZSTD_LEVEL).compressobj()
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode() if isinstance(chunk, str) else chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+# Content codings in order of preference: (compress bytes, compress a chunk iterator)
+CODECS = {}
+if zstandard is not None:
+    CODECS['zstd'] = (lambda data: zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(data), zstd_stream)
+if brotli is not None:
+    CODECS['br'] = (lambda data: brotli.compress(data, quality=BROTLI_QUALITY), brotli_stream)
+CODECS['gzip'] = (lambda data: gzip.compress(data, GZIP_LEVEL, mtime=0), gzip_stream)
+
+
+def negotiate():
+    """Return the preferred content coding the current request accepts, or None"""
+    return request.accept_encodings.best_match(list(CODECS))
+
+
+def compress(data, encoding):
+    return CODECS[encoding][0](data)
+
+
+def is_compressible(response):
+    return (
+        response.status_code == 200
+        and not response.direct_passthrough
+        and 'Content-Encoding' not in response.headers
+        and response.mimetype in COMPRESSIBLE_MIMETYPES
+    )
+
+
+def compress_response(response):
+    """Compress a response for the current request if it is worth it"""
+    if not is_compressible(response):
+        return response
+    if not response.is_streamed and (response.content_length or 0) < MIN_COMPRESS_BYTES:
+        return response
+
+    response.vary.add('Accept-Encoding')
+    encoding = negotiate()
+    if encoding is None:
+        return response
+
+    if response.is_streamed:
+        response.response = CODECS[encoding][1](response.response)
+        response.headers.pop('Content-Length', None)
+    else:
+        response.set_data(compress(response.get_data(), encoding))
+    response.headers['Content-Encoding'] = encoding
+    return response
+
+
+def install(app):
+    """Use the fast JSON provider and compress responses for `app`
+
+    Call after instrument_app() so request metrics record the compressed size.
+    """
+    app.json = FastJSONProvider(app)
+    app.after_request(compress_response)
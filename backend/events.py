@@ -0,0 +1,187 @@
+"""
+Live event stream for Al Fozan Insights Platform
+One broker thread per process polls the project change log and turns new
+entries into Server-Sent Events: a `project` event per change, with the
+change sequence number as its id, followed by one `kpis` event with the
+new totals and their delta. Events are formatted once and kept in a ring
+buffer that every subscriber reads, so an idle subscriber costs one
+waiting worker thread; at most MAX_SUBSCRIBERS are served per process. A
+client reconnecting with Last-Event-ID is replayed from the ring, or from
+the change log when the ring no longer reaches back that far.
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque, namedtuple
+from itertools import islice
+
+from aggregates import KPI_COLUMNS, get_kpis
+from changes import latest_seq, read_changes
+from db import DB_PATH, connection
+from project_store import row_to_project
+
+BUFFER_SIZE = int(os.environ.get('STREAM_BUFFER_SIZE', 10000))
+POLL_INTERVAL = float(os.environ.get('STREAM_POLL_INTERVAL', 0.5))
+HEARTBEAT_INTERVAL = 15
+
+# Keep well below gunicorn's --threads, so subscribers cannot starve the API
+MAX_SUBSCRIBERS = int(os.environ.get('STREAM_MAX_SUBSCRIBERS', 16))
+
+# Changes turned into events per poll, and replayed from the database on resume
+MAX_BATCH = 1000
+MAX_REPLAY = 10000
+
+# Reconnect delay suggested to EventSource clients, in milliseconds
+RETRY_MS = 3000
+
+logger = logging.getLogger(__name__)
+
+# position numbers every buffered event, seq is the change it follows and
+# event_id the SSE id it was sent with (None for kpis events)
+Event = namedtuple('Event', 'position seq event_id message')
+
+
+def format_event(event, data, event_id=None):
+    """Format one Server-Sent Event"""
+    lines = [f'event: {event}']
+    if event_id is not None:
+        lines.append(f'id: {event_id}')
+    lines.append('data: ' + json.dumps(data, separators=(',', ':'), default=str))
+    return '\n'.join(lines) + '\n\n'
+
+
+def project_events(conn, changes):
+    """Format a `project` event for each change row, with the project's current state"""
+    ids = [change['project_id'] for change in changes if change['op'] != 'delete']
+    rows = conn.execute(
+        'SELECT * FROM projects WHERE id IN (SELECT value FROM json_each(?))', (json.dumps(ids),)
+    ).fetchall()
+    projects = {row['id']: row_to_project(row) for row in rows}
+
+    events = []
+    for change in changes:
+        data = {
+            "id": change['project_id'],
+            "op": change['op'],
+            "columns": change['columns'].split(',') if change['columns'] else None,
+            "changed_at": change['changed_at']
+        }
+        if change['op'] != 'delete':
+            data["project"] = projects.get(change['project_id'])
+        events.append((change['seq'], format_event('project', data, change['seq'])))
+    return events
+
+
+def kpi_event(kpis, previous=None):
+    """Format a `kpis` event; it carries no id, a resumed client gets a fresh one"""
+    delta = {key: kpis[key] - previous[key] for key in (*KPI_COLUMNS, 'sales_rate')} if previous else None
+    return format_event('kpis', {"kpis": kpis, "delta": delta})
+
+
+class EventBroker:
+    """Polls the change log and fans the resulting events out to subscribers"""
+
+    def __init__(self, db_path=DB_PATH, buffer_size=BUFFER_SIZE, poll_interval=POLL_INTERVAL,
+                 max_subscribers=MAX_SUBSCRIBERS):
+        self.db_path = db_path
+        self.poll_interval = poll_interval
+        # Taken by the stream route for each open subscription
+        self.slots = threading.BoundedSemaphore(max_subscribers)
+        self.events = deque(maxlen=buffer_size)
+        self.position = 0
+        self.last_seq = 0
+        self.kpis = None
+        self.condition = threading.Condition()
+        self.lock = threading.Lock()
+        self.pid = None
+
+    def start(self):
+        """Start polling in this process if it is not already running"""
+        with self.lock:
+            # A broker thread does not survive a fork (e.g. gunicorn --preload)
+            if self.pid == os.getpid():
+                return
+            with connection(self.db_path) as conn:
+                self.last_seq = latest_seq(conn)
+                self.kpis = get_kpis(conn)
+            self.events.clear()
+            self.pid = os.getpid()
+            threading.Thread(target=self.run, name='event-broker', daemon=True).start()
+
+    def run(self):
+        while True:
+            try:
+                self.poll()
+            except Exception:
+                logger.exception('Event broker poll failed')
+            time.sleep(self.poll_interval)
+
+    def poll(self):
+        """Buffer events for the changes logged since the last poll"""
+        with connection(self.db_path) as conn:
+            changes = read_changes(conn, self.last_seq, MAX_BATCH)
+            if not changes:
+                return
+            events = project_events(conn, changes)
+            kpis = get_kpis(conn)
+
+        with self.condition:
+            for seq, message in events:
+                self.events.append(Event(self.position, seq, seq, message))
+                self.position += 1
+            self.events.append(Event(self.position, changes[-1]['seq'], None, kpi_event(kpis, self.kpis)))
+            self.position += 1
+            self.last_seq = changes[-1]['seq']
+            self.kpis = kpis
+            self.condition.notify_all()
+
+    def replay(self, last_event_id):
+        """Return (messages after `last_event_id`, position to continue from)"""
+        with self.condition:
+            buffered = list(self.events)
+            position = self.position
+            last_seq = self.last_seq
+        if last_event_id is None or last_event_id >= last_seq:
+            return [], position
+
+        missed = [event for event in buffered if event.seq > last_event_id]
+        if missed and missed[0].event_id == last_event_id + 1:
+            return [event.message for event in missed], position
+
+        # The ring has moved past the client; read the gap from the change log
+        with connection(self.db_path) as conn:
+            changes = read_changes(conn, last_event_id, MAX_REPLAY)
+            changes = [change for change in changes if change['seq'] <= last_seq]
+            if not changes or changes[0]['seq'] != last_event_id + 1 or changes[-1]['seq'] != last_seq:
+                return [format_event('reset', {"last_seq": last_seq})], position
+            messages = [message for _, message in project_events(conn, changes)]
+        return messages, position
+
+    def subscribe(self, last_event_id=None, heartbeat=HEARTBEAT_INTERVAL):
+        """Yield the event stream for one client
+
+        The stream opens with any events the client missed after
+        `last_event_id`, then the current KPIs, then live events. A client too far
+        behind to replay gets a `reset` event and should reload its data.
+        """
+        self.start()
+        missed, position = self.replay(last_event_id)
+        yield f'retry: {RETRY_MS}\n\n' + ''.join(missed) + kpi_event(self.kpis)
+
+        while True:
+            with self.condition:
+                if self.position == position:
+                    self.condition.wait(heartbeat)
+                oldest = self.events[0].position if self.events else self.position
+                if position < oldest:
+                    pending = [format_event('reset', {"last_seq": self.last_seq})]
+                else:
+                    pending = [event.message for event in islice(self.events, position - oldest, None)]
+                position = self.position
+            yield ''.join(pending) if pending else ': keepalive\n\n'
+
+
+broker = EventBroker()
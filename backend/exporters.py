@@ -0,0 +1,65 @@
+"""
+Export writers for Al Fozan Insights Platform
+Rows are pulled from a database cursor in batches and written out as they
+arrive, so memory use does not grow with the size of the export
+"""
+
+import csv
+import io
+import tempfile
+
+from openpyxl import Workbook
+
+# (column, header) pairs written to every export
+EXPORT_COLUMNS = [
+    ('id', 'ID'),
+    ('name', 'Name'),
+    ('location', 'Location'),
+    ('type', 'Type'),
+    ('status', 'Status'),
+    ('units', 'Units'),
+    ('units_sold', 'Sold'),
+    ('budget', 'Budget'),
+]
+
+CHUNK_SIZE = 64 * 1024
+
+
+def iter_csv(rows, batch_size=1000):
+    """Yield CSV text in chunks of roughly `batch_size` rows"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow([header for _, header in EXPORT_COLUMNS])
+
+    pending = 0
+    for row in rows:
+        writer.writerow(row)
+        pending += 1
+        if pending >= batch_size:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+            pending = 0
+
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def iter_xlsx(rows, chunk_size=CHUNK_SIZE):
+    """Yield the bytes of an XLSX workbook built with openpyxl's write-only mode"""
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet('Projects')
+    sheet.append([header for _, header in EXPORT_COLUMNS])
+    for row in rows:
+        sheet.append(list(row))
+
+    # The finished workbook is a zip archive, so it is spooled to disk and
+    # then sent in fixed-size chunks rather than held in memory
+    with tempfile.TemporaryFile() as output:
+        workbook.save(output)
+        output.seek(0)
+        while True:
+            chunk = output.read(chunk_size)
+            if not chunk:
+                break
+            yield chunk
@@ -0,0 +1,163 @@
+"""
+Geospatial queries for Al Fozan Insights Platform
+Projects with coordinates are indexed in the project_locations R*Tree.
+A radius search reads the candidates inside the circle's bounding box from
+the tree and keeps those within the haversine distance. Map viewports are
+answered from project_clusters, a per-zoom grid of marker counts kept by
+delta triggers, so a zoomed-out view costs the same however many projects
+it covers; past the deepest cluster zoom, individual projects are returned.
+"""
+
+import heapq
+import math
+
+from project_store import ValidationError, row_to_project
+from schema import CLUSTER_MAX_ZOOM
+
+EARTH_RADIUS_KM = 6371.0088
+
+DEFAULT_RADIUS_KM = 10
+MAX_RADIUS_KM = 500
+DEFAULT_NEAR_LIMIT = 50
+MAX_NEAR_LIMIT = 1000
+
+# Most individual projects returned for one viewport
+MAX_VIEWPORT_PROJECTS = 1000
+
+MAX_ZOOM = 22
+
+
+def parse_coordinate(value, name, low, high):
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        raise ValidationError(f"Invalid value for '{name}': {value!r}")
+    if not low <= number <= high:
+        raise ValidationError(f"'{name}' must be between {low} and {high}")
+    return number
+
+
+def parse_latitude(value, name='lat'):
+    return parse_coordinate(value, name, -90, 90)
+
+
+def parse_longitude(value, name='lng'):
+    return parse_coordinate(value, name, -180, 180)
+
+
+def haversine_km(lat1, lng1, lat2, lng2):
+    """Great-circle distance between two points in kilometres"""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    d_phi = phi2 - phi1
+    d_lambda = math.radians(lng2 - lng1)
+    a = math.sin(d_phi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(d_lambda / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def longitude_ranges(west, east):
+    """Split a longitude span into ranges that do not cross the antimeridian"""
+    if west <= east:
+        return [(west, east)]
+    return [(west, 180.0), (-180.0, east)]
+
+
+def radius_bounds(lat, lng, radius_km):
+    """Return (south, west, north, east) of a box containing the circle"""
+    d_lat = math.degrees(radius_km / EARTH_RADIUS_KM)
+    south, north = lat - d_lat, lat + d_lat
+    if south <= -90 or north >= 90:
+        # The circle covers a pole, so every longitude is in range
+        return max(south, -90.0), -180.0, min(north, 90.0), 180.0
+    d_lng = math.degrees(math.asin(math.sin(radius_km / EARTH_RADIUS_KM) / math.cos(math.radians(lat))))
+    west, east = lng - d_lng, lng + d_lng
+    if west < -180:
+        west += 360
+    if east > 180:
+        east -= 360
+    return south, west, north, east
+
+
+def projects_in_box(conn, south, west, north, east, limit=None):
+    """Return project rows whose coordinates fall in the box, read through the R*Tree"""
+    rows = []
+    for low, high in longitude_ranges(west, east):
+        sql = """
+            SELECT p.* FROM project_locations AS r JOIN projects AS p ON p.id = r.id
+            WHERE r.min_lat <= ? AND r.max_lat >= ? AND r.min_lng <= ? AND r.max_lng >= ?
+              AND p.latitude BETWEEN ? AND ? AND p.longitude BETWEEN ? AND ?
+        """
+        params = [north, south, high, low, south, north, low, high]
+        if limit is not None:
+            sql += ' LIMIT ?'
+            params.append(limit - len(rows))
+        rows.extend(conn.execute(sql, params).fetchall())
+        if limit is not None and len(rows) >= limit:
+            break
+    return rows
+
+
+def near(conn, lat, lng, radius_km=DEFAULT_RADIUS_KM, limit=DEFAULT_NEAR_LIMIT):
+    """Return the `limit` projects closest to (lat, lng) within `radius_km`, nearest first"""
+    if not 0 < radius_km <= MAX_RADIUS_KM:
+        raise ValidationError(f'radius_km must be greater than 0 and at most {MAX_RADIUS_KM}')
+    if not 1 <= limit <= MAX_NEAR_LIMIT:
+        raise ValidationError(f'limit must be between 1 and {MAX_NEAR_LIMIT}')
+
+    candidates = (
+        (haversine_km(lat, lng, row['latitude'], row['longitude']), row['id'], row)
+        for row in projects_in_box(conn, *radius_bounds(lat, lng, radius_km))
+    )
+    nearest = heapq.nsmallest(limit, (c for c in candidates if c[0] <= radius_km))
+
+    projects = []
+    for distance, _, row in nearest:
+        project = row_to_project(row)
+        project['distance_km'] = round(distance, 3)
+        projects.append(project)
+    return projects
+
+
+def cell_index(value, offset, zoom):
+    """Grid cell of a coordinate at `zoom`, as computed by the cluster triggers"""
+    return int((value + offset) * 2 ** zoom / 90.0)
+
+
+def clusters(conn, south, west, north, east, zoom):
+    """Return the marker clusters of the grid cells overlapping the box at `zoom`"""
+    cells = []
+    y_low, y_high = cell_index(south, 90, zoom), cell_index(north, 90, zoom)
+    for low, high in longitude_ranges(west, east):
+        cells.extend(conn.execute("""
+            SELECT cell_x, cell_y, project_count, sum_lat, sum_lng FROM project_clusters
+            WHERE zoom = ? AND cell_x BETWEEN ? AND ? AND cell_y BETWEEN ? AND ?
+        """, (zoom, cell_index(low, 180, zoom), cell_index(high, 180, zoom), y_low, y_high)).fetchall())
+
+    return [{
+        "latitude": sum_lat / count,
+        "longitude": sum_lng / count,
+        "count": count,
+        "cell": [x, y]
+    } for x, y, count, sum_lat, sum_lng in cells]
+
+
+def viewport(conn, south, west, north, east, zoom=None):
+    """Return what a map shows for a viewport
+
+    Up to CLUSTER_MAX_ZOOM the result holds clusters; deeper zooms, or no
+    zoom at all, return the individual projects, at most
+    MAX_VIEWPORT_PROJECTS of them.
+    """
+    if south > north:
+        raise ValidationError("'south' must not be greater than 'north'")
+    if zoom is not None and not 0 <= zoom <= MAX_ZOOM:
+        raise ValidationError(f'zoom must be between 0 and {MAX_ZOOM}')
+
+    if zoom is not None and zoom <= CLUSTER_MAX_ZOOM:
+        return {"zoom": zoom, "clusters": clusters(conn, south, west, north, east, zoom)}
+
+    rows = projects_in_box(conn, south, west, north, east, MAX_VIEWPORT_PROJECTS + 1)
+    return {
+        "zoom": zoom,
+        "projects": [row_to_project(row) for row in rows[:MAX_VIEWPORT_PROJECTS]],
+        "has_more": len(rows) > MAX_VIEWPORT_PROJECTS
+    }
@@ -0,0 +1,83 @@
+"""
+Import readers for Al Fozan Insights Platform
+Request bodies are read line by line as they arrive and turned into one
+record per row, so an import of any size is parsed in constant memory.
+Each reader yields (row number, record); a row that cannot be parsed
+yields a ValidationError in place of the record so the import can report
+it and carry on.
+"""
+
+import codecs
+import csv
+import json
+
+from exporters import EXPORT_COLUMNS
+from project_store import ValidationError
+
+IMPORT_MIMETYPES = {
+    'application/x-ndjson': 'ndjson',
+    'application/jsonl': 'ndjson',
+    'application/json-seq': 'ndjson',
+    'text/csv': 'csv',
+}
+
+# Export headers map back to their columns, so an export can be re-imported
+HEADER_COLUMNS = {header.lower(): column for column, header in EXPORT_COLUMNS}
+
+READ_SIZE = 256 * 1024
+MAX_LINE_BYTES = 1024 * 1024
+
+
+def iter_lines(stream, read_size=READ_SIZE):
+    """Split a binary stream into lines, reading it in large chunks"""
+    pending = b''
+    while True:
+        chunk = stream.read(read_size)
+        if not chunk:
+            break
+        lines = (pending + chunk).split(b'\n')
+        pending = lines.pop()
+        if len(pending) > MAX_LINE_BYTES:
+            raise ValidationError(f"Line longer than {MAX_LINE_BYTES} bytes")
+        for line in lines:
+            yield line + b'\n'
+    if pending:
+        yield pending
+
+
+def iter_ndjson(lines):
+    """Read one JSON object per line, skipping blank lines"""
+    for number, line in enumerate(lines, 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield number, json.loads(line)
+        except ValueError as e:
+            yield number, ValidationError(f"Invalid JSON: {e}")
+
+
+def iter_csv_rows(lines):
+    """Read CSV rows keyed by their header; row numbers count the header as row 1"""
+    reader = csv.reader(codecs.iterdecode(lines, 'utf-8'))
+    header = next(reader, None)
+    if header is None:
+        return
+    columns = [HEADER_COLUMNS.get(name.strip().lower(), name.strip().lower()) for name in header]
+
+    for number, values in enumerate(reader, 2):
+        if not values:
+            continue
+        if len(values) != len(columns):
+            yield number, ValidationError(f"Expected {len(columns)} fields, got {len(values)}")
+            continue
+        yield number, dict(zip(columns, values))
+
+
+def iter_records(stream, import_format):
+    """Return the (row number, record) pairs read from a binary stream"""
+    if import_format == 'ndjson':
+        return iter_ndjson(iter_lines(stream))
+    if import_format == 'csv':
+        return iter_csv_rows(iter_lines(stream))
+    raise ValueError(f"Unsupported import format: {import_format}")
@@ -0,0 +1,248 @@
+"""
+Instrumentation for Al Fozan Insights Platform
+Counters and histograms kept in process memory and rendered in the
+Prometheus text exposition format. Recording a sample is a dict lookup, a
+bisect and a short critical section, so instrumentation can stay on under
+full load.
+
+Metrics are per process: under gunicorn every worker keeps its own
+registry and /metrics reports the worker that answered the scrape (the
+`pid` label tells them apart). The data processor serves its own registry
+on METRICS_PORT.
+"""
+
+import os
+import re
+import sqlite3
+import threading
+import time
+from bisect import bisect_left
+from functools import lru_cache, wraps
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from flask import Response, g, request
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.1, 0.5, 1, 5)
+JOB_BUCKETS = (0.1, 0.5, 1, 5, 10, 30, 60, 300, 600, 1800, 3600)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+
+
+def format_labels(names, values, extra=None):
+    pairs = list(zip(names, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ''
+    escaped = (str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, v in pairs)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + '}'
+
+
+class Counter:
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def inc(self, *label_values, amount=1):
+        with self.lock:
+            self.values[label_values] = self.values.get(label_values, 0) + amount
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} counter']
+        with self.lock:
+            items = list(self.values.items())
+        for label_values, value in items:
+            lines.append(f'{self.name}{format_labels(self.labels, label_values)} {value}')
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, help_text, labels=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self.buckets = tuple(buckets)
+        # label values -> [per-bucket counts (last is +Inf), sum]
+        self.series = {}
+        self.lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        index = bisect_left(self.buckets, value)
+        with self.lock:
+            series = self.series.get(label_values)
+            if series is None:
+                series = self.series[label_values] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} histogram']
+        with self.lock:
+            items = [(labels, list(counts), total) for labels, (counts, total) in self.series.items()]
+        for label_values, counts, total in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + ('+Inf',), counts):
+                cumulative += bucket_count
+                labels = format_labels(self.labels, label_values, ('le', bound))
+                lines.append(f'{self.name}_bucket{labels} {cumulative}')
+            labels = format_labels(self.labels, label_values)
+            lines.append(f'{self.name}_sum{labels} {total}')
+            lines.append(f'{self.name}_count{labels} {cumulative}')
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+
+    def counter(self, *args, **kwargs):
+        metric = Counter(*args, **kwargs)
+        self.metrics.append(metric)
+        return metric
+
+    def histogram(self, *args, **kwargs):
+        metric = Histogram(*args, **kwargs)
+        self.metrics.append(metric)
+        return metric
+
+    def render(self):
+        lines = [
+            '# HELP process_info Identifies the process these metrics belong to',
+            '# TYPE process_info gauge',
+            f'process_info{{pid="{os.getpid()}"}} 1'
+        ]
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+http_requests = registry.counter(
+    'http_requests_total', 'HTTP requests handled', ('method', 'route', 'status'))
+http_latency = registry.histogram(
+    'http_request_duration_seconds', 'Time spent handling HTTP requests', ('method', 'route'))
+http_response_size = registry.histogram(
+    'http_response_size_bytes', 'Size of HTTP response bodies with a known length', ('method', 'route'),
+    buckets=SIZE_BUCKETS)
+db_query_latency = registry.histogram(
+    'db_query_duration_seconds', 'Time to execute SQL statements, up to the first result row',
+    ('operation', 'table'), buckets=QUERY_BUCKETS)
+job_runs = registry.counter(
+    'job_runs_total', 'Scheduled job runs', ('job', 'outcome'))
+job_duration = registry.histogram(
+    'job_duration_seconds', 'Duration of scheduled jobs', ('job',), buckets=JOB_BUCKETS)
+
+
+TABLE_PATTERN = re.compile(r'\b(?:FROM|INTO|UPDATE)\s+([A-Za-z_][A-Za-z0-9_]*)', re.IGNORECASE)
+
+# Statements labelled with the table they touch; anything else (DDL,
+# PRAGMA, transaction control) only gets an operation label
+DATA_OPERATIONS = {'SELECT', 'INSERT', 'UPDATE', 'DELETE', 'REPLACE', 'WITH'}
+
+
+@lru_cache(maxsize=2048)
+def classify_statement(sql):
+    """Return (operation, table) labels for a SQL statement"""
+    words = sql.split(None, 1)
+    operation = words[0].upper() if words else 'UNKNOWN'
+    match = TABLE_PATTERN.search(sql) if operation in DATA_OPERATIONS else None
+    return operation, match.group(1).lower() if match else ''
+
+
+class TimedCursor(sqlite3.Cursor):
+    def execute(self, sql, *args):
+        started = time.perf_counter()
+        try:
+            return super().execute(sql, *args)
+        finally:
+            db_query_latency.observe(time.perf_counter() - started, *classify_statement(sql))
+
+    def executemany(self, sql, *args):
+        started = time.perf_counter()
+        try:
+            return super().executemany(sql, *args)
+        finally:
+            db_query_latency.observe(time.perf_counter() - started, *classify_statement(sql))
+
+
+class TimedConnection(sqlite3.Connection):
+    """sqlite3 connection that records the duration of every statement it runs"""
+
+    def cursor(self, factory=TimedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, *args):
+        return self.cursor().execute(sql, *args)
+
+    def executemany(self, sql, *args):
+        return self.cursor().executemany(sql, *args)
+
+
+def instrument_app(app):
+    """Record request metrics for every Flask route and serve them at /metrics"""
+    @app.before_request
+    def start_timer():
+        g.metrics_started = time.perf_counter()
+
+    @app.after_request
+    def record_request(response):
+        started = g.pop('metrics_started', None)
+        if started is not None:
+            route = request.url_rule.rule if request.url_rule else 'unmatched'
+            http_latency.observe(time.perf_counter() - started, request.method, route)
+            http_requests.inc(request.method, route, str(response.status_code))
+            if response.content_length is not None:
+                http_response_size.observe(response.content_length, request.method, route)
+        return response
+
+    @app.route('/metrics', methods=['GET'])
+    def metrics():
+        return Response(registry.render(), content_type=CONTENT_TYPE)
+
+
+def timed_job(name):
+    """Decorate a scheduled job to record its duration and outcome"""
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            outcome = 'error'
+            try:
+                result = func(*args, **kwargs)
+                outcome = 'success'
+                return result
+            finally:
+                job_duration.observe(time.perf_counter() - started, name)
+                job_runs.inc(name, outcome)
+        return wrapper
+    return decorator
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split('?')[0] != '/metrics':
+            self.send_error(404)
+            return
+        body = registry.render().encode()
+        self.send_response(200)
+        self.send_header('Content-Type', CONTENT_TYPE)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_http_server(port, host='0.0.0.0'):
+    """Serve /metrics from a background thread, for processes without a Flask app"""
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    thread = threading.Thread(target=server.serve_forever, name='metrics-server', daemon=True)
+    thread.start()
+    return server
@@ -0,0 +1,469 @@
+"""
+Project repository for Al Fozan Insights Platform
+All project reads and writes go through ProjectStore so the API works on the
+same `projects` table as scripts/seed-database.py and the data processor
+"""
+
+import base64
+import json
+import math
+import sqlite3
+from datetime import datetime
+from functools import lru_cache
+from itertools import groupby
+
+from aggregates import get_kpis
+from db import DB_PATH, connection
+
+# Writable columns and the type each one is stored as
+PROJECT_COLUMNS = {
+    'name': str,
+    'type': str,
+    'status': str,
+    'location': str,
+    'budget': float,
+    'progress': int,
+    'units': int,
+    'units_sold': int,
+    'start_date': str,
+    'end_date': str,
+    'manager': str,
+    'latitude': float,
+    'longitude': float,
+}
+
+# Columns whose values must fall in a range
+COLUMN_RANGES = {
+    'latitude': (-90, 90),
+    'longitude': (-180, 180),
+}
+
+# Columns holding an ISO date (YYYY-MM-DD)
+DATE_COLUMNS = ('start_date', 'end_date')
+
+# Range of an SQLite INTEGER
+MIN_INTEGER, MAX_INTEGER = -2 ** 63, 2 ** 63 - 1
+
+REQUIRED_COLUMNS = ('name', 'type', 'status', 'location', 'budget', 'units')
+
+# Columns with a secondary index, accepted as equality filters by page()
+INDEXED_COLUMNS = ('location', 'type', 'status')
+
+# Date range filters accepted by page(), mapped to their SQL condition
+RANGE_FILTERS = {
+    'start_date_from': 'start_date >= ?',
+    'start_date_to': 'start_date <= ?',
+    'end_date_from': 'end_date >= ?',
+    'end_date_to': 'end_date <= ?',
+}
+
+# Fields that can be requested with page(fields=...)
+SELECTABLE_FIELDS = ('id', *PROJECT_COLUMNS, 'created_at', 'version', 'sales_rate')
+
+SALES_RATE_SQL = 'CASE WHEN units > 0 THEN ROUND(units_sold * 100.0 / units, 1) END AS sales_rate'
+
+MAX_PAGE_SIZE = 1000
+
+# Rows written per transaction by bulk_upsert(), and the most row errors it reports
+BULK_BATCH_SIZE = 5000
+MAX_REPORTED_ERRORS = 100
+
+# Most updates accepted by one update_many() call
+MAX_BATCH_UPDATES = 1000
+
+
+class ValidationError(ValueError):
+    """Raised when a project payload or query cannot be handled"""
+
+
+class VersionConflict(Exception):
+    """Raised when a guarded write finds a different version than it expected
+
+    `current` holds what is stored now: the project for a single update, or
+    a list of {id, expected_version, current_version} for a batch.
+    """
+
+    def __init__(self, current):
+        super().__init__('Version conflict')
+        self.current = current
+
+
+def encode_cursor(project_id):
+    """Encode the last id of a page as an opaque pagination cursor"""
+    return base64.urlsafe_b64encode(str(project_id).encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Decode a cursor from encode_cursor() back into a project id"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        project_id = int(base64.urlsafe_b64decode(padded.encode()).decode())
+    except (ValueError, UnicodeError):
+        raise ValidationError('Invalid cursor')
+    if not 0 <= project_id <= MAX_INTEGER:
+        raise ValidationError('Invalid cursor')
+    return project_id
+
+
+def coerce_value(column, value):
+    """Convert a non-empty value to the type of `column`, checking it can be stored"""
+    try:
+        coerced = PROJECT_COLUMNS[column](value)
+        if column in DATE_COLUMNS:
+            # Normalised so dates compare correctly as strings
+            coerced = datetime.strptime(coerced, '%Y-%m-%d').date().isoformat()
+    except (TypeError, ValueError, OverflowError):
+        raise ValidationError(f"Invalid value for '{column}': {value!r}")
+
+    if isinstance(coerced, float) and not math.isfinite(coerced):
+        raise ValidationError(f"'{column}' must be a finite number")
+    if isinstance(coerced, int) and not MIN_INTEGER <= coerced <= MAX_INTEGER:
+        raise ValidationError(f"'{column}' must be between {MIN_INTEGER} and {MAX_INTEGER}")
+    if column in COLUMN_RANGES:
+        low, high = COLUMN_RANGES[column]
+        if not low <= coerced <= high:
+            raise ValidationError(f"'{column}' must be between {low} and {high}")
+    return coerced
+
+
+def validate_project(data, partial=False):
+    """Return the storable columns of `data`, coerced to their column types"""
+    if not isinstance(data, dict):
+        raise ValidationError('Expected a JSON object')
+
+    values = {}
+    for column, value in data.items():
+        if column not in PROJECT_COLUMNS:
+            continue
+        if value is None or value == '':
+            values[column] = None
+            continue
+        values[column] = coerce_value(column, value)
+
+    units, units_sold = values.get('units'), values.get('units_sold')
+    if units is not None and units_sold is not None and units_sold > units:
+        raise ValidationError("'units_sold' cannot be greater than 'units'")
+
+    required = [c for c in REQUIRED_COLUMNS if c in values or not partial]
+    missing = [c for c in required if values.get(c) is None]
+    if missing:
+        raise ValidationError(f"Missing required fields: {', '.join(missing)}")
+    if not values:
+        raise ValidationError('No project fields to store')
+    return values
+
+
+def parse_project_id(value, field='id'):
+    """Coerce an explicit project id (or version) from a request payload"""
+    try:
+        project_id = int(value)
+    except (TypeError, ValueError, OverflowError):
+        project_id = 0
+    if not 0 < project_id <= MAX_INTEGER:
+        raise ValidationError(f"Invalid value for '{field}': {value!r}")
+    return project_id
+
+
+def project_etag(project):
+    """Entity tag identifying one version of a project"""
+    return f"{project['id']}-{project['version']}"
+
+
+@lru_cache(maxsize=64)
+def upsert_sql(columns, batched=False):
+    """INSERT statement for `columns` that updates the same columns when the id exists
+
+    The batched form reads its rows from a JSON array of arrays bound as the
+    only parameter, so a whole batch is one statement.
+    """
+    assignments = ', '.join([*(f'{c} = excluded.{c}' for c in columns if c != 'id'), 'version = projects.version + 1'])
+    if batched:
+        values = ', '.join(f'value ->> {i}' for i in range(len(columns)))
+        # WHERE true keeps ON CONFLICT from being parsed as part of the SELECT
+        source = f"SELECT {values} FROM json_each(?) WHERE true"
+    else:
+        source = f"VALUES ({', '.join('?' for _ in columns)})"
+    return f"INSERT INTO projects ({', '.join(columns)}) {source} ON CONFLICT(id) DO UPDATE SET {assignments}"
+
+
+def row_to_project(row):
+    """Convert a projects row to the API representation"""
+    project = dict(row)
+    units = project.get('units')
+    if units and project.get('units_sold') is not None:
+        project['sales_rate'] = round(project['units_sold'] * 100.0 / units, 1)
+    return project
+
+
+class ProjectStore:
+    def __init__(self, db_path=DB_PATH):
+        self.db_path = db_path
+
+    def get(self, project_id):
+        """Look up one project by primary key"""
+        with connection(self.db_path) as conn:
+            row = conn.execute('SELECT * FROM projects WHERE id = ?', (project_id,)).fetchone()
+        return row_to_project(row) if row else None
+
+    def page(self, filters=None, after_id=0, limit=100, fields=None):
+        """Return (projects, has_more) for up to `limit` projects with id > after_id
+
+        `filters` may hold equality filters on INDEXED_COLUMNS and the date
+        bounds in RANGE_FILTERS; `fields` restricts the returned columns.
+        Pages are read in primary-key order. Unfiltered and equality-filtered
+        pages seek straight to after_id, since every index ends in the rowid;
+        no index orders date ranges by id, so SQLite either walks the primary
+        key testing each row or sorts the date index matches; such a page
+        can cost up to a table scan rather than just the page size.
+        """
+        filters = filters or {}
+        limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+
+        conditions = ['id > ?']
+        params = [after_id]
+        for name, value in filters.items():
+            if name in INDEXED_COLUMNS:
+                conditions.append(f'{name} = ?')
+            elif name in RANGE_FILTERS:
+                try:
+                    datetime.strptime(value, '%Y-%m-%d')
+                except (TypeError, ValueError):
+                    raise ValidationError(f"Invalid date for '{name}': {value!r}")
+                conditions.append(RANGE_FILTERS[name])
+            else:
+                raise ValidationError(f"Cannot filter on: {name}")
+            params.append(value)
+
+        if fields:
+            unknown = set(fields) - set(SELECTABLE_FIELDS)
+            if unknown:
+                raise ValidationError(f"Unknown fields: {', '.join(sorted(unknown))}")
+            # id is always returned so the client can build the next cursor
+            selected = ['id'] + [f for f in dict.fromkeys(fields) if f != 'id']
+            columns = ', '.join(SALES_RATE_SQL if f == 'sales_rate' else f for f in selected)
+        else:
+            columns = f'*, {SALES_RATE_SQL}'
+
+        with connection(self.db_path) as conn:
+            rows = conn.execute(
+                f"SELECT {columns} FROM projects WHERE {' AND '.join(conditions)} ORDER BY id LIMIT ?",
+                (*params, limit + 1)
+            ).fetchall()
+
+        projects = [dict(row) for row in rows[:limit]]
+        return projects, len(rows) > limit
+
+    def iter_rows(self, columns, batch_size=1000):
+        """Yield tuples of `columns` for every project, fetching `batch_size` rows at a time"""
+        unknown = set(columns) - set(PROJECT_COLUMNS) - {'id', 'created_at'}
+        if unknown:
+            raise ValidationError(f"Unknown columns: {', '.join(sorted(unknown))}")
+
+        with connection(self.db_path) as conn:
+            cursor = conn.execute(f"SELECT {', '.join(columns)} FROM projects ORDER BY id")
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                for row in rows:
+                    yield tuple(row)
+
+    def kpis(self):
+        """Return the incrementally maintained portfolio KPIs"""
+        with connection(self.db_path) as conn:
+            return get_kpis(conn)
+
+    def create(self, data):
+        """Insert a project and return it"""
+        values = validate_project(data)
+        columns = ', '.join(values)
+        placeholders = ', '.join('?' for _ in values)
+        with connection(self.db_path) as conn:
+            with conn:
+                cursor = conn.execute(
+                    f'INSERT INTO projects ({columns}) VALUES ({placeholders})',
+                    tuple(values.values())
+                )
+            row = conn.execute('SELECT * FROM projects WHERE id = ?', (cursor.lastrowid,)).fetchone()
+        return row_to_project(row)
+
+    def update(self, project_id, data, expected_version=None):
+        """Update the given fields of a project; returns None if it does not exist
+
+        With `expected_version` the update only applies while the stored
+        version still matches, otherwise VersionConflict is raised.
+        """
+        values = validate_project(data, partial=True)
+        assignments = ', '.join(f'{column} = ?' for column in values)
+        where, params = 'id = ?', [project_id]
+        if expected_version is not None:
+            where += ' AND version = ?'
+            params.append(expected_version)
+
+        with connection(self.db_path) as conn:
+            with conn:
+                cursor = conn.execute(
+                    f'UPDATE projects SET {assignments}, version = version + 1 WHERE {where}',
+                    (*values.values(), *params)
+                )
+            row = conn.execute('SELECT * FROM projects WHERE id = ?', (project_id,)).fetchone()
+        if row is None:
+            return None
+        if cursor.rowcount == 0:
+            raise VersionConflict(row_to_project(row))
+        return row_to_project(row)
+
+    def update_many(self, updates):
+        """Apply a list of {id, version, fields...} updates in one transaction
+
+        Each update whose version is given only applies while the project
+        still has that version. If any update conflicts or names a missing
+        project nothing is written and VersionConflict lists the failures.
+        Returns [{id, version}] with the new versions.
+        """
+        if not isinstance(updates, list) or not updates:
+            raise ValidationError('Expected a non-empty list of updates')
+        if len(updates) > MAX_BATCH_UPDATES:
+            raise ValidationError(f'At most {MAX_BATCH_UPDATES} updates per request')
+
+        statements = []
+        for index, update in enumerate(updates):
+            try:
+                values = validate_project(update, partial=True)
+                project_id = parse_project_id(update.get('id'))
+                version = update.get('version')
+                version = parse_project_id(version, 'version') if version is not None else None
+            except ValidationError as e:
+                raise ValidationError(f'Update {index}: {e}')
+            statements.append((project_id, version, values))
+
+        updated, conflicts = [], []
+        with connection(self.db_path) as conn:
+            with conn:
+                conn.execute('BEGIN IMMEDIATE')
+                for project_id, version, values in statements:
+                    assignments = ', '.join(f'{column} = ?' for column in values)
+                    where, params = 'id = ?', [project_id]
+                    if version is not None:
+                        where += ' AND version = ?'
+                        params.append(version)
+                    rows = conn.execute(
+                        f'UPDATE projects SET {assignments}, version = version + 1 WHERE {where} RETURNING version',
+                        (*values.values(), *params)
+                    ).fetchall()
+                    if rows:
+                        updated.append({"id": project_id, "version": rows[0][0]})
+                        continue
+                    current = conn.execute('SELECT version FROM projects WHERE id = ?', (project_id,)).fetchone()
+                    conflicts.append({
+                        "id": project_id,
+                        "expected_version": version,
+                        "current_version": current[0] if current else None
+                    })
+                if conflicts:
+                    conn.rollback()
+        if conflicts:
+            raise VersionConflict(conflicts)
+        return updated
+
+    def delete(self, project_id, expected_version=None):
+        """Delete a project; returns False if it did not exist
+
+        With `expected_version` a project with any other version is kept and
+        VersionConflict is raised.
+        """
+        where, params = 'id = ?', [project_id]
+        if expected_version is not None:
+            where += ' AND version = ?'
+            params.append(expected_version)
+        with connection(self.db_path) as conn:
+            with conn:
+                cursor = conn.execute(f'DELETE FROM projects WHERE {where}', params)
+            if cursor.rowcount == 0 and expected_version is not None:
+                row = conn.execute('SELECT * FROM projects WHERE id = ?', (project_id,)).fetchone()
+                if row is not None:
+                    raise VersionConflict(row_to_project(row))
+        return cursor.rowcount > 0
+
+    def seed(self, projects):
+        """Insert `projects` if the table is empty; safe to call from every worker"""
+        with connection(self.db_path) as conn:
+            with conn:
+                # Take the write lock before checking so concurrently starting
+                # workers cannot both see an empty table
+                conn.execute('BEGIN IMMEDIATE')
+                if conn.execute('SELECT 1 FROM projects LIMIT 1').fetchone() is None:
+                    for project in projects:
+                        values = validate_project(project)
+                        conn.execute(
+                            f"INSERT INTO projects ({', '.join(values)}) "
+                            f"VALUES ({', '.join('?' for _ in values)})",
+                            tuple(values.values())
+                        )
+
+    def bulk_upsert(self, records, batch_size=BULK_BATCH_SIZE, max_errors=MAX_REPORTED_ERRORS):
+        """Validate and store (row number, data) pairs, `batch_size` rows per transaction
+
+        Rows carrying an id update that project (or create it with that id);
+        rows without one are inserted. `records` is consumed lazily, so memory
+        use is bounded by the batch size. Returns a report with the row
+        counts and up to `max_errors` row errors.
+        """
+        report = {"received": 0, "upserted": 0, "failed": 0, "errors": [], "errors_truncated": False}
+
+        def fail(number, message):
+            report['failed'] += 1
+            if len(report['errors']) < max_errors:
+                report['errors'].append({"row": number, "error": message})
+            else:
+                report['errors_truncated'] = True
+
+        with connection(self.db_path) as conn:
+            batch = []
+            for number, data in records:
+                report['received'] += 1
+                try:
+                    if isinstance(data, Exception):
+                        raise data
+                    values = validate_project(data)
+                    if data.get('id') not in (None, ''):
+                        values = {'id': parse_project_id(data['id']), **values}
+                except ValidationError as e:
+                    fail(number, str(e))
+                    continue
+
+                batch.append((number, tuple(values), tuple(values.values())))
+                if len(batch) >= batch_size:
+                    report['upserted'] += self.write_batch(conn, batch, fail)
+                    batch = []
+            if batch:
+                report['upserted'] += self.write_batch(conn, batch, fail)
+        return report
+
+    @staticmethod
+    def write_batch(conn, batch, fail):
+        """Write one batch in a transaction; returns the number of rows stored"""
+        written = 0
+        with conn:
+            conn.execute('BEGIN IMMEDIATE')
+            # Consecutive rows with the same columns are written by one
+            # statement; row-at-a-time inserts would pay for the triggers'
+            # statement journal on every row
+            for columns, group in groupby(batch, key=lambda row: row[1]):
+                group = list(group)
+                conn.execute('SAVEPOINT bulk_rows')
+                try:
+                    conn.execute(upsert_sql(columns, batched=True), (json.dumps([params for _, _, params in group]),))
+                    written += len(group)
+                except (sqlite3.Error, ValueError):
+                    # Redo the group row by row to find the rows at fault
+                    conn.execute('ROLLBACK TO bulk_rows')
+                    sql = upsert_sql(columns)
+                    for number, _, params in group:
+                        try:
+                            conn.execute(sql, params)
+                            written += 1
+                        except (sqlite3.Error, OverflowError, ValueError) as e:
+                            fail(number, str(e))
+                conn.execute('RELEASE bulk_rows')
+        return written
@@ -0,0 +1,155 @@
+"""
+Conditional-GET response cache for Al Fozan Insights Platform
+Responses are cached per worker, keyed on the request and the version
+counters of the datasets they are built from. The ETag is derived from the
+same key, so an unchanged poll is answered with 304 before any data is
+read or serialized. Compressed variants of a cached body are kept in the
+same entry, so each one is compressed once rather than on every hit.
+"""
+
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from datetime import datetime, timezone
+from functools import wraps
+
+from flask import Response, request
+
+from db import DB_PATH, connection
+from encoding import MIN_COMPRESS_BYTES, compress, negotiate
+
+DEFAULT_MAX_BYTES = int(os.environ.get('RESPONSE_CACHE_MAX_BYTES', 32 * 1024 * 1024))
+
+
+class CachedResponse:
+    __slots__ = ('body', 'mimetype', 'etag', 'last_modified', 'variants')
+
+    def __init__(self, body, mimetype, etag, last_modified):
+        self.body = body
+        self.mimetype = mimetype
+        self.etag = etag
+        self.last_modified = last_modified
+        # content coding -> compressed body
+        self.variants = {}
+
+    @property
+    def size(self):
+        return len(self.body) + sum(len(data) for data in self.variants.values())
+
+
+class ResponseCache:
+    """Thread-safe LRU of response bodies bounded by their total size in bytes"""
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES, db_path=DB_PATH):
+        self.max_bytes = max_bytes
+        self.db_path = db_path
+        self.size = 0
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                self.entries.move_to_end(key)
+            return entry
+
+    def put(self, key, entry):
+        size = entry.size
+        if size > self.max_bytes:
+            return
+        with self.lock:
+            previous = self.entries.pop(key, None)
+            if previous is not None:
+                self.size -= previous.size
+            self.entries[key] = entry
+            self.size += size
+            self.evict()
+
+    def evict(self):
+        while self.size > self.max_bytes:
+            _, evicted = self.entries.popitem(last=False)
+            self.size -= evicted.size
+
+    def variant(self, key, entry, encoding):
+        """Return the body of `entry` compressed with `encoding`, compressing it at most once"""
+        data = entry.variants.get(encoding)
+        if data is not None:
+            return data
+        data = compress(entry.body, encoding)
+        with self.lock:
+            if encoding not in entry.variants and self.entries.get(key) is entry:
+                entry.variants[encoding] = data
+                self.size += len(data)
+                self.evict()
+        return data
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.size = 0
+
+    def dataset_versions(self, datasets):
+        """Return ({dataset: version}, last modified time) for the given datasets"""
+        placeholders = ', '.join('?' for _ in datasets)
+        with connection(self.db_path) as conn:
+            rows = conn.execute(
+                f'SELECT name, version, updated_at FROM dataset_versions WHERE name IN ({placeholders})',
+                tuple(datasets)
+            ).fetchall()
+
+        versions = {row['name']: row['version'] for row in rows}
+        updated = [row['updated_at'] for row in rows if row['updated_at']]
+        last_modified = None
+        if updated:
+            last_modified = datetime.strptime(max(updated), '%Y-%m-%d %H:%M:%S').replace(tzinfo=timezone.utc)
+        return versions, last_modified
+
+    def cached(self, *datasets):
+        """Decorate a GET view whose response depends only on `datasets` and the request URL"""
+        def decorator(view):
+            @wraps(view)
+            def wrapper(*args, **kwargs):
+                versions, last_modified = self.dataset_versions(datasets)
+                key = (request.path, request.query_string, tuple(sorted(versions.items())))
+                etag = hashlib.blake2b(repr(key).encode(), digest_size=12).hexdigest()
+
+                entry = self.get(key)
+                if etag in request.if_none_match:
+                    response = self.make_response(None, etag, last_modified, status=304)
+                    # A 304 carries the Vary of the 200 it revalidates; when
+                    # that body is no longer cached, assume it was compressible
+                    if entry is None or len(entry.body) >= MIN_COMPRESS_BYTES:
+                        response.vary.add('Accept-Encoding')
+                    return response
+
+                if entry is None:
+                    response = view(*args, **kwargs)
+                    if not isinstance(response, Response) or response.status_code != 200:
+                        return response
+                    entry = CachedResponse(response.get_data(), response.mimetype, etag, last_modified)
+                    self.put(key, entry)
+
+                response = self.make_response(entry, etag, last_modified)
+                if len(entry.body) >= MIN_COMPRESS_BYTES:
+                    response.vary.add('Accept-Encoding')
+                    encoding = negotiate()
+                    if encoding is not None:
+                        response.set_data(self.variant(key, entry, encoding))
+                        response.headers['Content-Encoding'] = encoding
+                return response
+            return wrapper
+        return decorator
+
+    @staticmethod
+    def make_response(entry, etag, last_modified, status=200):
+        if entry is None:
+            response = Response(status=status)
+        else:
+            response = Response(entry.body, status=status, mimetype=entry.mimetype)
+        response.set_etag(etag)
+        response.last_modified = last_modified
+        # Clients may keep the response but must revalidate it on every use
+        response.headers['Cache-Control'] = 'no-cache'
+        return response
@@ -0,0 +1,205 @@
+"""
+Job scheduler for the Al Fozan data processor
+Runs scheduled jobs on a thread pool so a slow job does not hold up the
+others. A job never overlaps with itself, including when its work is also
+called directly under JobScheduler.exclusive, and runs missed while the
+process was stalled are skipped or caught up according to the job's
+misfire policy. A thread cannot be stopped, so a run past its timeout is
+ended through its database work instead: SQL it runs after the deadline is
+interrupted, the run fails and the job is free to run again.
+"""
+
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from db import deadline
+from metrics import job_runs
+
+# Misfire policies: what to do with runs whose time passed while the
+# scheduler was stalled or the previous run was still going
+MISFIRE_SKIP = 'skip'          # drop missed runs, wait for the next slot
+MISFIRE_RUN_ONCE = 'run_once'  # run once for any number of missed slots
+MISFIRE_CATCH_UP = 'catch_up'  # run once per missed slot
+
+MISFIRE_POLICIES = (MISFIRE_SKIP, MISFIRE_RUN_ONCE, MISFIRE_CATCH_UP)
+
+# A run this late still counts as on time under MISFIRE_SKIP
+DEFAULT_GRACE = timedelta(minutes=1)
+
+
+class Job:
+    def __init__(self, name, func, interval=None, at=None, timeout=None,
+                 misfire=MISFIRE_SKIP, grace=DEFAULT_GRACE):
+        if (interval is None) == (at is None):
+            raise ValueError("A job needs exactly one of interval or at")
+        if misfire not in MISFIRE_POLICIES:
+            raise ValueError(f"Unknown misfire policy: {misfire}")
+
+        self.name = name
+        self.func = func
+        self.interval = interval
+        self.at = datetime.strptime(at, '%H:%M').time() if at else None
+        self.timeout = timeout
+        self.misfire = misfire
+        self.grace = grace
+
+        self.next_run = None
+        self.pending = 0
+        # Held while the job's function runs, from the scheduler or a direct call
+        self.lock = threading.Lock()
+        self.running = False
+        self.started_at = None
+        self.timed_out = False
+        self.last_duration = None
+        self.last_finished = None
+
+    def slot_after(self, moment):
+        """Return the first scheduled time strictly after `moment`"""
+        if self.interval is not None:
+            return moment + self.interval
+        candidate = datetime.combine(moment.date(), self.at)
+        if candidate <= moment:
+            candidate += timedelta(days=1)
+        return candidate
+
+    def due_slots(self, now):
+        """Return how many slots have passed up to `now` and advance next_run past them"""
+        slots = 0
+        while self.next_run <= now:
+            slots += 1
+            last_slot = self.next_run
+            self.next_run = self.slot_after(self.next_run)
+        return slots, (last_slot if slots else None)
+
+    def describe(self):
+        if self.interval is not None:
+            return f"every {self.interval}"
+        return f"daily at {self.at.strftime('%H:%M')}"
+
+
+class JobScheduler:
+    def __init__(self, max_workers=4, logger=None):
+        self.jobs = []
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='job')
+        self.lock = threading.Lock()
+        self.stopped = threading.Event()
+        self.logger = logger or logging.getLogger(__name__)
+
+    def every(self, interval, name, func, **options):
+        """Run `func` every `interval` (a timedelta)"""
+        return self.add(Job(name, func, interval=interval, **options))
+
+    def daily(self, at, name, func, **options):
+        """Run `func` every day at `at` ('HH:MM', local time)"""
+        return self.add(Job(name, func, at=at, **options))
+
+    def add(self, job):
+        job.next_run = job.slot_after(datetime.now())
+        self.jobs.append(job)
+        return job
+
+    def run_pending(self, now=None):
+        """Start every job whose time has come; returns the number of runs started"""
+        now = now or datetime.now()
+        started = 0
+        with self.lock:
+            for job in self.jobs:
+                self.check_timeout(job)
+                slots, last_slot = job.due_slots(now)
+                if slots:
+                    job.pending += self.runs_for(job, slots, last_slot, now)
+                if job.pending and not job.running and not job.lock.locked():
+                    job.pending -= 1
+                    self.start(job)
+                    started += 1
+        return started
+
+    def runs_for(self, job, slots, last_slot, now):
+        """Apply the misfire policy to `slots` newly due slots"""
+        if job.misfire == MISFIRE_CATCH_UP:
+            return slots
+
+        missed = slots - 1
+        late = now - last_slot > job.grace
+        if job.misfire == MISFIRE_SKIP and (late or job.running or job.pending):
+            missed = slots
+        if missed:
+            job_runs.inc(job.name, 'skipped', amount=missed)
+            action = 'Coalesced' if job.misfire == MISFIRE_RUN_ONCE else 'Skipped'
+            self.logger.warning(f"{action} {missed} missed run(s) of {job.name}")
+        if job.misfire == MISFIRE_RUN_ONCE:
+            return 0 if job.pending else 1
+        return slots - missed
+
+    def start(self, job):
+        job.running = True
+        job.timed_out = False
+        job.started_at = time.monotonic()
+        self.executor.submit(self.execute, job)
+
+    def execute(self, job):
+        try:
+            with job.lock, deadline(job.timeout):
+                job.func()
+        except Exception as e:
+            self.logger.error(f"Job {job.name} failed: {e}")
+        finally:
+            duration = time.monotonic() - job.started_at
+            with self.lock:
+                job.running = False
+                job.last_duration = duration
+                job.last_finished = datetime.now()
+            self.logger.info(f"Job {job.name} finished in {duration:.1f}s")
+
+    def check_timeout(self, job):
+        """Report a run that has exceeded its timeout
+
+        The run's SQL is interrupted at the deadline; until its thread gets
+        back to the database and fails, it keeps holding off further runs.
+        """
+        if not job.running or job.timed_out or job.timeout is None:
+            return
+        if time.monotonic() - job.started_at > job.timeout:
+            job.timed_out = True
+            job_runs.inc(job.name, 'timeout')
+            self.logger.error(f"Job {job.name} has exceeded its {job.timeout}s timeout")
+
+    def exclusive(self, name):
+        """Return the named job's lock; hold it to run the job's work outside
+        the scheduler without overlapping a scheduled run"""
+        with self.lock:
+            for job in self.jobs:
+                if job.name == name:
+                    return job.lock
+        raise ValueError(f"Unknown job: {name}")
+
+    def run_now(self, name):
+        """Queue an immediate run of the named job"""
+        with self.lock:
+            for job in self.jobs:
+                if job.name == name:
+                    job.pending += 1
+
+    def seconds_until_next(self, now=None):
+        """Seconds until the next job is due; infinite when there are no jobs"""
+        now = now or datetime.now()
+        with self.lock:
+            if any(job.pending for job in self.jobs):
+                return 1
+            upcoming = min((job.next_run for job in self.jobs), default=None)
+        if upcoming is None:
+            return float('inf')
+        return max(0.0, (upcoming - now).total_seconds())
+
+    def run_forever(self, max_sleep=60):
+        """Dispatch jobs until stop() is called"""
+        while not self.stopped.is_set():
+            self.run_pending()
+            self.stopped.wait(min(max_sleep, max(1, self.seconds_until_next())))
+
+    def stop(self, wait=True):
+        self.stopped.set()
+        self.executor.shutdown(wait=wait)
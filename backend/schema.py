@@ -0,0 +1,636 @@
+"""
+Database schema for Al Fozan Insights Platform
+Each entry in MIGRATIONS upgrades the database by one version; the applied
+version is tracked in PRAGMA user_version
+"""
+
+import sqlite3
+
+# Time-series rollup tables and the length of their bucket key, a prefix of
+# the sample timestamp ('YYYY-MM-DD HH:MM:SS')
+ROLLUP_TABLES = (
+    ('metric_rollups_daily', 10),
+    ('metric_rollups_monthly', 7),
+    ('metric_rollups_yearly', 4),
+)
+
+
+def rollup_insert_sql():
+    """Statements folding a newly inserted sample into every rollup"""
+    return ''.join(f"""
+        INSERT INTO {table}
+            (metric_type, bucket, sample_count, total, minimum, maximum, last_value, last_at)
+        VALUES (NEW.metric_type, substr(NEW.recorded_at, 1, {length}), 1,
+                NEW.value, NEW.value, NEW.value, NEW.value, NEW.recorded_at)
+        ON CONFLICT(metric_type, bucket) DO UPDATE SET
+            sample_count = sample_count + 1,
+            total = total + excluded.total,
+            minimum = MIN(minimum, excluded.minimum),
+            maximum = MAX(maximum, excluded.maximum),
+            last_value = CASE WHEN excluded.last_at >= last_at THEN excluded.last_value ELSE last_value END,
+            last_at = MAX(last_at, excluded.last_at);
+""" for table, length in ROLLUP_TABLES)
+
+
+def rollup_recompute_sql(ref):
+    """Statements rebuilding the rollup buckets of sample `ref` (OLD or NEW) from the raw samples"""
+    statements = []
+    for table, length in ROLLUP_TABLES:
+        bucket = f"substr({ref}.recorded_at, 1, {length})"
+        in_bucket = (f"metric_type = {ref}.metric_type "
+                     f"AND recorded_at BETWEEN {bucket} AND {bucket} || '~'")
+        statements.append(f"""
+        DELETE FROM {table} WHERE metric_type = {ref}.metric_type AND bucket = {bucket};
+        INSERT INTO {table}
+            (metric_type, bucket, sample_count, total, minimum, maximum, last_value, last_at)
+        SELECT {ref}.metric_type, {bucket}, COUNT(*), SUM(value), MIN(value), MAX(value),
+               (SELECT value FROM metric_samples WHERE {in_bucket} ORDER BY recorded_at DESC LIMIT 1),
+               (SELECT MAX(recorded_at) FROM metric_samples WHERE {in_bucket})
+        FROM metric_samples WHERE {in_bucket}
+        HAVING COUNT(*) > 0;
+""")
+    return ''.join(statements)
+
+
+def rollup_table_sql():
+    return ''.join(f"""
+    CREATE TABLE IF NOT EXISTS {table} (
+        metric_type TEXT NOT NULL,
+        bucket TEXT NOT NULL,
+        sample_count INTEGER NOT NULL,
+        total REAL NOT NULL,
+        minimum REAL NOT NULL,
+        maximum REAL NOT NULL,
+        last_value REAL NOT NULL,
+        last_at TEXT NOT NULL,
+        PRIMARY KEY (metric_type, bucket)
+    ) WITHOUT ROWID;
+""" for table, _ in ROLLUP_TABLES)
+
+
+# Project columns whose updates are recorded in project_changes
+TRACKED_COLUMNS = ('name', 'type', 'status', 'location', 'budget', 'progress', 'units',
+                   'units_sold', 'start_date', 'end_date', 'manager')
+
+
+def changed_columns_sql(columns=TRACKED_COLUMNS):
+    """Expression listing the `columns` an UPDATE changed, comma separated"""
+    cases = ' || '.join(f"CASE WHEN OLD.{c} IS NOT NEW.{c} THEN '{c},' ELSE '' END" for c in columns)
+    return f"rtrim({cases}, ',')"
+
+
+# Map marker clusters are kept for zoom levels 0 to CLUSTER_MAX_ZOOM, on a
+# grid of 90 / 2**zoom degree cells (four cells across a map tile)
+CLUSTER_MAX_ZOOM = 14
+
+
+def cluster_cell_sql(ref, zoom):
+    """(x, y) expressions for the grid cell holding project `ref` at `zoom`"""
+    return (f"CAST(({ref}.longitude + 180) * {2 ** zoom} / 90.0 AS INTEGER)",
+            f"CAST(({ref}.latitude + 90) * {2 ** zoom} / 90.0 AS INTEGER)")
+
+
+def cluster_delta_sql(ref, sign):
+    """Statements adding (sign 1) or removing (sign -1) project `ref` from its cell at every zoom"""
+    statements = []
+    for zoom in range(CLUSTER_MAX_ZOOM + 1):
+        x, y = cluster_cell_sql(ref, zoom)
+        statements.append(f"""
+        INSERT INTO project_clusters (zoom, cell_x, cell_y, project_count, sum_lat, sum_lng)
+        SELECT {zoom}, {x}, {y}, {sign}, {sign} * {ref}.latitude, {sign} * {ref}.longitude
+        WHERE {ref}.latitude IS NOT NULL AND {ref}.longitude IS NOT NULL
+        ON CONFLICT(zoom, cell_x, cell_y) DO UPDATE SET
+            project_count = project_count + excluded.project_count,
+            sum_lat = sum_lat + excluded.sum_lat,
+            sum_lng = sum_lng + excluded.sum_lng;
+""")
+        if sign < 0:
+            statements.append(f"""
+        DELETE FROM project_clusters WHERE zoom = {zoom} AND cell_x = {x} AND cell_y = {y} AND project_count = 0;
+""")
+    return ''.join(statements)
+
+
+MIGRATIONS = [
+    # 1: base tables, same layout as scripts/seed-database.py, plus lookup indexes
+    """
+    CREATE TABLE IF NOT EXISTS projects (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT NOT NULL,
+        type TEXT NOT NULL,
+        status TEXT NOT NULL,
+        location TEXT NOT NULL,
+        budget REAL NOT NULL,
+        progress INTEGER DEFAULT 0,
+        units INTEGER NOT NULL,
+        units_sold INTEGER DEFAULT 0,
+        start_date DATE,
+        end_date DATE,
+        manager TEXT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    );
+
+    CREATE TABLE IF NOT EXISTS competitors (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT NOT NULL,
+        market_share REAL,
+        digital_presence INTEGER,
+        website TEXT,
+        recent_activity TEXT,
+        trend TEXT,
+        change_percentage TEXT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    );
+
+    CREATE TABLE IF NOT EXISTS analytics (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        metric_type TEXT NOT NULL,
+        metric_value REAL NOT NULL,
+        period TEXT NOT NULL,
+        category TEXT,
+        recorded_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    );
+
+    CREATE INDEX IF NOT EXISTS idx_projects_location ON projects(location);
+    CREATE INDEX IF NOT EXISTS idx_projects_type ON projects(type);
+    CREATE INDEX IF NOT EXISTS idx_projects_status ON projects(status);
+    """,
+
+    # 2: portfolio KPI totals, kept up to date by delta triggers on projects
+    """
+    CREATE TABLE IF NOT EXISTS project_kpis (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        total_projects INTEGER NOT NULL DEFAULT 0,
+        total_revenue REAL NOT NULL DEFAULT 0,
+        total_units INTEGER NOT NULL DEFAULT 0,
+        total_units_sold INTEGER NOT NULL DEFAULT 0
+    );
+
+    INSERT OR REPLACE INTO project_kpis
+        (id, total_projects, total_revenue, total_units, total_units_sold)
+    SELECT 1,
+           COUNT(*),
+           COALESCE(SUM(budget * COALESCE(progress, 0) / 100.0), 0),
+           COALESCE(SUM(units), 0),
+           COALESCE(SUM(units_sold), 0)
+    FROM projects;
+
+    CREATE TRIGGER IF NOT EXISTS project_kpis_insert AFTER INSERT ON projects
+    BEGIN
+        UPDATE project_kpis SET
+            total_projects = total_projects + 1,
+            total_revenue = total_revenue + NEW.budget * COALESCE(NEW.progress, 0) / 100.0,
+            total_units = total_units + NEW.units,
+            total_units_sold = total_units_sold + COALESCE(NEW.units_sold, 0)
+        WHERE id = 1;
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS project_kpis_update
+    AFTER UPDATE OF budget, progress, units, units_sold ON projects
+    BEGIN
+        UPDATE project_kpis SET
+            total_revenue = total_revenue
+                - OLD.budget * COALESCE(OLD.progress, 0) / 100.0
+                + NEW.budget * COALESCE(NEW.progress, 0) / 100.0,
+            total_units = total_units - OLD.units + NEW.units,
+            total_units_sold = total_units_sold
+                - COALESCE(OLD.units_sold, 0) + COALESCE(NEW.units_sold, 0)
+        WHERE id = 1;
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS project_kpis_delete AFTER DELETE ON projects
+    BEGIN
+        UPDATE project_kpis SET
+            total_projects = total_projects - 1,
+            total_revenue = total_revenue - OLD.budget * COALESCE(OLD.progress, 0) / 100.0,
+            total_units = total_units - OLD.units,
+            total_units_sold = total_units_sold - COALESCE(OLD.units_sold, 0)
+        WHERE id = 1;
+    END;
+    """,
+
+    # 3: dataset version counters, bumped on every write so cached API
+    # responses can be validated without re-reading the data
+    """
+    CREATE TABLE IF NOT EXISTS dataset_versions (
+        name TEXT PRIMARY KEY,
+        version INTEGER NOT NULL DEFAULT 0,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    );
+
+    INSERT OR IGNORE INTO dataset_versions (name)
+    VALUES ('projects'), ('competitors'), ('analytics');
+
+    CREATE TRIGGER IF NOT EXISTS projects_version_insert AFTER INSERT ON projects
+    BEGIN
+        UPDATE dataset_versions SET version = version + 1, updated_at = CURRENT_TIMESTAMP
+        WHERE name = 'projects';
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS projects_version_update AFTER UPDATE ON projects
+    BEGIN
+        UPDATE dataset_versions SET version = version + 1, updated_at = CURRENT_TIMESTAMP
+        WHERE name = 'projects';
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS projects_version_delete AFTER DELETE ON projects
+    BEGIN
+        UPDATE dataset_versions SET version = version + 1, updated_at = CURRENT_TIMESTAMP
+        WHERE name = 'projects';
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS competitors_version_insert AFTER INSERT ON competitors
+    BEGIN
+        UPDATE dataset_versions SET version = version + 1, updated_at = CURRENT_TIMESTAMP
+        WHERE name = 'competitors';
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS competitors_version_update AFTER UPDATE ON competitors
+    BEGIN
+        UPDATE dataset_versions SET version = version + 1, updated_at = CURRENT_TIMESTAMP
+        WHERE name = 'competitors';
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS competitors_version_delete AFTER DELETE ON competitors
+    BEGIN
+        UPDATE dataset_versions SET version = version + 1, updated_at = CURRENT_TIMESTAMP
+        WHERE name = 'competitors';
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS analytics_version_insert AFTER INSERT ON analytics
+    BEGIN
+        UPDATE dataset_versions SET version = version + 1, updated_at = CURRENT_TIMESTAMP
+        WHERE name = 'analytics';
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS analytics_version_update AFTER UPDATE ON analytics
+    BEGIN
+        UPDATE dataset_versions SET version = version + 1, updated_at = CURRENT_TIMESTAMP
+        WHERE name = 'analytics';
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS analytics_version_delete AFTER DELETE ON analytics
+    BEGIN
+        UPDATE dataset_versions SET version = version + 1, updated_at = CURRENT_TIMESTAMP
+        WHERE name = 'analytics';
+    END;
+    """,
+
+    # 4: composite and date indexes for filtered, paginated project listings
+    """
+    CREATE INDEX IF NOT EXISTS idx_projects_location_type_status ON projects(location, type, status);
+    CREATE INDEX IF NOT EXISTS idx_projects_status_start_date ON projects(status, start_date);
+    CREATE INDEX IF NOT EXISTS idx_projects_start_date ON projects(start_date);
+    CREATE INDEX IF NOT EXISTS idx_projects_end_date ON projects(end_date);
+    """,
+
+    # 5: time-series store. analytics gets the unique key its INSERT OR
+    # REPLACE relies on; samples are clustered by (metric, time) and rolled
+    # up into daily, monthly and yearly tables by triggers
+    """
+    DELETE FROM analytics
+    WHERE id NOT IN (SELECT MAX(id) FROM analytics GROUP BY metric_type, period);
+
+    CREATE UNIQUE INDEX IF NOT EXISTS idx_analytics_metric_period ON analytics(metric_type, period);
+
+    CREATE TABLE IF NOT EXISTS metric_samples (
+        metric_type TEXT NOT NULL,
+        recorded_at TEXT NOT NULL,
+        value REAL NOT NULL,
+        PRIMARY KEY (metric_type, recorded_at)
+    ) WITHOUT ROWID;
+    """ + rollup_table_sql() + """
+    CREATE TRIGGER IF NOT EXISTS metric_samples_rollup_insert AFTER INSERT ON metric_samples
+    BEGIN""" + rollup_insert_sql() + """    END;
+
+    CREATE TRIGGER IF NOT EXISTS metric_samples_rollup_update AFTER UPDATE ON metric_samples
+    BEGIN""" + rollup_recompute_sql('OLD') + rollup_recompute_sql('NEW') + """    END;
+
+    CREATE TRIGGER IF NOT EXISTS metric_samples_rollup_delete AFTER DELETE ON metric_samples
+    BEGIN""" + rollup_recompute_sql('OLD') + """    END;
+
+    CREATE TRIGGER IF NOT EXISTS metric_samples_version_insert AFTER INSERT ON metric_samples
+    BEGIN
+        UPDATE dataset_versions SET version = version + 1, updated_at = CURRENT_TIMESTAMP
+        WHERE name = 'analytics';
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS metric_samples_version_update AFTER UPDATE ON metric_samples
+    BEGIN
+        UPDATE dataset_versions SET version = version + 1, updated_at = CURRENT_TIMESTAMP
+        WHERE name = 'analytics';
+    END;
+    CREATE TRIGGER IF NOT EXISTS metric_samples_version_delete AFTER DELETE ON metric_samples
+    BEGIN
+        UPDATE dataset_versions SET version = version + 1, updated_at = CURRENT_TIMESTAMP
+        WHERE name = 'analytics';
+    END;
+
+    -- Existing monthly analytics rows become samples at the start of their month
+    INSERT OR IGNORE INTO metric_samples (metric_type, recorded_at, value)
+    SELECT metric_type,
+           substr(period, 1, 4) || '-' || CASE substr(period, 6, 3) WHEN 'Jan' THEN '01' WHEN 'Feb' THEN '02' WHEN 'Mar' THEN '03' WHEN 'Apr' THEN '04' WHEN 'May' THEN '05' WHEN 'Jun' THEN '06' WHEN 'Jul' THEN '07' WHEN 'Aug' THEN '08' WHEN 'Sep' THEN '09' WHEN 'Oct' THEN '10' WHEN 'Nov' THEN '11' WHEN 'Dec' THEN '12' END || '-01 00:00:00',
+           metric_value
+    FROM analytics
+    WHERE length(period) = 8;
+    """,
+
+    # 6: aggregation cube over location x type x status, adjusted by delta
+    # triggers like project_kpis so breakdowns never scan projects
+    """
+    CREATE TABLE IF NOT EXISTS project_cube (
+        location TEXT NOT NULL,
+        type TEXT NOT NULL,
+        status TEXT NOT NULL,
+        project_count INTEGER NOT NULL,
+        units INTEGER NOT NULL,
+        units_sold INTEGER NOT NULL,
+        budget REAL NOT NULL,
+        revenue REAL NOT NULL,
+        PRIMARY KEY (location, type, status)
+    ) WITHOUT ROWID;
+
+    INSERT OR REPLACE INTO project_cube
+    SELECT location, type, status, COUNT(*), SUM(units), COALESCE(SUM(units_sold), 0),
+           SUM(budget), SUM(budget * COALESCE(progress, 0) / 100.0)
+    FROM projects
+    GROUP BY location, type, status;
+
+    CREATE TRIGGER IF NOT EXISTS project_cube_insert AFTER INSERT ON projects
+    BEGIN
+        INSERT INTO project_cube VALUES (
+            NEW.location, NEW.type, NEW.status, 1, NEW.units, COALESCE(NEW.units_sold, 0),
+            NEW.budget, NEW.budget * COALESCE(NEW.progress, 0) / 100.0)
+        ON CONFLICT(location, type, status) DO UPDATE SET
+            project_count = project_count + 1,
+            units = units + excluded.units,
+            units_sold = units_sold + excluded.units_sold,
+            budget = budget + excluded.budget,
+            revenue = revenue + excluded.revenue;
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS project_cube_update
+    AFTER UPDATE OF location, type, status, budget, progress, units, units_sold ON projects
+    BEGIN
+        UPDATE project_cube SET
+            project_count = project_count - 1,
+            units = units - OLD.units,
+            units_sold = units_sold - COALESCE(OLD.units_sold, 0),
+            budget = budget - OLD.budget,
+            revenue = revenue - OLD.budget * COALESCE(OLD.progress, 0) / 100.0
+        WHERE location = OLD.location AND type = OLD.type AND status = OLD.status;
+
+        INSERT INTO project_cube VALUES (
+            NEW.location, NEW.type, NEW.status, 1, NEW.units, COALESCE(NEW.units_sold, 0),
+            NEW.budget, NEW.budget * COALESCE(NEW.progress, 0) / 100.0)
+        ON CONFLICT(location, type, status) DO UPDATE SET
+            project_count = project_count + 1,
+            units = units + excluded.units,
+            units_sold = units_sold + excluded.units_sold,
+            budget = budget + excluded.budget,
+            revenue = revenue + excluded.revenue;
+
+        DELETE FROM project_cube
+        WHERE location = OLD.location AND type = OLD.type AND status = OLD.status AND project_count = 0;
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS project_cube_delete AFTER DELETE ON projects
+    BEGIN
+        UPDATE project_cube SET
+            project_count = project_count - 1,
+            units = units - OLD.units,
+            units_sold = units_sold - COALESCE(OLD.units_sold, 0),
+            budget = budget - OLD.budget,
+            revenue = revenue - OLD.budget * COALESCE(OLD.progress, 0) / 100.0
+        WHERE location = OLD.location AND type = OLD.type AND status = OLD.status;
+
+        DELETE FROM project_cube
+        WHERE location = OLD.location AND type = OLD.type AND status = OLD.status AND project_count = 0;
+    END;
+    """,
+
+    # 7: per-row version for optimistic concurrency; every writer bumps it
+    # and guarded writes only apply while it still has the expected value
+    """
+    ALTER TABLE projects ADD COLUMN version INTEGER NOT NULL DEFAULT 1;
+    """,
+
+    # 8: append-only change log of project writes, read incrementally by the
+    # data processor jobs from their own checkpoints. Updates record which
+    # columns changed; an update that changes none of them is not logged
+    """
+    CREATE TABLE IF NOT EXISTS project_changes (
+        seq INTEGER PRIMARY KEY AUTOINCREMENT,
+        project_id INTEGER NOT NULL,
+        op TEXT NOT NULL CHECK (op IN ('insert', 'update', 'delete')),
+        columns TEXT,
+        changed_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP
+    );
+
+    CREATE TABLE IF NOT EXISTS job_checkpoints (
+        job TEXT PRIMARY KEY,
+        last_seq INTEGER NOT NULL,
+        updated_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP
+    );
+
+    CREATE TRIGGER IF NOT EXISTS project_changes_insert AFTER INSERT ON projects
+    BEGIN
+        INSERT INTO project_changes (project_id, op) VALUES (NEW.id, 'insert');
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS project_changes_update AFTER UPDATE ON projects
+    BEGIN
+        INSERT INTO project_changes (project_id, op, columns)
+        SELECT NEW.id, 'update', changed FROM (SELECT """ + changed_columns_sql() + """ AS changed)
+        WHERE changed != '';
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS project_changes_delete AFTER DELETE ON projects
+    BEGIN
+        INSERT INTO project_changes (project_id, op) VALUES (OLD.id, 'delete');
+    END;
+    """,
+
+    # 9: competitor history, one row per change of market share or digital
+    # presence, clustered by (competitor, time) for trajectory and movers queries
+    """
+    CREATE TABLE IF NOT EXISTS competitor_history (
+        competitor_id INTEGER NOT NULL,
+        recorded_at TEXT NOT NULL,
+        market_share REAL,
+        digital_presence INTEGER,
+        PRIMARY KEY (competitor_id, recorded_at)
+    ) WITHOUT ROWID;
+
+    INSERT OR IGNORE INTO competitor_history (competitor_id, recorded_at, market_share, digital_presence)
+    SELECT id, COALESCE(created_at, CURRENT_TIMESTAMP), market_share, digital_presence FROM competitors;
+
+    CREATE TRIGGER IF NOT EXISTS competitor_history_insert AFTER INSERT ON competitors
+    BEGIN
+        INSERT OR REPLACE INTO competitor_history (competitor_id, recorded_at, market_share, digital_presence)
+        VALUES (NEW.id, CURRENT_TIMESTAMP, NEW.market_share, NEW.digital_presence);
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS competitor_history_update
+    AFTER UPDATE OF market_share, digital_presence ON competitors
+    WHEN OLD.market_share IS NOT NEW.market_share OR OLD.digital_presence IS NOT NEW.digital_presence
+    BEGIN
+        INSERT OR REPLACE INTO competitor_history (competitor_id, recorded_at, market_share, digital_presence)
+        VALUES (NEW.id, CURRENT_TIMESTAMP, NEW.market_share, NEW.digital_presence);
+    END;
+    """,
+
+    # 10: full-text indexes over project and competitor text, stored as
+    # external-content FTS5 tables that triggers keep in step with their
+    # source rows. Prefix indexes make prefixes of up to four characters
+    # index lookups, and the rank weights favour name matches
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS projects_fts USING fts5(
+        name, location, manager,
+        content='projects', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2', prefix='2 3 4'
+    );
+    INSERT INTO projects_fts (projects_fts, rank) VALUES ('rank', 'bm25(10.0, 2.0, 5.0)');
+    INSERT INTO projects_fts (projects_fts) VALUES ('rebuild');
+
+    CREATE TRIGGER IF NOT EXISTS projects_fts_insert AFTER INSERT ON projects
+    BEGIN
+        INSERT INTO projects_fts (rowid, name, location, manager)
+        VALUES (NEW.id, NEW.name, NEW.location, NEW.manager);
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS projects_fts_update AFTER UPDATE OF name, location, manager ON projects
+    WHEN OLD.name IS NOT NEW.name OR OLD.location IS NOT NEW.location OR OLD.manager IS NOT NEW.manager
+    BEGIN
+        INSERT INTO projects_fts (projects_fts, rowid, name, location, manager)
+        VALUES ('delete', OLD.id, OLD.name, OLD.location, OLD.manager);
+        INSERT INTO projects_fts (rowid, name, location, manager)
+        VALUES (NEW.id, NEW.name, NEW.location, NEW.manager);
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS projects_fts_delete AFTER DELETE ON projects
+    BEGIN
+        INSERT INTO projects_fts (projects_fts, rowid, name, location, manager)
+        VALUES ('delete', OLD.id, OLD.name, OLD.location, OLD.manager);
+    END;
+
+    CREATE VIRTUAL TABLE IF NOT EXISTS competitors_fts USING fts5(
+        name, recent_activity,
+        content='competitors', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2', prefix='2 3 4'
+    );
+    INSERT INTO competitors_fts (competitors_fts, rank) VALUES ('rank', 'bm25(10.0, 1.0)');
+    INSERT INTO competitors_fts (competitors_fts) VALUES ('rebuild');
+
+    CREATE TRIGGER IF NOT EXISTS competitors_fts_insert AFTER INSERT ON competitors
+    BEGIN
+        INSERT INTO competitors_fts (rowid, name, recent_activity)
+        VALUES (NEW.id, NEW.name, NEW.recent_activity);
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS competitors_fts_update AFTER UPDATE OF name, recent_activity ON competitors
+    WHEN OLD.name IS NOT NEW.name OR OLD.recent_activity IS NOT NEW.recent_activity
+    BEGIN
+        INSERT INTO competitors_fts (competitors_fts, rowid, name, recent_activity)
+        VALUES ('delete', OLD.id, OLD.name, OLD.recent_activity);
+        INSERT INTO competitors_fts (rowid, name, recent_activity)
+        VALUES (NEW.id, NEW.name, NEW.recent_activity);
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS competitors_fts_delete AFTER DELETE ON competitors
+    BEGIN
+        INSERT INTO competitors_fts (competitors_fts, rowid, name, recent_activity)
+        VALUES ('delete', OLD.id, OLD.name, OLD.recent_activity);
+    END;
+    """,
+
+    # 11: optional coordinates on projects, indexed by an R*Tree for radius
+    # and viewport queries, with per-zoom marker clusters kept by delta
+    # triggers so a map view never scans projects. Coordinate changes are
+    # added to the change log's tracked columns
+    """
+    ALTER TABLE projects ADD COLUMN latitude REAL;
+    ALTER TABLE projects ADD COLUMN longitude REAL;
+
+    CREATE VIRTUAL TABLE IF NOT EXISTS project_locations USING rtree(id, min_lat, max_lat, min_lng, max_lng);
+
+    CREATE TABLE IF NOT EXISTS project_clusters (
+        zoom INTEGER NOT NULL,
+        cell_x INTEGER NOT NULL,
+        cell_y INTEGER NOT NULL,
+        project_count INTEGER NOT NULL,
+        sum_lat REAL NOT NULL,
+        sum_lng REAL NOT NULL,
+        PRIMARY KEY (zoom, cell_x, cell_y)
+    ) WITHOUT ROWID;
+
+    CREATE TRIGGER IF NOT EXISTS project_locations_insert AFTER INSERT ON projects
+    WHEN NEW.latitude IS NOT NULL AND NEW.longitude IS NOT NULL
+    BEGIN
+        INSERT INTO project_locations VALUES (NEW.id, NEW.latitude, NEW.latitude, NEW.longitude, NEW.longitude);""" + cluster_delta_sql('NEW', 1) + """    END;
+
+    CREATE TRIGGER IF NOT EXISTS project_locations_update AFTER UPDATE OF latitude, longitude ON projects
+    WHEN OLD.latitude IS NOT NEW.latitude OR OLD.longitude IS NOT NEW.longitude
+    BEGIN
+        DELETE FROM project_locations WHERE id = OLD.id;
+        INSERT INTO project_locations
+        SELECT NEW.id, NEW.latitude, NEW.latitude, NEW.longitude, NEW.longitude
+        WHERE NEW.latitude IS NOT NULL AND NEW.longitude IS NOT NULL;""" + cluster_delta_sql('OLD', -1) + cluster_delta_sql('NEW', 1) + """    END;
+
+    CREATE TRIGGER IF NOT EXISTS project_locations_delete AFTER DELETE ON projects
+    WHEN OLD.latitude IS NOT NULL AND OLD.longitude IS NOT NULL
+    BEGIN
+        DELETE FROM project_locations WHERE id = OLD.id;""" + cluster_delta_sql('OLD', -1) + """    END;
+
+    DROP TRIGGER IF EXISTS project_changes_update;
+    CREATE TRIGGER project_changes_update AFTER UPDATE ON projects
+    BEGIN
+        INSERT INTO project_changes (project_id, op, columns)
+        SELECT NEW.id, 'update', changed
+        FROM (SELECT """ + changed_columns_sql((*TRACKED_COLUMNS, 'latitude', 'longitude')) + """ AS changed)
+        WHERE changed != '';
+    END;
+    """,
+]
+
+
+def split_statements(script):
+    """Split a migration script into complete SQL statements"""
+    statements = []
+    buffer = ''
+    for line in script.splitlines(keepends=True):
+        buffer += line
+        if sqlite3.complete_statement(buffer):
+            statements.append(buffer.strip())
+            buffer = ''
+    if buffer.strip():
+        statements.append(buffer.strip())
+    return statements
+
+
+def migrate(conn):
+    """Apply pending migrations and return the resulting schema version"""
+    version = conn.execute('PRAGMA user_version').fetchone()[0]
+    if version >= len(MIGRATIONS):
+        return version
+
+    # Several gunicorn workers can start at once: take the write lock and
+    # re-read the version so each migration runs exactly once
+    isolation_level = conn.isolation_level
+    conn.isolation_level = None
+    try:
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            version = conn.execute('PRAGMA user_version').fetchone()[0]
+            for number in range(version, len(MIGRATIONS)):
+                for statement in split_statements(MIGRATIONS[number]):
+                    conn.execute(statement)
+                conn.execute(f'PRAGMA user_version = {number + 1}')
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+    finally:
+        conn.isolation_level = isolation_level
+
+    return len(MIGRATIONS)
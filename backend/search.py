@@ -0,0 +1,108 @@
+"""
+Full-text search for Al Fozan Insights Platform
+Project name, location and manager, and competitor name and recent
+activity, are indexed in external-content FTS5 tables that triggers keep
+in sync with their rows. The last search term, and any term written with
+a trailing *, matches as a prefix, so results follow the user as they
+type; results are ordered by weighted bm25 with a highlighted snippet.
+bm25 weighs each term by reading every row that contains it, so a query
+matching more than RANK_CANDIDATES rows is returned newest first instead,
+which stays an index walk however common the terms are.
+"""
+
+import html
+import re
+
+from project_store import ValidationError
+
+# kind -> (FTS table, content table, columns returned with each hit)
+SEARCH_INDEXES = {
+    'projects': ('projects_fts', 'projects', ('id', 'name', 'type', 'status', 'location', 'manager')),
+    'competitors': ('competitors_fts', 'competitors', ('id', 'name', 'market_share', 'recent_activity')),
+}
+
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 100
+MAX_TERMS = 8
+RANK_CANDIDATES = 2000
+SNIPPET_TOKENS = 12
+
+# Words as the unicode61 tokenizer sees them, each with an optional prefix
+# marker; everything else separates terms
+TERM_PATTERN = re.compile(r'(\w+)(\*?)')
+
+# snippet() marks matches with control characters, which cannot occur in
+# the indexed text, so the text can be escaped before they become <mark>
+MARK_START, MARK_END = '\x02', '\x03'
+
+
+def match_expression(text):
+    """Turn free text into an FTS5 query requiring every term
+
+    Only prefix terms are expanded: a short prefix is served by the
+    prefix index, but a long one is merged from every token it covers.
+    """
+    terms = TERM_PATTERN.findall(text or '')[:MAX_TERMS]
+    if not terms:
+        raise ValidationError('Search query must contain at least one word')
+    last = len(terms) - 1
+    return ' '.join(
+        f'"{word}"*' if star or i == last else f'"{word}"'
+        for i, (word, star) in enumerate(terms)
+    )
+
+
+def highlight(snippet):
+    return html.escape(snippet or '').replace(MARK_START, '<mark>').replace(MARK_END, '</mark>')
+
+
+def search_index(conn, kind, match, limit=DEFAULT_LIMIT):
+    """Return the best `limit` hits of `match` in one index
+
+    Hits are ranked by bm25 with a score, or for a broad query newest
+    first with a score of None.
+    """
+    fts, table, columns = SEARCH_INDEXES[kind]
+
+    ranked = conn.execute(
+        f'SELECT rowid FROM {fts} WHERE {fts} MATCH ? ORDER BY rowid DESC LIMIT 1 OFFSET ?',
+        (match, RANK_CANDIDATES)
+    ).fetchone() is None
+
+    rows = conn.execute(f"""
+        SELECT {', '.join(f't.{c}' for c in columns)},
+               {f'-{fts}.rank' if ranked else 'NULL'} AS score,
+               snippet({fts}, -1, '{MARK_START}', '{MARK_END}', '…', {SNIPPET_TOKENS}) AS snippet
+        FROM {fts} JOIN {table} AS t ON t.id = {fts}.rowid
+        WHERE {fts} MATCH ?
+        ORDER BY {f'{fts}.rank' if ranked else f'{fts}.rowid DESC'}
+        LIMIT ?
+    """, (match, limit)).fetchall()
+
+    hits = []
+    for row in rows:
+        hit = dict(row)
+        if ranked:
+            hit['score'] = round(hit['score'], 4)
+        hit['snippet'] = highlight(hit['snippet'])
+        hits.append(hit)
+    return hits
+
+
+def search(conn, text, kinds=tuple(SEARCH_INDEXES), limit=DEFAULT_LIMIT):
+    """Search `kinds` for `text`; returns {kind: hits}"""
+    unknown = set(kinds) - set(SEARCH_INDEXES)
+    if unknown:
+        raise ValidationError(f"Cannot search: {', '.join(sorted(unknown))}")
+    if not 1 <= limit <= MAX_LIMIT:
+        raise ValidationError(f'limit must be between 1 and {MAX_LIMIT}')
+
+    match = match_expression(text)
+    return {kind: search_index(conn, kind, match, limit) for kind in kinds}
+
+
+def optimize_indexes(conn):
+    """Merge each index's segments into one, keeping queries fast after heavy writes"""
+    with conn:
+        for fts, _, _ in SEARCH_INDEXES.values():
+            conn.execute(f"INSERT INTO {fts} ({fts}) VALUES ('optimize')")
@@ -9,5 +9,5 @@ echo " Creating reports directory..."
 mkdir -p reports
 
 echo " Setup completed successfully!"
-echo " To start the server, run: python simple_app.py"
+echo " To start the server, run: FLASK_ENV=development python simple_app.py"
 echo " Server will be available at: http://localhost:5000"
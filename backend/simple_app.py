@@ -1,212 +1,534 @@
-from flask import Flask, jsonify, request
+from flask import Flask, Response, g, jsonify, request
 from flask_cors import CORS
+from werkzeug.routing import IntegerConverter
 import json
-from datetime import datetime, timedelta
-import random
+from datetime import datetime
 import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from aggregates import CUBE_DIMENSIONS, query_cube
+from auth import STREAM_SCOPE, STREAM_TOKEN_TTL, TOKEN_TTL, authenticate, issue_token, require_auth
+from competitor_store import DEFAULT_TOP, CompetitorStore
+from db import connection, init_db
+import encoding
+from events import RETRY_MS, broker
+from exporters import EXPORT_COLUMNS, iter_csv, iter_xlsx
+import geo
+from importers import IMPORT_MIMETYPES, iter_records
+from metrics import instrument_app
+from project_store import (
+    INDEXED_COLUMNS,
+    MAX_INTEGER,
+    RANGE_FILTERS,
+    ProjectStore,
+    ValidationError,
+    VersionConflict,
+    decode_cursor,
+    encode_cursor,
+    parse_project_id,
+    project_etag,
+)
+from response_cache import ResponseCache
+import search
+from snapshots import COMPARABLE_COLUMNS, SnapshotNotFound, compare_projects, read_index
+import timeseries
+
+class RowIdConverter(IntegerConverter):
+    """<int:...> segment limited to what SQLite can bind; a larger id is a 404"""
+
+    def __init__(self, url_map, *args, **kwargs):
+        kwargs.setdefault('max', MAX_INTEGER)
+        super().__init__(url_map, *args, **kwargs)
 
 app = Flask(__name__)
-CORS(app)
-
-# Mock data storage
-projects_data = [
-    {
-        "id": 1,
-        "name": "Al Fozan Tower",
-        "location": "Riyadh",
-        "type": "Commercial",
-        "status": "Active",
-        "units": 120,
-        "sold": 85,
-        "revenue": 450.5,
-        "completion": 75,
-        "start_date": "2023-01-15",
-        "end_date": "2025-06-30"
-    },
-    {
-        "id": 2,
-        "name": "Residential Complex A",
-        "location": "Jeddah",
-        "type": "Residential",
-        "status": "Planning",
-        "units": 200,
-        "sold": 45,
-        "revenue": 320.8,
-        "completion": 25,
-        "start_date": "2024-03-01",
-        "end_date": "2026-12-15"
-    },
-    {
-        "id": 3,
-        "name": "Mixed Use Development",
-        "location": "Dammam",
-        "type": "Mixed",
-        "status": "Active",
-        "units": 150,
-        "sold": 120,
-        "revenue": 680.2,
-        "completion": 90,
-        "start_date": "2022-08-10",
-        "end_date": "2024-11-20"
-    }
-]
-
-competitors_data = [
-    {
-        "id": 1,
-        "name": "Saudi Real Estate Co.",
-        "market_share": 15.2,
-        "projects": 8,
-        "digital_score": 85,
-        "location": "Riyadh"
-    },
-    {
-        "id": 2,
-        "name": "Kingdom Properties",
-        "market_share": 12.8,
-        "projects": 6,
-        "digital_score": 78,
-        "location": "Jeddah"
-    },
-    {
-        "id": 3,
-        "name": "Eastern Development",
-        "market_share": 9.5,
-        "projects": 4,
-        "digital_score": 72,
-        "location": "Dammam"
-    }
-]
+app.url_map.converters['int'] = RowIdConverter
+# Browsers need to read ETag to send it back in If-Match
+CORS(app, expose_headers=['ETag'])
+instrument_app(app)
+encoding.install(app)
+require_auth(app)
+
+DEFAULT_PAGE_SIZE = 100
+
+# History covered by monthly_trends in /api/analytics, before downsampling
+DEFAULT_TREND_MONTHS = 12
+MAX_TREND_MONTHS = 1200
+
+# Query parameters of GET /api/projects besides its filters
+PAGE_PARAMS = ('limit', 'cursor', 'fields')
+
+EXPORT_MIMETYPES = {
+    'csv': 'text/csv',
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+}
+
+# Projects and competitors live in SQLite so every gunicorn worker shares the same data
+init_db()
+project_store = ProjectStore()
+competitor_store = CompetitorStore()
+response_cache = ResponseCache()
+project_store.seed([
+    {"name": "Riyadh Business District", "type": "Commercial", "status": "In Progress", "location": "Riyadh",
+     "budget": 2500000000, "progress": 75, "units": 450, "units_sold": 340,
+     "start_date": "2023-01-15", "end_date": "2024-12-31", "manager": "Ahmed Al-Rashid"},
+    {"name": "Jeddah Waterfront Residences", "type": "Residential", "status": "Planning", "location": "Jeddah",
+     "budget": 1800000000, "progress": 25, "units": 280, "units_sold": 45,
+     "start_date": "2024-03-01", "end_date": "2025-06-30", "manager": "Fatima Al-Zahra"},
+    {"name": "Dammam Industrial Complex", "type": "Industrial", "status": "Completed", "location": "Dammam",
+     "budget": 3200000000, "progress": 100, "units": 120, "units_sold": 120,
+     "start_date": "2022-06-01", "end_date": "2024-03-31", "manager": "Omar Al-Mutairi"},
+])
+
+competitor_store.seed([
+    {"name": "Saudi Real Estate Co.", "market_share": 15.2, "digital_presence": 85},
+    {"name": "Kingdom Properties", "market_share": 12.8, "digital_presence": 78},
+    {"name": "Eastern Development", "market_share": 9.5, "digital_presence": 72},
+])
 
 @app.route('/api/projects', methods=['GET'])
+@response_cache.cached('projects')
 def get_projects():
+    args = request.args
+    unknown = set(args) - set(PAGE_PARAMS) - set(INDEXED_COLUMNS) - set(RANGE_FILTERS)
+    if unknown:
+        return jsonify({"success": False, "error": f"Unknown parameters: {', '.join(sorted(unknown))}"}), 400
+    filters = {
+        name: args[name]
+        for name in (*INDEXED_COLUMNS, *RANGE_FILTERS)
+        if args.get(name)
+    }
+    fields = [f.strip() for f in args.get('fields', '').split(',') if f.strip()]
+
+    try:
+        limit = int_arg('limit', DEFAULT_PAGE_SIZE)
+        after_id = decode_cursor(args['cursor']) if args.get('cursor') else 0
+        projects, has_more = project_store.page(filters, after_id, limit, fields)
+    except ValueError as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+
     return jsonify({
         "success": True,
-        "data": projects_data,
-        "total": len(projects_data)
+        "data": projects,
+        "count": len(projects),
+        # The unfiltered total comes from the maintained KPIs; counting a
+        # filtered result would mean scanning every match
+        "total": None if filters else project_store.kpis()['total_projects'],
+        "has_more": has_more,
+        "next_cursor": encode_cursor(projects[-1]['id']) if has_more else None
     })
 
+def int_arg(name, default=None):
+    """Return a non-negative integer query parameter, or `default` when it is absent"""
+    value = request.args.get(name)
+    if not value:
+        return default
+    # isdigit() alone also accepts characters such as '²' that int() rejects
+    if not (value.isascii() and value.isdigit()):
+        raise ValidationError(f"Invalid {name}")
+    return int(value)
+
+def expected_version(project_id, data=None):
+    """Return the version a write must match, from If-Match or the payload's version field"""
+    if request.if_match.star_tag:
+        return None
+    tags = list(request.if_match)
+    if tags:
+        for tag in tags:
+            tag_id, _, version = tag.partition('-')
+            if tag_id == str(project_id):
+                return parse_project_id(version, 'If-Match version')
+        raise ValidationError('If-Match does not name a version of this project')
+    version = data.get('version') if isinstance(data, dict) else None
+    return parse_project_id(version, 'version') if version is not None else None
+
+def project_response(project, status=200):
+    response = jsonify({"success": True, "data": project})
+    response.status_code = status
+    response.set_etag(project_etag(project))
+    return response
+
+def conflict_response(current):
+    response = jsonify({"success": False, "error": "Version conflict", "data": current})
+    response.status_code = 409
+    if isinstance(current, dict):
+        response.set_etag(project_etag(current))
+    return response
+
+@app.route('/api/projects/near', methods=['GET'])
+@response_cache.cached('projects')
+def get_projects_near():
+    args = request.args
+    if not args.get('lat') or not args.get('lng'):
+        return jsonify({"success": False, "error": "Missing required parameters: lat, lng"}), 400
+
+    try:
+        lat = geo.parse_latitude(args['lat'])
+        lng = geo.parse_longitude(args['lng'])
+        radius_km = float(args.get('radius_km', geo.DEFAULT_RADIUS_KM))
+        limit = int_arg('limit', geo.DEFAULT_NEAR_LIMIT)
+    except ValueError as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+
+    try:
+        with connection() as conn:
+            projects = geo.near(conn, lat, lng, radius_km, limit)
+    except ValidationError as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+    return jsonify({"success": True, "data": projects, "count": len(projects)})
+
+@app.route('/api/projects/bbox', methods=['GET'])
+@response_cache.cached('projects')
+def get_projects_bbox():
+    args = request.args
+    missing = [name for name in ('south', 'west', 'north', 'east') if not args.get(name)]
+    if missing:
+        return jsonify({"success": False, "error": f"Missing required parameters: {', '.join(missing)}"}), 400
+
+    try:
+        zoom = int_arg('zoom')
+        south = geo.parse_latitude(args['south'], 'south')
+        north = geo.parse_latitude(args['north'], 'north')
+        west = geo.parse_longitude(args['west'], 'west')
+        east = geo.parse_longitude(args['east'], 'east')
+        with connection() as conn:
+            view = geo.viewport(conn, south, west, north, east, zoom)
+    except ValidationError as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+    return jsonify({"success": True, "data": view})
+
+@app.route('/api/projects/<int:project_id>', methods=['GET'])
+def get_project(project_id):
+    project = project_store.get(project_id)
+    if project is None:
+        return jsonify({"success": False, "error": "Project not found"}), 404
+
+    # The ETag is the row version, so it stays valid while other projects change
+    etag = project_etag(project)
+    if etag in request.if_none_match:
+        response = Response(status=304)
+    else:
+        response = project_response(project)
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
 @app.route('/api/projects', methods=['POST'])
 def create_project():
     data = request.get_json()
-    new_project = {
-        "id": len(projects_data) + 1,
-        **data,
-        "created_at": datetime.now().isoformat()
-    }
-    projects_data.append(new_project)
-    return jsonify({"success": True, "data": new_project})
+    try:
+        new_project = project_store.create(data)
+    except ValidationError as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+    return project_response(new_project)
+
+@app.route('/api/projects/bulk', methods=['POST'])
+def bulk_import_projects():
+    import_format = request.args.get('format') or IMPORT_MIMETYPES.get(request.mimetype)
+    if import_format not in ('ndjson', 'csv'):
+        return jsonify({
+            "success": False,
+            "error": "Send NDJSON (application/x-ndjson) or CSV (text/csv), or pass ?format=ndjson|csv"
+        }), 415
+
+    # The body is parsed from the request stream as it arrives and never
+    # held in memory as a whole
+    try:
+        report = project_store.bulk_upsert(iter_records(request.stream, import_format))
+    except UnicodeDecodeError:
+        return jsonify({"success": False, "error": "Request body is not valid UTF-8"}), 400
+    except ValidationError as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+    return jsonify({"success": report['failed'] == 0, **report})
+
+@app.route('/api/projects', methods=['PATCH'])
+def update_projects():
+    try:
+        updated = project_store.update_many(request.get_json(silent=True))
+    except ValidationError as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+    except VersionConflict as e:
+        return conflict_response(e.current)
+    return jsonify({"success": True, "data": updated, "count": len(updated)})
 
 @app.route('/api/projects/<int:project_id>', methods=['PUT'])
 def update_project(project_id):
     data = request.get_json()
-    for project in projects_data:
-        if project['id'] == project_id:
-            project.update(data)
-            return jsonify({"success": True, "data": project})
-    return jsonify({"success": False, "error": "Project not found"}), 404
+    try:
+        project = project_store.update(project_id, data, expected_version(project_id, data))
+    except ValidationError as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+    except VersionConflict as e:
+        return conflict_response(e.current)
+    if project is None:
+        return jsonify({"success": False, "error": "Project not found"}), 404
+    return project_response(project)
 
 @app.route('/api/projects/<int:project_id>', methods=['DELETE'])
 def delete_project(project_id):
-    global projects_data
-    projects_data = [p for p in projects_data if p['id'] != project_id]
+    try:
+        deleted = project_store.delete(project_id, expected_version(project_id))
+    except ValidationError as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+    except VersionConflict as e:
+        return conflict_response(e.current)
+    if not deleted:
+        return jsonify({"success": False, "error": "Project not found"}), 404
     return jsonify({"success": True})
 
 @app.route('/api/competitors', methods=['GET'])
+@response_cache.cached('competitors')
 def get_competitors():
+    competitors = competitor_store.list()
     return jsonify({
         "success": True,
-        "data": competitors_data,
-        "total": len(competitors_data)
+        "data": competitors,
+        "total": len(competitors)
     })
 
+@app.route('/api/competitors/history', methods=['GET'])
+@response_cache.cached('competitors')
+def get_competitor_history():
+    args = request.args
+    ids = [i.strip() for i in args.get('ids', '').split(',') if i.strip()]
+    try:
+        history = competitor_store.history(
+            ids,
+            metric=args.get('metric', 'market_share'),
+            start=args.get('start'),
+            end=args.get('end'),
+            points=int_arg('points'),
+            method=args.get('downsample', 'lttb')
+        )
+    except ValidationError as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+    return jsonify({"success": True, "data": history})
+
+@app.route('/api/competitors/movers', methods=['GET'])
+@response_cache.cached('competitors')
+def get_competitor_movers():
+    args = request.args
+    try:
+        movers = competitor_store.top_movers(
+            metric=args.get('metric', 'market_share'),
+            start=args.get('start'),
+            end=args.get('end'),
+            top=int_arg('top', DEFAULT_TOP)
+        )
+    except ValidationError as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+    return jsonify({"success": True, "data": movers})
+
 @app.route('/api/analytics', methods=['GET'])
+@response_cache.cached('projects', 'analytics')
 def get_analytics():
-    total_projects = len(projects_data)
-    total_revenue = sum(p['revenue'] for p in projects_data)
-    total_units = sum(p['units'] for p in projects_data)
-    total_units_sold = sum(p['sold'] for p in projects_data)
-    sales_rate = (total_units_sold / total_units * 100) if total_units > 0 else 0
-    
-    # Generate monthly trends
-    monthly_trends = []
-    for i in range(12):
-        month_date = datetime.now() - timedelta(days=30*i)
-        monthly_trends.append({
-            "month": month_date.strftime("%b %Y"),
-            "revenue": random.uniform(50, 150),
-            "sales": random.randint(10, 30),
-            "projects": random.randint(1, 5)
-        })
-    
-    # Regional performance
-    regional_data = [
-        {"region": "Riyadh", "projects": 5, "revenue": 450.5, "growth": 12.5},
-        {"region": "Jeddah", "projects": 3, "revenue": 320.8, "growth": 8.2},
-        {"region": "Dammam", "projects": 2, "revenue": 280.2, "growth": 15.1},
-        {"region": "Mecca", "projects": 1, "revenue": 150.0, "growth": 5.8}
-    ]
-    
+    args = request.args
+    try:
+        months = int_arg('months', DEFAULT_TREND_MONTHS)
+        points = int_arg('points', 0)
+        if not 0 < months <= MAX_TREND_MONTHS:
+            raise ValidationError("Invalid months")
+    except ValidationError as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+
+    kpis = project_store.kpis()
+    try:
+        with connection() as conn:
+            monthly_trends = timeseries.monthly_trends(
+                conn, months, points, args.get('downsample', 'lttb'))
+            # Breakdowns are read from the maintained cube, a few rows per dimension
+            regions = query_cube(conn, ['location'])
+            types = query_cube(conn, ['type'])
+    except ValidationError as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+
+    regional_data = [{
+        "region": cell['location'],
+        "projects": cell['project_count'],
+        "revenue": round(cell['revenue'] / 1e6, 1),
+        "units": cell['units'],
+        "units_sold": cell['units_sold'],
+        "sales_rate": cell['sales_rate']
+    } for cell in regions]
+
+    total_projects = sum(cell['project_count'] for cell in types)
+    project_types = [{
+        "type": cell['type'],
+        "count": cell['project_count'],
+        "revenue": round(cell['revenue'] / 1e6, 1),
+        "percentage": round(cell['project_count'] * 100.0 / total_projects, 1)
+    } for cell in types]
+
     return jsonify({
         "success": True,
         "data": {
-            "kpis": {
-                "total_projects": total_projects,
-                "total_revenue": total_revenue,
-                "total_units": total_units,
-                "total_units_sold": total_units_sold,
-                "sales_rate": sales_rate
-            },
+            "kpis": kpis,
             "monthly_trends": monthly_trends,
             "regional_performance": regional_data,
-            "project_types": [
-                {"type": "Residential", "count": 8, "percentage": 45},
-                {"type": "Commercial", "count": 6, "percentage": 35},
-                {"type": "Mixed", "count": 4, "percentage": 20}
-            ]
+            "project_types": project_types
         }
     })
 
+@app.route('/api/analytics/cube', methods=['GET'])
+@response_cache.cached('projects')
+def get_analytics_cube():
+    args = request.args
+    group_by = [d.strip() for d in args.get('group_by', '').split(',') if d.strip()]
+    filters = {name: args[name] for name in CUBE_DIMENSIONS if args.get(name)}
+
+    try:
+        with connection() as conn:
+            cells = query_cube(conn, group_by, filters)
+    except ValueError as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+
+    return jsonify({
+        "success": True,
+        "data": cells,
+        "group_by": group_by,
+        "filters": filters
+    })
+
+@app.route('/api/analytics/timeseries', methods=['GET'])
+@response_cache.cached('analytics')
+def get_analytics_timeseries():
+    args = request.args
+    metric = args.get('metric')
+    if not metric:
+        return jsonify({"success": False, "error": "Missing required parameter: metric"}), 400
+
+    try:
+        points = int_arg('points', timeseries.DEFAULT_MAX_POINTS)
+        if points == 0:
+            raise ValidationError("Invalid points")
+        with connection() as conn:
+            series = timeseries.query(
+                conn, metric,
+                start=args.get('start'),
+                end=args.get('end'),
+                step=args.get('step'),
+                agg=args.get('agg', 'avg'),
+                max_points=points
+            )
+    except ValidationError as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+
+    return jsonify({"success": True, "data": series})
+
+@app.route('/api/search', methods=['GET'])
+@response_cache.cached('projects', 'competitors')
+def search_text():
+    args = request.args
+    if not args.get('q'):
+        return jsonify({"success": False, "error": "Missing required parameter: q"}), 400
+    kinds = [k.strip() for k in args.get('type', '').split(',') if k.strip()] or list(search.SEARCH_INDEXES)
+
+    try:
+        limit = int_arg('limit', search.DEFAULT_LIMIT)
+        with connection() as conn:
+            results = search.search(conn, args['q'], kinds, limit)
+    except ValidationError as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+
+    return jsonify({"success": True, "query": args['q'], "data": results})
+
+@app.route('/api/snapshots', methods=['GET'])
+def get_snapshots():
+    index = read_index()
+    return jsonify({"success": True, "data": index, "count": len(index)})
+
+@app.route('/api/snapshots/compare', methods=['GET'])
+def compare_snapshots():
+    args = request.args
+    if not args.get('from') or not args.get('to'):
+        return jsonify({"success": False, "error": "Missing required parameters: from, to"}), 400
+    columns = [c.strip() for c in args.get('columns', '').split(',') if c.strip()] or COMPARABLE_COLUMNS
+
+    try:
+        comparison = compare_projects(args['from'], args['to'], columns)
+    except SnapshotNotFound as e:
+        return jsonify({"success": False, "error": str(e)}), 404
+    except ValueError as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+    return jsonify({"success": True, "data": comparison})
+
+@app.route('/api/stream', methods=['GET'])
+def stream_events():
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+    try:
+        last_event_id = int(last_event_id) if last_event_id else None
+    except ValueError:
+        return jsonify({"success": False, "error": "Invalid Last-Event-ID"}), 400
+
+    # Each subscriber holds a worker thread for as long as it is connected,
+    # so only a bounded number may, leaving the rest for the API
+    if not broker.slots.acquire(blocking=False):
+        return jsonify({"success": False, "error": "Too many stream subscribers"}), 503, {
+            "Retry-After": str(RETRY_MS // 1000)
+        }
+    response = Response(broker.subscribe(last_event_id), mimetype='text/event-stream', headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no"
+    })
+    response.call_on_close(broker.slots.release)
+    return response
+
+@app.route('/api/stream/token', methods=['POST'])
+def stream_token():
+    # EventSource cannot send headers, so it passes this short-lived token
+    # as ?access_token=; the stream stays open past its expiry, but a
+    # reconnect needs a fresh one. None while tokens are not required.
+    user = g.get('user')
+    if user is None:
+        return jsonify({"success": True, "token": None, "expires_in": None})
+    return jsonify({
+        "success": True,
+        "token": issue_token(user['sub'], user['role'], STREAM_TOKEN_TTL, scope=STREAM_SCOPE),
+        "expires_in": STREAM_TOKEN_TTL
+    })
+
 @app.route('/api/auth/login', methods=['POST'])
 def login():
-    data = request.get_json()
+    data = request.get_json(silent=True) or {}
     username = data.get('username')
-    password = data.get('password')
-    
-    # Demo credentials
-    users = {
-        'admin': {'password': 'admin123', 'role': 'admin', 'name': 'Admin User'},
-        'manager': {'password': 'manager123', 'role': 'manager', 'name': 'Manager User'},
-        'analyst': {'password': 'analyst123', 'role': 'analyst', 'name': 'Analyst User'}
-    }
-    
-    if username in users and users[username]['password'] == password:
-        return jsonify({
-            "success": True,
-            "user": {
-                "username": username,
-                "role": users[username]['role'],
-                "name": users[username]['name']
-            },
-            "token": f"demo_token_{username}"
-        })
-    
-    return jsonify({"success": False, "error": "Invalid credentials"}), 401
+    user = authenticate(username, data.get('password'))
+    if user is None:
+        return jsonify({"success": False, "error": "Invalid credentials"}), 401
+
+    return jsonify({
+        "success": True,
+        "user": {
+            "username": username,
+            "role": user['role'],
+            "name": user['name']
+        },
+        "token": issue_token(username, user['role']),
+        "expires_in": TOKEN_TTL
+    })
 
 @app.route('/api/export', methods=['POST'])
 def export_data():
-    data = request.get_json()
+    data = request.get_json() or {}
     export_type = data.get('type', 'csv')
-    
+    filename = f"projects_export_{datetime.now().strftime('%Y%m%d')}.{export_type}"
+    columns = [column for column, _ in EXPORT_COLUMNS]
+
+    # Streamed exports are written straight from the database cursor as a
+    # chunked download; XLSX is binary so it is always streamed
+    if export_type == 'xlsx' or (export_type == 'csv' and data.get('stream')):
+        rows = project_store.iter_rows(columns)
+        body = iter_xlsx(rows) if export_type == 'xlsx' else iter_csv(rows)
+        return Response(body, mimetype=EXPORT_MIMETYPES[export_type], headers={
+            "Content-Disposition": f'attachment; filename="{filename}"'
+        })
+
     if export_type == 'csv':
-        csv_content = "ID,Name,Location,Type,Status,Units,Sold,Revenue\n"
-        for project in projects_data:
-            csv_content += f"{project['id']},{project['name']},{project['location']},{project['type']},{project['status']},{project['units']},{project['sold']},{project['revenue']}\n"
-        
+        csv_content = ''.join(iter_csv(project_store.iter_rows(columns)))
         return jsonify({
             "success": True,
             "data": csv_content,
-            "filename": f"projects_export_{datetime.now().strftime('%Y%m%d')}.csv"
+            "filename": filename
         })
     
     return jsonify({"success": True, "message": "Export completed"})
@@ -215,12 +537,26 @@ if __name__ == '__main__':
     print("Starting Al Fozan Insights Platform Backend...")
     print("Available endpoints:")
     print("- GET /api/projects")
+    print("- GET /api/projects/near")
+    print("- GET /api/projects/bbox")
+    print("- GET /api/projects/<id>")
     print("- POST /api/projects")
+    print("- POST /api/projects/bulk")
+    print("- PATCH /api/projects")
     print("- PUT /api/projects/<id>")
     print("- DELETE /api/projects/<id>")
     print("- GET /api/competitors")
+    print("- GET /api/competitors/history")
+    print("- GET /api/competitors/movers")
     print("- GET /api/analytics")
+    print("- GET /api/analytics/timeseries")
+    print("- GET /api/analytics/cube")
+    print("- GET /api/search")
+    print("- GET /api/snapshots")
+    print("- GET /api/snapshots/compare")
+    print("- GET /api/stream")
     print("- POST /api/auth/login")
     print("- POST /api/export")
+    print("- GET /metrics")
     app.run(host="0.0.0.0", port=int(os.environ.get("PORT", 5000)))
 
@@ -0,0 +1,51 @@
+"""
+Sales simulation engine for Al Fozan Insights Platform
+Computes a simulated sales period for the whole portfolio in one array pass.
+All randomness comes from the numpy Generator passed in, so a run with a
+fixed seed is reproducible.
+"""
+
+import numpy as np
+
+# Share of the available units a project of each type sells per period
+BASE_SALES_RATES = {
+    'Residential': 0.15,
+    'Commercial': 0.08,
+    'Industrial': 0.05
+}
+DEFAULT_SALES_RATE = 0.10
+
+# Projects only sell once construction is past this point
+MIN_SELLING_PROGRESS = 20
+
+
+def base_sales_rates(project_types):
+    """Map an array of project types to their base sales rate"""
+    types, inverse = np.unique(np.asarray(project_types, dtype=object).astype(str), return_inverse=True)
+    rates = np.array([BASE_SALES_RATES.get(t, DEFAULT_SALES_RATE) for t in types], dtype=float)
+    return rates[inverse]
+
+
+def simulate_sales(units, units_sold, progress, project_types, rng):
+    """Return the number of newly sold units for each project
+
+    Arguments are equal-length arrays; `rng` is a numpy Generator.
+    """
+    units = np.asarray(units, dtype=np.int64)
+    units_sold = np.asarray(units_sold, dtype=np.int64)
+    progress = np.nan_to_num(np.asarray(progress, dtype=float))
+
+    available_units = units - units_sold
+    if len(units) == 0:
+        return np.zeros(0, dtype=np.int64)
+
+    # Adjust sales rate based on progress
+    progress_multiplier = np.minimum(2.0, progress / 50)
+    adjusted_sales_rate = base_sales_rates(project_types) * progress_multiplier
+
+    # Draw new sales uniformly from 0..max(1, max_new_sales), inclusive
+    max_new_sales = (available_units * adjusted_sales_rate).astype(np.int64)
+    new_sales = rng.integers(0, np.maximum(1, max_new_sales), endpoint=True)
+
+    selling = (available_units > 0) & (progress > MIN_SELLING_PROGRESS)
+    return np.where(selling, np.minimum(new_sales, available_units), 0)
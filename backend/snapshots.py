@@ -0,0 +1,176 @@
+"""
+Columnar snapshot archive for Al Fozan Insights Platform
+Each daily run writes projects, competitors and analytics as uncompressed
+Arrow IPC (Feather v2) files under snapshots/<date>/, and records them in
+snapshots/index.json. Historical queries memory-map the files and read
+only the columns they ask for, without touching the live database; as the
+buffers are stored uncompressed, those columns are used in place rather
+than decoded into memory.
+"""
+
+import json
+import os
+from datetime import datetime
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.feather as feather
+
+SNAPSHOT_DIR = os.environ.get('SNAPSHOT_DIR', 'snapshots')
+INDEX_FILE = 'index.json'
+
+SNAPSHOT_TABLES = ('projects', 'competitors', 'analytics')
+
+BATCH_SIZE = 65536
+
+# Declared SQLite column types and the Arrow type each is stored as;
+# anything else (TEXT, DATE, TIMESTAMP) is kept as a string
+ARROW_TYPES = {
+    'INTEGER': pa.int64(),
+    'REAL': pa.float64(),
+}
+
+# Numeric project columns that can be compared between snapshots
+COMPARABLE_COLUMNS = ('budget', 'progress', 'units', 'units_sold')
+
+
+class SnapshotNotFound(LookupError):
+    """Raised when no snapshot exists for the requested date or table"""
+
+
+def table_schema(conn, table):
+    columns = conn.execute(f'PRAGMA table_info({table})').fetchall()
+    return pa.schema([
+        (column['name'], ARROW_TYPES.get((column['type'] or '').upper(), pa.string()))
+        for column in columns
+    ])
+
+
+def write_table(conn, table, path, batch_size=BATCH_SIZE):
+    """Stream `table` into an uncompressed Arrow IPC file; returns the row count"""
+    schema = table_schema(conn, table)
+    rows_written = 0
+    with pa.OSFile(path, 'wb') as sink, pa.ipc.new_file(sink, schema) as writer:
+        cursor = conn.execute(f"SELECT {', '.join(schema.names)} FROM {table} ORDER BY rowid")
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            columns = list(zip(*rows))
+            writer.write_batch(pa.record_batch(
+                [pa.array(values, type=field.type) for values, field in zip(columns, schema)],
+                schema=schema
+            ))
+            rows_written += len(rows)
+    return rows_written
+
+
+def read_index(snapshot_dir=SNAPSHOT_DIR):
+    """Return {date: snapshot entry} for every snapshot in the archive"""
+    try:
+        with open(os.path.join(snapshot_dir, INDEX_FILE)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def write_index(index, snapshot_dir=SNAPSHOT_DIR):
+    path = os.path.join(snapshot_dir, INDEX_FILE)
+    temporary = f'{path}.tmp'
+    with open(temporary, 'w') as f:
+        json.dump(dict(sorted(index.items())), f, indent=2)
+    os.replace(temporary, path)
+
+
+def write_snapshot(conn, date=None, snapshot_dir=SNAPSHOT_DIR):
+    """Write today's (or `date`'s) snapshot of every table and add it to the index
+
+    All tables are read in one transaction, so the snapshot is consistent
+    even while the data processor is writing.
+    """
+    date = date or datetime.now().strftime('%Y-%m-%d')
+    directory = os.path.join(snapshot_dir, date)
+    os.makedirs(directory, exist_ok=True)
+
+    tables = {}
+    conn.execute('BEGIN')
+    try:
+        for table in SNAPSHOT_TABLES:
+            path = os.path.join(directory, f'{table}.arrow')
+            rows = write_table(conn, table, path)
+            tables[table] = {
+                "file": os.path.relpath(path, snapshot_dir),
+                "rows": rows,
+                "bytes": os.path.getsize(path)
+            }
+    finally:
+        conn.rollback()
+
+    index = read_index(snapshot_dir)
+    index[date] = {"created_at": datetime.now().isoformat(), "tables": tables}
+    write_index(index, snapshot_dir)
+    return index[date]
+
+
+def load_table(date, table, columns=None, snapshot_dir=SNAPSHOT_DIR):
+    """Memory-map one table of a snapshot, reading only `columns`
+
+    Snapshots written before the archive stopped compressing are still
+    read, but their buffers are decompressed.
+    """
+    entry = read_index(snapshot_dir).get(date)
+    if entry is None or table not in entry['tables']:
+        raise SnapshotNotFound(f"No {table} snapshot for {date}")
+    path = os.path.join(snapshot_dir, entry['tables'][table]['file'])
+    return feather.read_table(path, columns=list(columns) if columns else None, memory_map=True)
+
+
+def compare_projects(from_date, to_date, columns=COMPARABLE_COLUMNS, snapshot_dir=SNAPSHOT_DIR, top=10):
+    """Summarise how projects changed between two snapshots
+
+    Returns the projects added and removed, portfolio totals of `columns`
+    at both dates, and the `top` projects with the largest change in each
+    column among those present in both.
+    """
+    unknown = set(columns) - set(COMPARABLE_COLUMNS)
+    if unknown:
+        raise ValueError(f"Cannot compare: {', '.join(sorted(unknown))}")
+
+    selected = ['id', *columns]
+    before = load_table(from_date, 'projects', selected, snapshot_dir)
+    after = load_table(to_date, 'projects', selected, snapshot_dir)
+
+    # Computed with Arrow kernels on the memory-mapped columns rather than
+    # copied into pandas; only the rows present at both dates are gathered
+    matches = pc.index_in(after['id'], value_set=before['id'])
+    present = pc.is_valid(matches)
+    ids = after['id'].filter(present)
+    positions = matches.filter(present)
+    deltas = {
+        column: pc.subtract(after[column].filter(present), before[column].take(positions))
+        for column in columns
+    }
+    changed = pc.fill_null(pa.nulls(len(ids), pa.bool_()), False)
+    for delta in deltas.values():
+        changed = pc.or_(changed, pc.fill_null(pc.not_equal(delta, 0), False))
+
+    comparison = {
+        "from": from_date,
+        "to": to_date,
+        "added": after.num_rows - len(ids),
+        "removed": before.num_rows - len(ids),
+        "changed": pc.sum(changed, min_count=0).as_py(),
+        "columns": {}
+    }
+    for column, delta in deltas.items():
+        nonzero = pc.fill_null(pc.not_equal(delta, 0), False)
+        changes = pa.table({"id": ids.filter(nonzero), "delta": delta.filter(nonzero)})
+        order = pc.sort_indices(changes.append_column('size', pc.abs(changes['delta'])),
+                                sort_keys=[('size', 'descending'), ('id', 'ascending')])
+        largest = changes.take(order[:top]).to_pylist()
+        comparison["columns"][column] = {
+            "total_from": float(pc.sum(before[column], min_count=0).as_py()),
+            "total_to": float(pc.sum(after[column], min_count=0).as_py()),
+            "top_changes": [{"id": row['id'], "delta": float(row['delta'])} for row in largest]
+        }
+    return comparison
@@ -0,0 +1,81 @@
+"""
+Shared fixtures for the backend tests
+Every test gets its own migrated SQLite file; backend modules are imported
+flat, the way simple_app.py and data_processor.py import each other.
+"""
+
+import os
+import sys
+import tempfile
+
+import pytest
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+# Read at import time by auth and db, so set before any backend import
+os.environ.setdefault('JWT_SECRET_KEY', 'test-secret')
+os.environ.setdefault('AUTH_REQUIRED', 'true')
+os.environ.setdefault('DATABASE_PATH', os.path.join(tempfile.mkdtemp(), 'app.db'))
+
+from db import init_db  # noqa: E402
+from project_store import ProjectStore  # noqa: E402
+
+PROJECT = {
+    "name": "Riyadh Business District",
+    "type": "Commercial",
+    "status": "In Progress",
+    "location": "Riyadh",
+    "budget": 2500000000,
+    "progress": 75,
+    "units": 450,
+    "units_sold": 340,
+    "start_date": "2023-01-15",
+    "end_date": "2030-12-31",
+    "manager": "Ahmed Al-Rashid"
+}
+
+
+def make_project(**overrides):
+    return {**PROJECT, **overrides}
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    path = str(tmp_path / 'test.db')
+    init_db(path)
+    return path
+
+
+@pytest.fixture
+def store(db_path):
+    return ProjectStore(db_path)
+
+
+@pytest.fixture
+def create_projects(store):
+    """Create `count` projects named "Project 0", "Project 1", ... with the same overrides"""
+    def create(count, **overrides):
+        return [store.create(make_project(name=f"Project {i}", **overrides)) for i in range(count)]
+    return create
+
+
+@pytest.fixture
+def processor(db_path, tmp_path, monkeypatch):
+    """A DataProcessor on the test database, writing its log and reports under tmp_path"""
+    monkeypatch.chdir(tmp_path)
+    from data_processor import DataProcessor
+    return DataProcessor(db_path, seed=1)
+
+
+@pytest.fixture
+def client():
+    """Test client for the API, on the database named by DATABASE_PATH"""
+    from simple_app import app
+    return app.test_client()
+
+
+@pytest.fixture
+def auth_headers():
+    from auth import issue_token
+    return {'Authorization': f"Bearer {issue_token('admin', 'admin')}"}
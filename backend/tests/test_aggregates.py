@@ -0,0 +1,67 @@
+from aggregates import check_kpis, compute_kpis, get_kpis
+from db import connection
+
+from conftest import make_project
+
+
+def assert_kpis_consistent(db_path):
+    with connection(db_path) as conn:
+        assert check_kpis(conn) == {}
+
+
+def test_kpis_follow_inserts_updates_and_deletes(store, db_path):
+    first = store.create(make_project())
+    second = store.create(make_project(name="Jeddah Waterfront", units=280, units_sold=45, progress=25))
+    assert_kpis_consistent(db_path)
+
+    store.update(first['id'], {"progress": 90, "units_sold": 400, "budget": 2600000000})
+    assert_kpis_consistent(db_path)
+
+    store.delete(second['id'])
+    assert_kpis_consistent(db_path)
+
+    kpis = store.kpis()
+    assert kpis['total_projects'] == 1
+    assert kpis['total_units'] == 450
+    assert kpis['total_units_sold'] == 400
+    assert kpis['sales_rate'] == 400 / 450 * 100
+
+
+def test_kpis_follow_bulk_upserts(store, db_path):
+    rows = ((i, make_project(name=f"Project {i}", units=100 + i, units_sold=50)) for i in range(50))
+    report = store.bulk_upsert(rows)
+    assert report['upserted'] == 50
+    store.bulk_upsert([(1, make_project(id=1, units=1000, units_sold=10))])
+    assert_kpis_consistent(db_path)
+
+
+def test_empty_portfolio_has_zero_kpis(db_path):
+    with connection(db_path) as conn:
+        kpis = get_kpis(conn)
+    assert kpis['total_projects'] == 0
+    assert kpis['sales_rate'] == 0
+
+
+def test_check_kpis_reports_and_repairs_drift(store, db_path):
+    store.create(make_project())
+    with connection(db_path) as conn:
+        with conn:
+            conn.execute('UPDATE project_kpis SET total_units = total_units + 5')
+
+        mismatches = check_kpis(conn, repair=True)
+        assert mismatches == {'total_units': (455, 450)}
+        assert check_kpis(conn) == {}
+        assert get_kpis(conn) == compute_kpis(conn)
+
+
+def test_verify_aggregates_repairs_drift(processor, store, db_path):
+    store.create(make_project())
+    assert processor.verify_aggregates() is True
+
+    with connection(db_path) as conn:
+        with conn:
+            conn.execute('UPDATE project_kpis SET total_projects = 7')
+            conn.execute('UPDATE project_cube SET units_sold = units_sold + 1')
+
+    assert processor.verify_aggregates() is False
+    assert processor.verify_aggregates() is True
@@ -0,0 +1,61 @@
+import pytest
+
+import auth
+
+
+@pytest.fixture
+def verifier():
+    return auth.TokenVerifier(max_size=2)
+
+
+def test_issued_token_verifies(verifier):
+    claims = verifier.verify(auth.issue_token('analyst', 'analyst'))
+    assert claims['sub'] == 'analyst'
+    assert claims['role'] == 'analyst'
+
+
+@pytest.mark.parametrize('token', ['', 'abc', 'abc.def', 'é.ü', 'payload.sïgnature', 'ünïcode'])
+def test_malformed_and_non_ascii_tokens_are_rejected(verifier, token):
+    assert verifier.verify(token) is None
+
+
+def test_tampered_and_expired_tokens_are_rejected(verifier):
+    _, _, signature = auth.issue_token('analyst', 'analyst').partition('.')
+    forged = auth.b64encode(b'{"sub":"admin","role":"admin","exp":9999999999}')
+    assert verifier.verify(f'{forged}.{signature}') is None
+    assert verifier.verify(auth.issue_token('analyst', 'analyst', ttl=-1)) is None
+
+
+def test_passwords_are_checked_against_their_hash():
+    assert auth.authenticate('analyst', 'analyst123') is not None
+    assert auth.authenticate('analyst', 'wrong') is None
+    assert auth.authenticate('nobody', 'analyst123') is None
+
+
+def test_missing_secret_refuses_to_start_outside_development(monkeypatch):
+    monkeypatch.delenv('JWT_SECRET_KEY')
+    monkeypatch.delenv('FLASK_ENV', raising=False)
+    with pytest.raises(RuntimeError):
+        auth.load_secret()
+
+    monkeypatch.setenv('FLASK_ENV', 'development')
+    assert len(auth.load_secret()) == 32
+
+
+def test_api_requires_a_valid_token(client, auth_headers):
+    assert client.get('/api/projects').status_code == 401
+    assert client.get('/api/projects', headers={'Authorization': 'Bearer é.ü'}).status_code == 401
+    assert client.get('/api/stream?access_token=%C3%A9.%C3%BC').status_code == 401
+    assert client.get('/api/projects', headers=auth_headers).status_code == 200
+
+
+def test_api_is_open_unless_auth_is_required(client, monkeypatch):
+    monkeypatch.setattr(auth, 'AUTH_REQUIRED', False)
+    assert client.get('/api/projects').status_code == 200
+
+
+def test_login_issues_a_token(client):
+    response = client.post('/api/auth/login', json={'username': 'manager', 'password': 'manager123'})
+    assert response.status_code == 200
+    assert auth.verifier.verify(response.get_json()['token'])['role'] == 'manager'
+    assert client.post('/api/auth/login', json={'username': 'manager', 'password': 'x'}).status_code == 401
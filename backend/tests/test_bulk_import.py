@@ -0,0 +1,90 @@
+import json
+
+from db import connection
+from project_store import ProjectStore
+
+from conftest import make_project
+
+
+def ndjson(*records):
+    return ''.join(json.dumps(record) + '\n' for record in records)
+
+
+def test_bulk_upsert_inserts_and_updates_in_batches(store):
+    rows = [(i, make_project(name=f"Project {i}")) for i in range(1, 26)]
+    report = store.bulk_upsert(rows, batch_size=10)
+    assert report == {"received": 25, "upserted": 25, "failed": 0, "errors": [], "errors_truncated": False}
+
+    report = store.bulk_upsert([(1, make_project(id=3, name="Renamed", units_sold=0))])
+    assert report['upserted'] == 1
+    project = store.get(3)
+    assert project['name'] == "Renamed"
+    assert project['version'] == 2
+
+
+def test_bad_rows_are_reported_and_the_rest_stored(store):
+    rows = [
+        (1, make_project(name="Good 1")),
+        (2, make_project(id=10 ** 20)),
+        (3, make_project(units=10 ** 20)),
+        (4, make_project(budget=float('inf'))),
+        (5, make_project(start_date="not a date")),
+        (6, make_project(units=10, units_sold=11)),
+        (7, {"name": "Missing fields"}),
+        (8, make_project(name="Good 2")),
+    ]
+    report = store.bulk_upsert(rows)
+
+    assert report['received'] == 8
+    assert report['upserted'] == 2
+    assert report['failed'] == 6
+    assert [error['row'] for error in report['errors']] == [2, 3, 4, 5, 6, 7]
+    assert store.kpis()['total_projects'] == 2
+
+
+def test_error_report_is_truncated(store):
+    rows = [(i, {"name": "Missing fields"}) for i in range(5)]
+    report = store.bulk_upsert(rows, max_errors=2)
+    assert report['failed'] == 5
+    assert len(report['errors']) == 2
+    assert report['errors_truncated'] is True
+
+
+def test_rows_failing_in_sqlite_fall_back_to_row_errors(db_path):
+    """A row the batched statement rejects is retried alone and reported, not raised"""
+    columns = ('id', 'name', 'type', 'status', 'location', 'budget', 'units')
+    good = (1, 'Good', 'Commercial', 'Planning', 'Riyadh', 1.0, 10)
+    overflowing = (10 ** 20, 'Bad', 'Commercial', 'Planning', 'Riyadh', 1.0, 10)
+    failed = []
+
+    with connection(db_path) as conn:
+        written = ProjectStore.write_batch(
+            conn, [(1, columns, good), (2, columns, overflowing)], lambda number, message: failed.append(number))
+        stored = conn.execute('SELECT COUNT(*) FROM projects').fetchone()[0]
+
+    assert written == 1
+    assert failed == [2]
+    assert stored == 1
+
+
+def test_bulk_endpoint_reports_row_errors(client, auth_headers):
+    body = ndjson(make_project(name="Bulk good"), make_project(id=10 ** 20)) + '{not json}\n'
+    response = client.post('/api/projects/bulk', data=body,
+                           headers={**auth_headers, 'Content-Type': 'application/x-ndjson'})
+
+    assert response.status_code == 200
+    report = response.get_json()
+    assert report['success'] is False
+    assert report['upserted'] == 1
+    assert [error['row'] for error in report['errors']] == [2, 3]
+
+
+def test_bulk_endpoint_reads_csv(client, auth_headers):
+    body = 'name,type,status,location,budget,units\nCSV project,Commercial,Planning,Riyadh,1000,10\n'
+    response = client.post('/api/projects/bulk', data=body, headers={**auth_headers, 'Content-Type': 'text/csv'})
+    assert response.get_json()['upserted'] == 1
+
+
+def test_bulk_endpoint_rejects_unknown_format(client, auth_headers):
+    response = client.post('/api/projects/bulk', data='x', headers={**auth_headers, 'Content-Type': 'text/plain'})
+    assert response.status_code == 415
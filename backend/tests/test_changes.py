@@ -0,0 +1,96 @@
+from changes import changed_projects, get_checkpoint, latest_seq, prune, read_changes, set_checkpoint
+from data_processor import FULL_PROGRESS_CHECKPOINT
+from db import connection
+
+from conftest import make_project
+
+
+def test_every_write_is_logged(store, db_path):
+    project = store.create(make_project())
+    store.update(project['id'], {"progress": 80, "manager": "Someone Else"})
+    store.update(project['id'], {"progress": 80})  # no tracked column changes
+    store.delete(project['id'])
+
+    with connection(db_path) as conn:
+        changes = [(c['project_id'], c['op'], c['columns']) for c in read_changes(conn, 0)]
+    assert changes == [
+        (project['id'], 'insert', None),
+        (project['id'], 'update', 'progress,manager'),
+        (project['id'], 'delete', None),
+    ]
+
+
+def test_changed_projects_filters_by_column_and_drops_deleted(store, db_path):
+    first = store.create(make_project())
+    second = store.create(make_project(name="Second"))
+    third = store.create(make_project(name="Third"))
+    with connection(db_path) as conn:
+        seq = latest_seq(conn)
+
+    store.update(first['id'], {"manager": "Someone Else"})
+    store.update(second['id'], {"status": "Completed"})
+    store.update(third['id'], {"status": "Completed"})
+    store.delete(third['id'])
+
+    with connection(db_path) as conn:
+        assert changed_projects(conn, seq) == {first['id'], second['id']}
+        assert changed_projects(conn, seq, ('status',)) == {second['id']}
+
+
+def test_checkpoints(db_path):
+    with connection(db_path) as conn:
+        assert get_checkpoint(conn, 'job') is None
+        with conn:
+            set_checkpoint(conn, 'job', 5)
+            set_checkpoint(conn, 'job', 7)
+        assert get_checkpoint(conn, 'job') == 7
+
+
+def test_prune_keeps_entries_a_checkpoint_has_not_passed(create_projects, db_path):
+    create_projects(4)
+
+    with connection(db_path) as conn:
+        assert prune(conn, retention_hours=-1) == 0  # no consumer has run yet
+        with conn:
+            set_checkpoint(conn, 'fast', 4)
+            set_checkpoint(conn, 'slow', 2)
+        assert prune(conn, retention_hours=1) == 0  # still within retention
+        assert prune(conn, retention_hours=-1) == 2
+        assert [c['seq'] for c in read_changes(conn, 0)] == [3, 4]
+
+
+def test_progress_job_only_revisits_changed_projects(processor, store, create_projects):
+    projects = create_projects(3, status='In Progress')
+
+    assert processor.update_project_progress() == 3
+    assert processor.update_project_progress() == 0
+
+    store.update(projects[1]['id'], {"end_date": "2031-06-30"})
+    store.update(projects[2]['id'], {"manager": "Someone Else"})  # not a progress input
+    assert processor.update_project_progress() == 1
+    assert processor.update_project_progress(full=True) == 3
+
+
+def test_first_progress_run_of_the_day_revisits_every_project(processor, create_projects):
+    create_projects(3, status='In Progress')
+    processor.update_project_progress()
+    assert processor.update_project_progress() == 0
+
+    with connection(processor.db_path) as conn:
+        with conn:
+            conn.execute("UPDATE job_checkpoints SET updated_at = datetime('now', '-1 day') WHERE job = ?",
+                         (FULL_PROGRESS_CHECKPOINT,))
+    assert processor.update_project_progress() == 3
+    assert processor.update_project_progress() == 0
+
+
+def test_sales_job_only_revisits_changed_projects(processor, store, create_projects):
+    projects = create_projects(3, units=10 ** 6, units_sold=0)
+
+    processor.update_sales_data()
+    assert processor.update_sales_data() == 0
+
+    store.update(projects[0]['id'], {"units": 2 * 10 ** 6})
+    processor.update_sales_data()
+    with connection(processor.db_path) as conn:
+        assert changed_projects(conn, get_checkpoint(conn, 'update_sales_data')) == set()
@@ -0,0 +1,126 @@
+import pytest
+
+from competitor_store import CompetitorStore, MAX_HISTORY_COMPETITORS
+from db import connection
+from project_store import ValidationError
+
+# market_share readings per competitor, by month of 2024
+READINGS = {
+    'Alpha': [10.0, 12.0, 15.0],
+    'Beta': [20.0, 18.0, 11.0],
+    'Gamma': [5.0, 5.0, 5.0],
+    'Delta': [7.0, 9.0, 8.0],
+    'Late': [None, 4.0, 6.0],
+}
+
+
+@pytest.fixture
+def competitors(db_path):
+    """Competitors with history readings on the first of January to March 2024"""
+    ids = {}
+    with connection(db_path) as conn:
+        with conn:
+            for name, shares in READINGS.items():
+                ids[name] = conn.execute(
+                    'INSERT INTO competitors (name, market_share, digital_presence) VALUES (?, ?, 50)',
+                    (name, shares[-1])
+                ).lastrowid
+                # Only the dated readings below are under test
+                conn.execute('DELETE FROM competitor_history WHERE competitor_id = ?', (ids[name],))
+                for month, share in enumerate(shares, start=1):
+                    if share is not None:
+                        conn.execute(
+                            'INSERT INTO competitor_history VALUES (?, ?, ?, 50)',
+                            (ids[name], f'2024-0{month}-01 00:00:00', share)
+                        )
+    return CompetitorStore(db_path), ids
+
+
+def test_movers_are_ordered_by_size_of_change(competitors):
+    store, ids = competitors
+    movers = store.top_movers(start='2024-01-15', end='2024-03-15')
+
+    assert [(m['id'], m['change']) for m in movers['gainers']] == [(ids['Alpha'], 5.0), (ids['Late'], 2.0),
+                                                                  (ids['Delta'], 1.0)]
+    assert [(m['id'], m['change']) for m in movers['losers']] == [(ids['Beta'], -9.0)]
+    assert movers['gainers'][0] == {"id": ids['Alpha'], "name": 'Alpha', "from": 10.0, "to": 15.0, "change": 5.0}
+    assert (movers['start'], movers['end']) == ('2024-01-15 00:00:00', '2024-03-15 00:00:00')
+
+
+def test_movers_are_limited_to_top(competitors):
+    store, ids = competitors
+    movers = store.top_movers(start='2024-01-15', end='2024-03-15', top=2)
+    assert [m['id'] for m in movers['gainers']] == [ids['Alpha'], ids['Late']]
+
+    # Alpha and Delta both gain 2 by February; ties go to the higher id
+    window = store.top_movers(start='2024-01-15', end='2024-02-15', top=1)
+    assert [m['id'] for m in window['gainers']] == [ids['Delta']]
+    assert [m['id'] for m in window['losers']] == [ids['Beta']]
+
+
+@pytest.mark.parametrize('kwargs', [
+    {"metric": 'revenue'},
+    {"top": 0},
+    {"top": 101},
+    {"start": '2024-03-01', "end": '2024-01-01'},
+    {"start": 'yesterday'},
+])
+def test_movers_reject_bad_arguments(competitors, kwargs):
+    store, _ = competitors
+    with pytest.raises(ValidationError):
+        store.top_movers(**kwargs)
+
+
+def test_history_returns_each_trajectory_in_time_order(competitors):
+    store, ids = competitors
+    history = store.history([str(ids['Beta']), str(ids['Alpha'])])
+
+    assert [(t['id'], t['name']) for t in history] == sorted([(ids['Alpha'], 'Alpha'), (ids['Beta'], 'Beta')])
+    assert history[0]['points'] == [
+        {"recorded_at": f'2024-0{month}-01 00:00:00', "value": share}
+        for month, share in enumerate(READINGS['Alpha'], start=1)
+    ]
+
+
+def test_history_window_is_half_open(competitors):
+    store, ids = competitors
+    history = store.history([ids['Alpha']], start='2024-02-01', end='2024-03-01')
+    assert [p['value'] for p in history[0]['points']] == [12.0]
+
+
+def test_history_downsamples_to_points(competitors):
+    store, ids = competitors
+    points = store.history([ids['Beta']], points=2)[0]['points']
+    assert [p['value'] for p in points] == [20.0, 11.0]
+
+
+def test_updates_are_recorded_in_history(competitors, db_path):
+    store, ids = competitors
+    with connection(db_path) as conn:
+        with conn:
+            conn.execute('UPDATE competitors SET market_share = 30 WHERE id = ?', (ids['Gamma'],))
+            conn.execute('UPDATE competitors SET name = ? WHERE id = ?', ('Renamed', ids['Delta']))
+
+    assert [p['value'] for p in store.history([ids['Gamma']])[0]['points']] == [5.0, 5.0, 5.0, 30.0]
+    assert len(store.history([ids['Delta']])[0]['points']) == 3
+
+
+@pytest.mark.parametrize('competitor_ids, kwargs', [
+    ([], {}),
+    (['abc'], {}),
+    ([str(i) for i in range(1, MAX_HISTORY_COMPETITORS + 2)], {}),
+    (['1'], {"metric": 'revenue'}),
+    (['1'], {"method": 'median'}),
+])
+def test_history_rejects_bad_arguments(competitors, competitor_ids, kwargs):
+    store, _ = competitors
+    with pytest.raises(ValidationError):
+        store.history(competitor_ids, **kwargs)
+
+
+def test_movers_endpoint(client, auth_headers):
+    response = client.get('/api/competitors/movers?top=2', headers=auth_headers)
+    assert response.status_code == 200
+    data = response.get_json()['data']
+    assert len(data['gainers']) <= 2 and len(data['losers']) <= 2
+    assert client.get('/api/competitors/movers?metric=revenue', headers=auth_headers).status_code == 400
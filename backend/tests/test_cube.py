@@ -0,0 +1,70 @@
+import pytest
+
+from aggregates import CUBE_RECOMPUTE_SQL, check_cube, query_cube
+from db import connection
+
+from conftest import make_project
+
+
+@pytest.fixture
+def portfolio(store):
+    projects = [
+        store.create(make_project(location='Riyadh', type='Commercial', status='In Progress')),
+        store.create(make_project(location='Riyadh', type='Residential', status='Planning', units=200, units_sold=20)),
+        store.create(make_project(location='Jeddah', type='Residential', status='Completed', progress=100)),
+    ]
+    return projects
+
+
+def test_cube_matches_group_by_after_writes(store, db_path, portfolio):
+    store.update(portfolio[0]['id'], {"status": "Completed", "budget": 1234567.89})
+    store.update(portfolio[1]['id'], {"location": "Jeddah"})
+    store.delete(portfolio[2]['id'])
+    store.bulk_upsert([(1, make_project(location='Dammam', type='Industrial'))])
+
+    with connection(db_path) as conn:
+        assert check_cube(conn) == []
+        cells = conn.execute('SELECT COUNT(*) FROM project_cube').fetchone()[0]
+        groups = len(conn.execute(CUBE_RECOMPUTE_SQL).fetchall())
+    assert cells == groups
+
+
+def test_query_cube_rolls_up_dimensions(db_path, portfolio):
+    with connection(db_path) as conn:
+        by_location = {cell['location']: cell for cell in query_cube(conn, ['location'])}
+        residential = query_cube(conn, filters={'type': 'Residential'})
+
+    assert by_location['Riyadh']['project_count'] == 2
+    assert by_location['Riyadh']['units'] == 650
+    assert by_location['Jeddah']['project_count'] == 1
+    assert residential[0]['project_count'] == 2
+
+
+def test_query_cube_rejects_unknown_dimension(db_path):
+    with connection(db_path) as conn:
+        with pytest.raises(ValueError):
+            query_cube(conn, ['manager'])
+
+
+def test_float_drift_in_budget_is_tolerated(db_path, portfolio):
+    with connection(db_path) as conn:
+        with conn:
+            conn.execute('UPDATE project_cube SET budget = budget * (1 + 1e-12), revenue = revenue * (1 - 1e-12)')
+        assert check_cube(conn) == []
+
+
+@pytest.mark.parametrize('column', ['project_count', 'units', 'units_sold'])
+def test_count_drift_is_reported_and_repaired(db_path, portfolio, column):
+    with connection(db_path) as conn:
+        with conn:
+            conn.execute(f"UPDATE project_cube SET {column} = {column} + 1 WHERE location = 'Jeddah'")
+
+        assert check_cube(conn, repair=True) == [('Jeddah', 'Residential', 'Completed')]
+        assert check_cube(conn) == []
+
+
+def test_missing_cell_is_reported(db_path, portfolio):
+    with connection(db_path) as conn:
+        with conn:
+            conn.execute("DELETE FROM project_cube WHERE location = 'Jeddah'")
+        assert check_cube(conn) == [('Jeddah', 'Residential', 'Completed')]
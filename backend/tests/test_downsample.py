@@ -0,0 +1,65 @@
+import math
+
+import pytest
+
+from downsample import downsample, lttb, minmax
+
+
+def wave(count):
+    xs = list(range(count))
+    return xs, [math.sin(x / 10) * 100 for x in xs]
+
+
+def test_short_series_is_kept_whole():
+    xs, ys = wave(10)
+    assert lttb(xs, ys, 20) == list(range(10))
+    assert minmax(ys, 20) == list(range(10))
+
+
+def test_lttb_keeps_endpoints_and_threshold():
+    xs, ys = wave(1000)
+    kept = lttb(xs, ys, 50)
+    assert len(kept) == 50
+    assert kept[0] == 0 and kept[-1] == 999
+    assert kept == sorted(set(kept))
+
+
+def test_lttb_keeps_a_spike():
+    xs = list(range(500))
+    ys = [0.0] * 500
+    ys[250] = 1000.0
+    assert 250 in lttb(xs, ys, 20)
+
+
+def test_minmax_keeps_every_bucket_extreme():
+    xs, ys = wave(1000)
+    kept = minmax(ys, 40)
+    assert len(kept) <= 40
+    assert kept == sorted(kept)
+    assert ys.index(max(ys)) in kept
+    assert ys.index(min(ys)) in kept
+
+
+def test_unknown_method_is_rejected():
+    with pytest.raises(ValueError):
+        downsample([0, 1], [0, 1], 1, 'median')
+
+
+@pytest.mark.parametrize('url', [
+    '/api/analytics?months=²',
+    '/api/analytics?months=0',
+    '/api/analytics?points=-1',
+    '/api/competitors/movers?top=²',
+    '/api/analytics/timeseries?metric=revenue&points=٣',
+    '/api/projects?limit=1.5',
+    '/api/search?q=riyadh&limit=²',
+    '/api/projects/bbox?south=1&west=1&north=2&east=2&zoom=²',
+])
+def test_invalid_integer_parameters_are_rejected(client, auth_headers, url):
+    assert client.get(url, headers=auth_headers).status_code == 400
+
+
+def test_analytics_trends_are_downsampled(client, auth_headers):
+    response = client.get('/api/analytics?months=24&points=6', headers=auth_headers)
+    assert response.status_code == 200
+    assert len(response.get_json()['data']['monthly_trends']) <= 6
@@ -0,0 +1,114 @@
+import gzip
+import uuid
+from datetime import date, datetime, timedelta, timezone
+from decimal import Decimal
+
+import brotli
+import pytest
+import zstandard
+from flask import Flask, Response, jsonify
+
+import encoding
+
+LARGE = 'x' * (encoding.MIN_COMPRESS_BYTES + 100)
+
+DECODERS = {
+    'gzip': gzip.decompress,
+    'br': brotli.decompress,
+    'zstd': lambda data: zstandard.ZstdDecompressor().decompressobj().decompress(data),
+}
+
+
+@pytest.fixture
+def app():
+    app = Flask(__name__)
+    encoding.install(app)
+
+    @app.route('/large')
+    def large():
+        return jsonify({"text": LARGE})
+
+    @app.route('/small')
+    def small():
+        return jsonify({"text": "x"})
+
+    @app.route('/stream')
+    def stream():
+        return Response((f'{i},{LARGE}\n' for i in range(3)), mimetype='text/csv')
+
+    @app.route('/binary')
+    def binary():
+        return Response(LARGE.encode(), mimetype='application/octet-stream')
+
+    return app
+
+
+@pytest.mark.parametrize('accept, expected', [
+    ('gzip, deflate, br, zstd', 'zstd'),
+    ('gzip, br', 'br'),
+    ('gzip', 'gzip'),
+    ('zstd;q=0, br;q=0.5, gzip', 'gzip'),
+    ('br;q=0, gzip;q=0.1', 'gzip'),
+    ('*', 'zstd'),
+    ('gzip;q=0', None),
+    ('identity', None),
+    ('', None),
+])
+def test_negotiation(app, accept, expected):
+    response = app.test_client().get('/large', headers={'Accept-Encoding': accept})
+    assert response.headers.get('Content-Encoding') == expected
+    assert response.headers['Vary'] == 'Accept-Encoding'
+    body = DECODERS[expected](response.data) if expected else response.data
+    assert body == app.test_client().get('/large').data
+
+
+def test_small_and_binary_responses_are_left_alone(app):
+    client = app.test_client()
+    for path in ('/small', '/binary'):
+        response = client.get(path, headers={'Accept-Encoding': 'gzip'})
+        assert 'Content-Encoding' not in response.headers
+        assert 'Vary' not in response.headers
+
+
+def test_streamed_responses_are_compressed_as_they_are_sent(app):
+    response = app.test_client().get('/stream', headers={'Accept-Encoding': 'br'})
+    assert response.headers['Content-Encoding'] == 'br'
+    assert 'Content-Length' not in response.headers
+    assert brotli.decompress(response.data).decode() == ''.join(f'{i},{LARGE}\n' for i in range(3))
+
+
+# Values DefaultJSONProvider.default converts, rendered byte for byte the same
+CONVERTED = {
+    "date": date(2024, 2, 29),
+    "datetime": datetime(2024, 2, 29, 13, 45, 7, 123456),
+    "aware": datetime(2024, 2, 29, 13, 45, 7, tzinfo=timezone(timedelta(hours=3))),
+    "decimal": Decimal('12.50'),
+    "uuid": uuid.UUID('12345678-1234-5678-1234-567812345678'),
+}
+
+
+@pytest.fixture
+def providers(monkeypatch):
+    monkeypatch.setattr(encoding, 'JSON_BACKEND', 'orjson')
+    fast = Flask('fast')
+    fast.json = encoding.FastJSONProvider(fast)
+    return fast, Flask('default')
+
+
+def render(app, obj):
+    with app.app_context():
+        return app.json.response(obj).get_data()
+
+
+@pytest.mark.parametrize('key', list(CONVERTED))
+def test_orjson_output_matches_flask_default(providers, key):
+    fast, default = providers
+    assert render(fast, {key: CONVERTED[key]}) == render(default, {key: CONVERTED[key]})
+
+
+def test_orjson_output_decodes_like_flask_default(providers):
+    fast, default = providers
+    value = {**CONVERTED, "nested": {"b": [1, 2.5, None, True], "a": "ü \" \n"}, "ints": {2: "two", 10: "ten"}}
+    with fast.app_context(), default.app_context():
+        assert fast.json.loads(fast.json.dumps(value)) == default.json.loads(default.json.dumps(value))
+    assert fast.json.loads(render(fast, value)) == default.json.loads(render(default, value))
@@ -0,0 +1,117 @@
+import os
+import re
+
+import pytest
+
+import events
+from aggregates import get_kpis
+from auth import STREAM_SCOPE, issue_token
+from changes import prune, set_checkpoint
+from db import connection
+from events import EventBroker
+
+
+@pytest.fixture
+def broker(db_path):
+    """A broker polled by hand: start() is a no-op, as if its thread were running"""
+    broker = EventBroker(db_path, buffer_size=8)
+    with connection(db_path) as conn:
+        broker.kpis = get_kpis(conn)
+    broker.pid = os.getpid()
+    return broker
+
+
+def event_ids(messages):
+    return [int(match) for match in re.findall(r'^id: (\d+)$', ''.join(messages), re.MULTILINE)]
+
+
+def event_names(messages):
+    return re.findall(r'^event: (\w+)$', ''.join(messages), re.MULTILINE)
+
+
+def test_poll_buffers_project_events_then_kpis(broker, create_projects):
+    create_projects(3)
+    broker.poll()
+
+    messages = [event.message for event in broker.events]
+    assert event_names(messages) == ['project', 'project', 'project', 'kpis']
+    assert event_ids(messages) == [1, 2, 3]
+    assert '"total_projects":3' in messages[-1]
+
+
+def test_resume_from_the_ring(broker, create_projects):
+    create_projects(5)
+    broker.poll()
+
+    messages, position = broker.replay(2)
+    assert event_ids(messages) == [3, 4, 5]
+    assert position == broker.position
+    assert broker.replay(5) == ([], broker.position)
+
+
+def test_resume_falls_back_to_the_change_log(broker, create_projects):
+    create_projects(12)
+    broker.poll()
+    assert broker.events[0].seq > 2  # the ring of 8 no longer reaches back
+
+    messages, _ = broker.replay(2)
+    assert event_ids(messages) == list(range(3, 13))
+
+
+def test_resume_past_the_pruned_log_resets(broker, create_projects, db_path):
+    create_projects(12)
+    broker.poll()
+    with connection(db_path) as conn:
+        with conn:
+            set_checkpoint(conn, 'job', 6)
+        assert prune(conn, retention_hours=-1) == 6
+
+    messages, _ = broker.replay(2)
+    assert event_names(messages) == ['reset']
+    assert '"last_seq":12' in messages[0]
+
+
+def test_subscriber_that_falls_behind_the_ring_is_reset(broker, create_projects):
+    stream = broker.subscribe(heartbeat=0)
+    assert event_names([next(stream)]) == ['kpis']
+
+    create_projects(3)
+    broker.poll()
+    assert event_ids([next(stream)]) == [1, 2, 3]
+    assert next(stream) == ': keepalive\n\n'
+
+    for _ in range(4):
+        create_projects(3)
+        broker.poll()
+    assert event_names([next(stream)]) == ['reset']
+
+
+def test_stream_takes_only_stream_tokens_in_the_query(client, auth_headers, monkeypatch):
+    monkeypatch.setattr(events.broker, 'start', lambda: None)
+    stream_token = client.post('/api/stream/token', headers=auth_headers).get_json()['token']
+    api_token = auth_headers['Authorization'].split()[1]
+
+    response = client.get(f'/api/stream?access_token={stream_token}')
+    assert response.status_code == 200
+    response.close()
+    assert client.get(f'/api/stream?access_token={api_token}').status_code == 401
+    assert client.get('/api/projects', headers={'Authorization': f'Bearer {stream_token}'}).status_code == 401
+
+    expired = issue_token('admin', 'admin', ttl=-1, scope=STREAM_SCOPE)
+    assert client.get(f'/api/stream?access_token={expired}').status_code == 401
+
+
+def test_stream_subscribers_are_capped(client, auth_headers, monkeypatch):
+    monkeypatch.setattr(events.broker, 'start', lambda: None)
+    monkeypatch.setattr(events.broker, 'slots', events.threading.BoundedSemaphore(1))
+
+    first = client.get('/api/stream', headers=auth_headers)
+    assert first.status_code == 200
+    second = client.get('/api/stream', headers=auth_headers)
+    assert second.status_code == 503
+    assert second.headers['Retry-After'] == '3'
+
+    first.close()
+    third = client.get('/api/stream', headers=auth_headers)
+    assert third.status_code == 200
+    third.close()
@@ -0,0 +1,73 @@
+import csv
+import io
+
+from openpyxl import load_workbook
+
+from exporters import EXPORT_COLUMNS, iter_csv, iter_xlsx
+
+from conftest import make_project
+
+COLUMNS = [column for column, _ in EXPORT_COLUMNS]
+HEADERS = [header for _, header in EXPORT_COLUMNS]
+
+
+def read_csv(chunks):
+    return list(csv.reader(io.StringIO(''.join(chunks))))
+
+
+def test_empty_csv_export_is_the_header_row():
+    assert read_csv(iter_csv([])) == [HEADERS]
+
+
+def test_csv_export_escapes_delimiters_quotes_and_newlines(store):
+    awkward = 'Tower "A", Phase 2\nNorth'
+    store.create(make_project(name=awkward))
+
+    rows = read_csv(iter_csv(store.iter_rows(COLUMNS)))
+    assert rows[0] == HEADERS
+    assert rows[1][COLUMNS.index('name')] == awkward
+    assert len(rows) == 2
+
+
+def test_csv_export_is_written_in_batches(store, create_projects):
+    create_projects(25)
+
+    chunks = list(iter_csv(store.iter_rows(COLUMNS, batch_size=7), batch_size=10))
+    assert len(chunks) == 3
+    rows = read_csv(chunks)
+    assert [row[1] for row in rows[1:]] == [f"Project {i}" for i in range(25)]
+
+
+def test_xlsx_export_round_trips(store):
+    store.create(make_project())
+    store.create(make_project(name="Second", budget=1.5))
+
+    workbook = load_workbook(io.BytesIO(b''.join(iter_xlsx(store.iter_rows(COLUMNS), chunk_size=512))))
+    rows = list(workbook['Projects'].values)
+    assert list(rows[0]) == HEADERS
+    assert [row[1] for row in rows[1:]] == ["Riyadh Business District", "Second"]
+    assert rows[2][COLUMNS.index('budget')] == 1.5
+
+
+def test_streamed_csv_download(client, auth_headers):
+    response = client.post('/api/export', json={"type": "csv", "stream": True}, headers=auth_headers)
+    assert response.status_code == 200
+    assert response.mimetype == 'text/csv'
+    disposition = response.headers['Content-Disposition']
+    assert disposition.startswith('attachment; filename="projects_export_') and disposition.endswith('.csv"')
+    assert read_csv([response.get_data(as_text=True)])[0] == HEADERS
+
+
+def test_xlsx_download(client, auth_headers):
+    response = client.post('/api/export', json={"type": "xlsx"}, headers=auth_headers)
+    assert response.status_code == 200
+    assert response.headers['Content-Disposition'].endswith('.xlsx"')
+    workbook = load_workbook(io.BytesIO(response.data))
+    assert list(next(workbook['Projects'].values)) == HEADERS
+
+
+def test_unstreamed_csv_export_is_returned_as_json(client, auth_headers):
+    data = client.post('/api/export', json={"type": "csv"}, headers=auth_headers).get_json()
+    assert data['success'] is True
+    assert read_csv([data['data']])[0] == HEADERS
+    assert data['filename'].endswith('.csv')
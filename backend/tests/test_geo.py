@@ -0,0 +1,137 @@
+import math
+from collections import defaultdict
+
+import pytest
+
+import geo
+from db import connection
+from project_store import ValidationError
+from schema import CLUSTER_MAX_ZOOM
+
+from conftest import make_project
+
+RIYADH = (24.7136, 46.6753)
+
+
+def place(store, lat, lng, **overrides):
+    return store.create(make_project(name=f"Project at {lat},{lng}", latitude=lat, longitude=lng, **overrides))
+
+
+def near_ids(db_path, lat, lng, radius_km, limit=geo.DEFAULT_NEAR_LIMIT):
+    with connection(db_path) as conn:
+        return [project['id'] for project in geo.near(conn, lat, lng, radius_km, limit)]
+
+
+def test_radius_search_drops_box_corners(store, db_path):
+    lat, lng = RIYADH
+    south, west, north, east = geo.radius_bounds(lat, lng, 10)
+    inside = place(store, lat + 0.95 * (north - lat), lng)
+    corner = place(store, lat + 0.95 * (north - lat), lng + 0.95 * (east - lng))
+    assert geo.haversine_km(lat, lng, corner['latitude'], corner['longitude']) > 10
+
+    assert near_ids(db_path, lat, lng, 10) == [inside['id']]
+    with connection(db_path) as conn:
+        in_box = {row['id'] for row in geo.projects_in_box(conn, south, west, north, east)}
+    assert in_box == {inside['id'], corner['id']}
+
+
+def test_radius_search_orders_by_distance_and_limits(store, db_path):
+    lat, lng = RIYADH
+    far = place(store, lat + 0.05, lng)
+    close = place(store, lat + 0.01, lng)
+    middle = place(store, lat, lng - 0.03)
+
+    assert near_ids(db_path, lat, lng, 20) == [close['id'], middle['id'], far['id']]
+    assert near_ids(db_path, lat, lng, 20, limit=2) == [close['id'], middle['id']]
+
+
+def test_radius_search_crosses_the_antimeridian(store, db_path):
+    west = place(store, 0, 179.95)
+    east = place(store, 0, -179.95)
+    place(store, 0, 179)
+
+    south, west_edge, north, east_edge = geo.radius_bounds(0, 179.95, 20)
+    assert west_edge > east_edge
+    assert geo.longitude_ranges(west_edge, east_edge) == [(west_edge, 180.0), (-180.0, east_edge)]
+    assert sorted(near_ids(db_path, 0, 179.95, 20)) == sorted([west['id'], east['id']])
+
+
+def test_radius_search_over_a_pole_covers_every_longitude(store, db_path):
+    across = place(store, 89.95, 180)
+    assert geo.radius_bounds(89.95, 0, 20) == pytest.approx((89.95 - math.degrees(20 / geo.EARTH_RADIUS_KM),
+                                                             -180.0, 90.0, 180.0))
+    assert geo.radius_bounds(-89.99, 0, 20)[0] == -90.0
+    assert near_ids(db_path, 89.95, 0, 20) == [across['id']]
+
+
+@pytest.mark.parametrize('radius_km, limit', [(0, 10), (-1, 10), (geo.MAX_RADIUS_KM + 1, 10), (math.nan, 10),
+                                              (10, 0), (10, geo.MAX_NEAR_LIMIT + 1)])
+def test_near_rejects_bad_radius_and_limit(db_path, radius_km, limit):
+    with pytest.raises(ValidationError):
+        near_ids(db_path, *RIYADH, radius_km, limit)
+
+
+def test_near_endpoint_rejects_bad_radius(client, auth_headers):
+    for radius in ('0', 'abc', '1000'):
+        response = client.get(f'/api/projects/near?lat=24.7&lng=46.7&radius_km={radius}', headers=auth_headers)
+        assert response.status_code == 400
+
+
+def expected_clusters(conn):
+    cells = defaultdict(lambda: [0, 0.0, 0.0])
+    rows = conn.execute("SELECT latitude, longitude FROM projects WHERE latitude IS NOT NULL AND longitude IS NOT NULL")
+    for lat, lng in rows:
+        for zoom in range(CLUSTER_MAX_ZOOM + 1):
+            cell = cells[zoom, geo.cell_index(lng, 180, zoom), geo.cell_index(lat, 90, zoom)]
+            cell[0] += 1
+            cell[1] += lat
+            cell[2] += lng
+    return cells
+
+
+def assert_clusters_match(db_path):
+    with connection(db_path) as conn:
+        expected = expected_clusters(conn)
+        actual = {
+            (zoom, x, y): [count, sum_lat, sum_lng]
+            for zoom, x, y, count, sum_lat, sum_lng in conn.execute("SELECT * FROM project_clusters")
+        }
+    assert actual.keys() == expected.keys()
+    for key, (count, sum_lat, sum_lng) in expected.items():
+        assert actual[key][0] == count
+        assert actual[key][1:] == pytest.approx([sum_lat, sum_lng])
+
+
+def test_cluster_triggers_follow_inserts_moves_and_deletes(store, db_path):
+    lat, lng = RIYADH
+    projects = [place(store, lat + i * 0.3, lng - i * 0.7) for i in range(6)]
+    place(store, 21.4858, 39.1925)
+    store.create(make_project(name="Unplaced"))
+    assert_clusters_match(db_path)
+
+    store.update(projects[0]['id'], {"latitude": -33.86, "longitude": 151.2})
+    store.update(projects[1]['id'], {"latitude": None, "longitude": None})
+    store.delete(projects[2]['id'])
+    assert_clusters_match(db_path)
+
+    for project in projects[3:]:
+        store.delete(project['id'])
+    assert_clusters_match(db_path)
+
+
+def test_viewport_returns_clusters_up_to_the_max_zoom(store, db_path):
+    for i in range(5):
+        place(store, RIYADH[0] + i * 0.001, RIYADH[1])
+    place(store, 0, 179.9)
+
+    with connection(db_path) as conn:
+        view = geo.viewport(conn, 20, 40, 30, 50, zoom=3)
+        assert [cluster['count'] for cluster in view['clusters']] == [5]
+        assert view['clusters'][0]['latitude'] == pytest.approx(RIYADH[0] + 0.002)
+
+        across = geo.viewport(conn, -5, 170, 5, -170)
+        assert len(across['projects']) == 1 and not across['has_more']
+        assert len(geo.viewport(conn, -5, 170, 5, -170, zoom=2)['clusters']) == 1
+
+        with pytest.raises(ValidationError):
+            geo.viewport(conn, 30, 40, 20, 50)
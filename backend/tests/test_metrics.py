@@ -0,0 +1,93 @@
+import os
+import re
+
+import pytest
+
+from metrics import CONTENT_TYPE, Registry, classify_statement, job_runs, timed_job
+
+# One sample line of the text exposition format: name, optional labels, value
+SAMPLE = re.compile(r'^[a-zA-Z_:][a-zA-Z0-9_:]*(\{[a-zA-Z_][a-zA-Z0-9_]*="(?:[^"\\]|\\.)*"'
+                    r'(,[a-zA-Z_][a-zA-Z0-9_]*="(?:[^"\\]|\\.)*")*\})? -?[0-9.e+-]+$')
+
+
+def assert_exposition_format(text):
+    assert text.endswith('\n')
+    for line in text.splitlines():
+        assert line.startswith('# HELP ') or line.startswith('# TYPE ') or SAMPLE.match(line), line
+
+
+def test_counter_renders_one_sample_per_label_set():
+    registry = Registry()
+    requests = registry.counter('requests_total', 'Requests', ('route',))
+    requests.inc('/a')
+    requests.inc('/a', amount=2)
+    requests.inc('/b "quoted"\\path')
+
+    text = registry.render()
+    assert_exposition_format(text)
+    assert f'process_info{{pid="{os.getpid()}"}} 1' in text
+    assert '# TYPE requests_total counter' in text
+    assert 'requests_total{route="/a"} 3' in text
+    assert 'requests_total{route="/b \\"quoted\\"\\\\path"} 1' in text
+
+
+def test_histogram_buckets_are_cumulative_and_inclusive():
+    registry = Registry()
+    latency = registry.histogram('latency_seconds', 'Latency', ('route',), buckets=(0.1, 1))
+    for value in (0.05, 0.1, 0.5, 2):
+        latency.observe(value, '/a')
+
+    text = registry.render()
+    assert_exposition_format(text)
+    assert text.splitlines()[3:] == [
+        '# HELP latency_seconds Latency',
+        '# TYPE latency_seconds histogram',
+        'latency_seconds_bucket{route="/a",le="0.1"} 2',
+        'latency_seconds_bucket{route="/a",le="1"} 3',
+        'latency_seconds_bucket{route="/a",le="+Inf"} 4',
+        'latency_seconds_sum{route="/a"} 2.65',
+        'latency_seconds_count{route="/a"} 4',
+    ]
+
+
+@pytest.mark.parametrize('sql, labels', [
+    ('SELECT * FROM projects WHERE id = ?', ('SELECT', 'projects')),
+    ('  insert into Project_Changes (seq) values (?)', ('INSERT', 'project_changes')),
+    ('UPDATE projects SET progress = ?', ('UPDATE', 'projects')),
+    ('WITH x AS (SELECT 1) SELECT * FROM x', ('WITH', 'x')),
+    ('PRAGMA journal_mode = WAL', ('PRAGMA', '')),
+    ('BEGIN IMMEDIATE', ('BEGIN', '')),
+    ('', ('UNKNOWN', '')),
+])
+def test_statements_are_labelled_by_operation_and_table(sql, labels):
+    assert classify_statement(sql) == labels
+
+
+def test_timed_job_counts_outcomes():
+    @timed_job('flaky')
+    def job(fail):
+        if fail:
+            raise RuntimeError('boom')
+        return 'done'
+
+    assert job(False) == 'done'
+    with pytest.raises(RuntimeError):
+        job(True)
+
+    assert job_runs.values[('flaky', 'success')] == 1
+    assert job_runs.values[('flaky', 'error')] == 1
+
+
+def test_metrics_endpoint(client, auth_headers):
+    client.get('/api/projects', headers=auth_headers)
+    client.get('/api/projects/999999999', headers=auth_headers)
+
+    response = client.get('/metrics')
+    assert response.status_code == 200
+    assert response.headers['Content-Type'] == CONTENT_TYPE
+    text = response.get_data(as_text=True)
+    assert_exposition_format(text)
+    assert re.search(r'^http_requests_total\{method="GET",route="/api/projects",status="200"\} \d+$', text, re.M)
+    assert re.search(r'^http_requests_total\{method="GET",route="/api/projects/<int:project_id>",status="404"\} \d+$',
+                     text, re.M)
+    assert re.search(r'^db_query_duration_seconds_count\{operation="SELECT",table="projects"\} \d+$', text, re.M)
@@ -0,0 +1,86 @@
+import base64
+
+import pytest
+
+from project_store import MAX_INTEGER, ValidationError, decode_cursor, encode_cursor
+
+from conftest import make_project
+
+
+@pytest.fixture
+def projects(store):
+    locations = ['Riyadh', 'Jeddah', 'Dammam']
+    return [
+        store.create(make_project(name=f"Project {i}", location=locations[i % 3],
+                                  start_date=f"2023-{i % 12 + 1:02d}-01"))
+        for i in range(10)
+    ]
+
+
+def read_all(store, filters=None, limit=3):
+    pages, after_id = [], 0
+    while True:
+        page, has_more = store.page(filters, after_id, limit)
+        pages.append(page)
+        if not has_more:
+            return pages
+        after_id = decode_cursor(encode_cursor(page[-1]['id']))
+
+
+def test_cursor_round_trip(store, projects):
+    pages = read_all(store)
+    assert [len(page) for page in pages] == [3, 3, 3, 1]
+    assert [p['id'] for page in pages for p in page] == [p['id'] for p in projects]
+
+
+def test_has_more_is_false_on_an_exactly_full_last_page(store, projects):
+    pages = read_all(store, limit=5)
+    assert [len(page) for page in pages] == [5, 5]
+    assert store.page(None, projects[-1]['id'], 5) == ([], False)
+
+
+def test_filters_apply_across_pages(store, projects):
+    riyadh = [p['id'] for page in read_all(store, {'location': 'Riyadh'}, limit=2) for p in page]
+    assert riyadh == [p['id'] for p in projects if p['location'] == 'Riyadh']
+
+    spring = {'start_date_from': '2023-03-01', 'start_date_to': '2023-05-31'}
+    dated = [p['id'] for page in read_all(store, spring, limit=2) for p in page]
+    assert dated == [p['id'] for p in projects if '2023-03-01' <= p['start_date'] <= '2023-05-31']
+
+
+def test_fields_restrict_the_columns(store, projects):
+    page, _ = store.page(fields=['name', 'sales_rate', 'name'], limit=1)
+    assert page == [{"id": projects[0]['id'], "name": "Project 0", "sales_rate": 75.6}]
+
+    with pytest.raises(ValidationError):
+        store.page(fields=['name', 'password'])
+
+
+@pytest.mark.parametrize('cursor', ['', '!!!', 'YWJj', encode_cursor(-1), encode_cursor(MAX_INTEGER + 1),
+                                    base64.urlsafe_b64encode(b'\xff\xfe').decode()])
+def test_invalid_cursors_are_rejected(cursor):
+    with pytest.raises(ValidationError):
+        decode_cursor(cursor)
+
+
+def test_endpoint_pages_with_next_cursor(client, auth_headers):
+    response = client.get('/api/projects?limit=2&fields=name', headers=auth_headers).get_json()
+    seen = [p['id'] for p in response['data']]
+    total = response['total']
+    while response['has_more']:
+        response = client.get(f"/api/projects?limit=2&fields=name&cursor={response['next_cursor']}",
+                              headers=auth_headers).get_json()
+        assert all(set(p) == {'id', 'name'} for p in response['data'])
+        seen.extend(p['id'] for p in response['data'])
+
+    assert response['next_cursor'] is None
+    assert seen == sorted(set(seen))
+    assert len(seen) == total
+
+
+@pytest.mark.parametrize('query', ['cursor=!!!', 'limit=-1', 'fields=secret', 'locaton=Riyadh',
+                                   'start_date_from=2023-13-01', 'page=2'])
+def test_endpoint_rejects_bad_parameters(client, auth_headers, query):
+    response = client.get(f'/api/projects?{query}', headers=auth_headers)
+    assert response.status_code == 400
+    assert response.get_json()['success'] is False
@@ -0,0 +1,107 @@
+import pytest
+from flask import Flask, jsonify
+
+from encoding import MIN_COMPRESS_BYTES
+from response_cache import CachedResponse, ResponseCache
+
+from conftest import make_project
+
+
+@pytest.fixture
+def cache(db_path):
+    return ResponseCache(max_bytes=64 * 1024, db_path=db_path)
+
+
+@pytest.fixture
+def app(cache):
+    """An app whose /items view is cached on the projects dataset, counting its calls"""
+    app = Flask(__name__)
+    app.calls = 0
+
+    @app.route('/items')
+    @cache.cached('projects')
+    def items():
+        app.calls += 1
+        return jsonify({"items": ["x" * 100] * 50})
+
+    @app.route('/small')
+    @cache.cached('projects')
+    def small():
+        return jsonify({"items": []})
+
+    return app
+
+
+def test_unchanged_data_is_revalidated_with_304(app):
+    client = app.test_client()
+    first = client.get('/items')
+    assert first.status_code == 200
+    assert first.headers['Cache-Control'] == 'no-cache'
+
+    again = client.get('/items', headers={'If-None-Match': first.headers['ETag']})
+    assert again.status_code == 304
+    assert again.data == b''
+    assert again.headers['ETag'] == first.headers['ETag']
+    assert again.headers['Vary'] == first.headers['Vary'] == 'Accept-Encoding'
+    assert app.calls == 1
+
+
+def test_304_varies_like_its_200(app):
+    client = app.test_client()
+    small = client.get('/small')
+    assert len(small.data) < MIN_COMPRESS_BYTES
+    assert 'Vary' not in small.headers
+    assert 'Vary' not in client.get('/small', headers={'If-None-Match': small.headers['ETag']}).headers
+
+
+def test_repeat_requests_are_served_from_the_cache(app):
+    client = app.test_client()
+    bodies = [client.get('/items').data for _ in range(3)]
+    assert bodies[0] == bodies[1] == bodies[2]
+    assert app.calls == 1
+
+
+def test_writes_invalidate_cached_responses(app, store):
+    client = app.test_client()
+    first = client.get('/items')
+
+    store.create(make_project())
+
+    changed = client.get('/items', headers={'If-None-Match': first.headers['ETag']})
+    assert changed.status_code == 200
+    assert changed.headers['ETag'] != first.headers['ETag']
+    assert app.calls == 2
+
+
+def test_compressed_variants_are_kept_with_the_entry(app, cache):
+    client = app.test_client()
+    plain = client.get('/items')
+    size = cache.size
+
+    gzipped = client.get('/items', headers={'Accept-Encoding': 'gzip'})
+    assert gzipped.headers['Content-Encoding'] == 'gzip'
+    assert cache.size == size + len(gzipped.data)
+    client.get('/items', headers={'Accept-Encoding': 'gzip'})
+    assert cache.size == size + len(gzipped.data)
+    assert len(plain.data) == size
+
+
+def entry(size):
+    return CachedResponse(b'x' * size, 'application/json', 'etag', None)
+
+
+def test_eviction_keeps_the_cache_within_max_bytes(db_path):
+    cache = ResponseCache(max_bytes=1000, db_path=db_path)
+    for key in 'abc':
+        cache.put(key, entry(400))
+
+    assert list(cache.entries) == ['b', 'c']
+    assert cache.size == 800
+
+    cache.get('b')  # now the most recently used
+    cache.put('d', entry(400))
+    assert list(cache.entries) == ['b', 'd']
+
+    cache.put('huge', entry(1001))
+    assert 'huge' not in cache.entries
+    assert cache.size == 800
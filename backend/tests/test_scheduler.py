@@ -0,0 +1,174 @@
+import sqlite3
+import threading
+from datetime import datetime, timedelta
+
+import pytest
+
+from db import connection
+from scheduler import MISFIRE_CATCH_UP, MISFIRE_RUN_ONCE, MISFIRE_SKIP, JobScheduler
+
+# Scheduled jobs whose work run_full_update repeats
+FULL_UPDATE_STEPS = ('update_project_progress', 'update_sales_data', 'update_analytics_metrics',
+                     'update_competitor_data', 'generate_daily_report')
+
+
+@pytest.fixture
+def scheduler():
+    scheduler = JobScheduler(max_workers=2)
+    yield scheduler
+    scheduler.stop()
+
+
+def blocking_job():
+    """A job function that runs until released, recording every start"""
+    release = threading.Event()
+    starts = []
+
+    def run():
+        starts.append(datetime.now())
+        release.wait(5)
+    return run, release, starts
+
+
+def wait_until_idle(job):
+    for _ in range(500):
+        if not job.running:
+            return
+        threading.Event().wait(0.01)
+    raise AssertionError(f"{job.name} did not finish")
+
+
+def test_job_never_overlaps_itself(scheduler):
+    run, release, starts = blocking_job()
+    job = scheduler.every(timedelta(hours=1), 'slow', run)
+
+    scheduler.run_now('slow')
+    assert scheduler.run_pending() == 1
+    scheduler.run_now('slow')
+    assert scheduler.run_pending() == 0
+    assert job.pending == 1
+
+    release.set()
+    wait_until_idle(job)
+    assert scheduler.run_pending() == 1
+    wait_until_idle(job)
+    assert len(starts) == 2
+
+
+def test_direct_call_under_exclusive_holds_off_scheduled_run(scheduler):
+    run, release, starts = blocking_job()
+    job = scheduler.every(timedelta(hours=1), 'progress', run)
+    release.set()
+
+    with scheduler.exclusive('progress'):
+        scheduler.run_now('progress')
+        assert scheduler.run_pending() == 0
+        assert job.pending == 1
+
+    assert scheduler.run_pending() == 1
+    wait_until_idle(job)
+    assert len(starts) == 1
+
+
+def test_exclusive_rejects_unknown_job(scheduler):
+    with pytest.raises(ValueError):
+        scheduler.exclusive('missing')
+
+
+@pytest.mark.parametrize('misfire, expected_pending', [
+    (MISFIRE_SKIP, 0),
+    (MISFIRE_RUN_ONCE, 1),
+    (MISFIRE_CATCH_UP, 5),
+])
+def test_misfire_policies(scheduler, misfire, expected_pending):
+    job = scheduler.every(timedelta(hours=1), 'hourly', lambda: None, misfire=misfire)
+    job.running = True  # keep the due runs queued so they can be counted
+    now = job.next_run + timedelta(hours=4, minutes=30)
+
+    scheduler.run_pending(now)
+
+    assert job.pending == expected_pending
+    assert job.next_run > now
+
+
+def test_on_time_run_is_not_skipped(scheduler):
+    job = scheduler.every(timedelta(hours=1), 'hourly', lambda: None)
+    assert scheduler.run_pending(job.next_run + timedelta(seconds=30)) == 1
+    wait_until_idle(job)
+
+
+def test_daily_job_runs_at_its_time(scheduler):
+    job = scheduler.daily('03:00', 'nightly', lambda: None)
+    assert job.next_run.time().strftime('%H:%M') == '03:00'
+    assert job.slot_after(job.next_run) == job.next_run + timedelta(days=1)
+
+
+def test_timeout_is_reported(scheduler):
+    run, release, _ = blocking_job()
+    job = scheduler.every(timedelta(hours=1), 'slow', run, timeout=0)
+    scheduler.run_now('slow')
+    scheduler.run_pending()
+
+    scheduler.run_pending()
+    assert job.timed_out
+
+    release.set()
+    wait_until_idle(job)
+
+
+def test_timeout_interrupts_the_jobs_sql(scheduler, db_path):
+    errors = []
+
+    def endless_query():
+        with connection(db_path) as conn:
+            try:
+                conn.execute("""
+                    WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n)
+                    SELECT count(*) FROM n
+                """).fetchone()
+            except sqlite3.OperationalError as e:
+                errors.append(e)
+
+    job = scheduler.every(timedelta(hours=1), 'endless', endless_query, timeout=0.2)
+    scheduler.run_now('endless')
+    scheduler.run_pending()
+    wait_until_idle(job)
+
+    assert len(errors) == 1
+    assert scheduler.run_pending() == 0
+    scheduler.run_now('endless')
+    assert scheduler.run_pending() == 1
+    wait_until_idle(job)
+
+    # The deadline does not outlive the run on the pooled connection
+    with connection(db_path) as conn:
+        assert conn.execute("SELECT count(*) FROM projects").fetchone()[0] == 0
+
+
+def test_seconds_until_next(scheduler):
+    assert scheduler.seconds_until_next() == float('inf')
+    job = scheduler.every(timedelta(hours=1), 'hourly', lambda: None)
+    assert scheduler.seconds_until_next(job.next_run - timedelta(minutes=5)) == 300
+    scheduler.run_now('hourly')
+    assert scheduler.seconds_until_next() == 1
+
+
+def test_full_update_holds_each_job_lock(processor, scheduler):
+    for name in FULL_UPDATE_STEPS:
+        scheduler.every(timedelta(hours=1), name, getattr(processor, name))
+    processor.scheduler = scheduler
+
+    held = {}
+
+    def record(name):
+        def step(*args, **kwargs):
+            held[name] = scheduler.exclusive(name).locked()
+            return 0
+        return step
+
+    for name in FULL_UPDATE_STEPS:
+        setattr(processor, name, record(name))
+
+    processor.run_full_update()
+
+    assert held == {name: True for name in FULL_UPDATE_STEPS}
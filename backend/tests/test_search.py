@@ -0,0 +1,57 @@
+import pytest
+
+from db import connection
+from project_store import ValidationError
+import search
+
+from conftest import make_project
+
+
+def search_projects(db_path, text, **options):
+    with connection(db_path) as conn:
+        return search.search(conn, text, ['projects'], **options)['projects']
+
+
+def test_match_expression_prefixes_the_last_and_starred_terms():
+    assert search.match_expression('riyadh tow') == '"riyadh" "tow"*'
+    assert search.match_expression('bus* district') == '"bus"* "district"*'
+    with pytest.raises(ValidationError):
+        search.match_expression('  ---  ')
+
+
+def test_index_follows_inserts_updates_and_deletes(store, db_path):
+    project = store.create(make_project(name="Riyadh Business District"))
+    store.create(make_project(name="Jeddah Waterfront", location="Jeddah"))
+
+    assert [hit['id'] for hit in search_projects(db_path, 'busi')] == [project['id']]
+
+    store.update(project['id'], {"name": "Riyadh Tower"})
+    assert search_projects(db_path, 'business') == []
+    assert [hit['id'] for hit in search_projects(db_path, 'tower')] == [project['id']]
+
+    store.delete(project['id'])
+    assert search_projects(db_path, 'tower') == []
+
+
+def test_hits_are_ranked_and_highlighted(store, db_path):
+    store.create(make_project(name="Garden Villas", manager="Khalid <b>Al-Otaibi</b>"))
+    hits = search_projects(db_path, 'khalid')
+    assert hits[0]['score'] is not None
+    assert '<mark>Khalid</mark>' in hits[0]['snippet']
+    assert '<b>' not in hits[0]['snippet']
+
+
+def test_broad_queries_fall_back_to_newest_first(store, db_path, monkeypatch):
+    monkeypatch.setattr(search, 'RANK_CANDIDATES', 2)
+    ids = [store.create(make_project(name=f"Tower {i}"))['id'] for i in range(5)]
+    hits = search_projects(db_path, 'tower', limit=3)
+    assert [hit['id'] for hit in hits] == ids[::-1][:3]
+    assert all(hit['score'] is None for hit in hits)
+
+
+def test_search_rejects_unknown_kinds_and_limits(db_path):
+    with connection(db_path) as conn:
+        with pytest.raises(ValidationError):
+            search.search(conn, 'x', ['managers'])
+        with pytest.raises(ValidationError):
+            search.search(conn, 'x', limit=search.MAX_LIMIT + 1)
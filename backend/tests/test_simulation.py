@@ -0,0 +1,76 @@
+import numpy as np
+import pandas as pd
+
+from db import connection
+from simulation import MIN_SELLING_PROGRESS, simulate_sales
+
+from conftest import make_project
+
+UNITS = np.array([1000, 500, 200, 50, 10, 1])
+UNITS_SOLD = np.array([100, 0, 150, 49, 10, 0])
+PROGRESS = np.array([90.0, 60.0, 100.0, 100.0, 100.0, 80.0])
+TYPES = np.array(['Residential', 'Commercial', 'Industrial', 'Residential', 'Mixed Use', 'Commercial'])
+
+
+def simulate(seed, units=UNITS, units_sold=UNITS_SOLD, progress=PROGRESS, types=TYPES):
+    return simulate_sales(units, units_sold, progress, types, np.random.default_rng(seed))
+
+
+def test_same_seed_gives_same_sales():
+    assert simulate(7).tolist() == simulate(7).tolist()
+
+
+def test_different_seeds_give_different_sales():
+    units = np.full(200, 1000)
+    args = (units, np.zeros(200), np.full(200, 100.0), np.full(200, 'Residential'))
+    assert simulate(1, *args).tolist() != simulate(2, *args).tolist()
+
+
+def test_sales_never_exceed_the_units_left():
+    rng = np.random.default_rng(0)
+    units = rng.integers(0, 50, 5000)
+    units_sold = rng.integers(0, 50, 5000) % (units + 1)
+    progress = rng.uniform(0, 100, 5000)
+    types = rng.choice(['Residential', 'Commercial', 'Industrial'], 5000)
+
+    for seed in range(5):
+        new_sales = simulate(seed, units, units_sold, progress, types)
+        assert (new_sales >= 0).all()
+        assert (units_sold + new_sales <= units).all()
+
+
+def test_projects_below_selling_progress_sell_nothing():
+    progress = np.array([0.0, MIN_SELLING_PROGRESS, np.nan, 100.0])
+    new_sales = simulate(3, np.full(4, 100), np.zeros(4), progress, np.full(4, 'Residential'))
+    assert new_sales[:3].tolist() == [0, 0, 0]
+
+
+def project_rows(db_path):
+    with connection(db_path) as conn:
+        return pd.read_sql_query("SELECT id, units, units_sold, progress, type FROM projects ORDER BY id", conn)
+
+
+def test_update_sales_data_writes_the_simulated_sales(store, processor, db_path):
+    for i, (units, sold, progress, project_type) in enumerate(zip(UNITS, UNITS_SOLD, PROGRESS, TYPES)):
+        store.create(make_project(name=f"Project {i}", units=int(units), units_sold=int(sold),
+                                  progress=progress, type=project_type))
+    before = project_rows(db_path)
+    expected = simulate_sales(before['units'], before['units_sold'], before['progress'], before['type'],
+                              np.random.default_rng(1))
+
+    processor.update_sales_data(full=True)
+
+    after = project_rows(db_path)
+    assert (after['units_sold'] - before['units_sold']).tolist() == expected.tolist()
+
+
+def test_update_sales_data_leaves_planning_projects_alone(store, processor, db_path):
+    planning = store.create(make_project(status="Planning", progress=90, units_sold=0))
+    active = store.create(make_project(name="Active", progress=90, units_sold=0, units=100000))
+
+    processor.update_sales_data(full=True)
+
+    assert store.get(planning['id']) == planning
+    updated = store.get(active['id'])
+    assert updated['units_sold'] > 0
+    assert updated['version'] == active['version'] + 1
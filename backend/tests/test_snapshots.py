@@ -0,0 +1,101 @@
+import os
+
+import pyarrow as pa
+import pytest
+
+from db import connection
+from snapshots import SnapshotNotFound, compare_projects, load_table, read_index, write_snapshot
+
+from conftest import make_project
+
+
+@pytest.fixture
+def snapshot_dir(tmp_path):
+    return str(tmp_path / 'snapshots')
+
+
+def snapshot(db_path, date, snapshot_dir):
+    with connection(db_path) as conn:
+        return write_snapshot(conn, date, snapshot_dir)
+
+
+@pytest.fixture
+def two_snapshots(store, db_path, snapshot_dir):
+    """Snapshots a day apart: one project removed, one added, three changed"""
+    projects = [store.create(make_project(name=f"Project {i}", units=100 + i, units_sold=10 * i, progress=i))
+                for i in range(6)]
+    snapshot(db_path, '2025-01-01', snapshot_dir)
+
+    store.delete(projects[0]['id'])
+    store.create(make_project(name="Added", units=50, units_sold=0))
+    store.update(projects[1]['id'], {"units_sold": 90})
+    store.update(projects[2]['id'], {"units_sold": 0, "progress": 50})
+    store.update(projects[3]['id'], {"progress": 51})
+    store.update(projects[4]['id'], {"manager": "Someone Else"})  # not a compared column
+    snapshot(db_path, '2025-01-02', snapshot_dir)
+    return projects
+
+
+def test_write_snapshot_records_every_table_in_the_index(store, db_path, snapshot_dir):
+    store.create(make_project())
+    entry = snapshot(db_path, '2025-01-01', snapshot_dir)
+
+    assert read_index(snapshot_dir) == {'2025-01-01': entry}
+    assert set(entry['tables']) == {'projects', 'competitors', 'analytics'}
+    assert entry['tables']['projects']['rows'] == 1
+    for info in entry['tables'].values():
+        path = os.path.join(snapshot_dir, info['file'])
+        assert os.path.getsize(path) == info['bytes']
+
+    snapshot(db_path, '2025-01-02', snapshot_dir)
+    assert list(read_index(snapshot_dir)) == ['2025-01-01', '2025-01-02']
+
+
+def test_load_table_reads_only_the_selected_columns(store, db_path, snapshot_dir):
+    project = store.create(make_project())
+    snapshot(db_path, '2025-01-01', snapshot_dir)
+
+    table = load_table('2025-01-01', 'projects', ['id', 'budget', 'start_date'], snapshot_dir)
+    assert table.column_names == ['id', 'budget', 'start_date']
+    assert table.schema.field('id').type == pa.int64()
+    assert table.schema.field('budget').type == pa.float64()
+    assert table.to_pylist() == [{"id": project['id'], "budget": project['budget'], "start_date": "2023-01-15"}]
+
+    assert 'manager' in load_table('2025-01-01', 'projects', snapshot_dir=snapshot_dir).column_names
+
+
+def test_missing_snapshots_raise(snapshot_dir, store, db_path):
+    with pytest.raises(SnapshotNotFound):
+        load_table('2025-01-01', 'projects', snapshot_dir=snapshot_dir)
+    snapshot(db_path, '2025-01-01', snapshot_dir)
+    with pytest.raises(SnapshotNotFound):
+        load_table('2025-01-01', 'reports', snapshot_dir=snapshot_dir)
+
+
+def test_compare_projects(two_snapshots, snapshot_dir):
+    projects = two_snapshots
+    comparison = compare_projects('2025-01-01', '2025-01-02', snapshot_dir=snapshot_dir)
+
+    assert (comparison['added'], comparison['removed'], comparison['changed']) == (1, 1, 3)
+    assert comparison['columns']['units_sold'] == {
+        "total_from": float(sum(10 * i for i in range(6))),
+        "total_to": float(90 + 0 + 30 + 40 + 50 + 0),
+        "top_changes": [{"id": projects[1]['id'], "delta": 80.0}, {"id": projects[2]['id'], "delta": -20.0}]
+    }
+    # Equal changes are listed by id
+    assert comparison['columns']['progress']['top_changes'] == [
+        {"id": projects[2]['id'], "delta": 48.0}, {"id": projects[3]['id'], "delta": 48.0}
+    ]
+    assert comparison['columns']['budget']['top_changes'] == []
+
+
+def test_compare_projects_limits_columns_and_changes(two_snapshots, snapshot_dir):
+    comparison = compare_projects('2025-01-01', '2025-01-02', ['units_sold'], snapshot_dir, top=1)
+    assert list(comparison['columns']) == ['units_sold']
+    assert len(comparison['columns']['units_sold']['top_changes']) == 1
+    assert comparison['changed'] == 2
+
+    with pytest.raises(ValueError):
+        compare_projects('2025-01-01', '2025-01-02', ['name'], snapshot_dir)
+    with pytest.raises(SnapshotNotFound):
+        compare_projects('2025-01-01', '2024-12-31', snapshot_dir=snapshot_dir)
@@ -0,0 +1,77 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from db import connection
+from project_store import ValidationError
+from timeseries import AGGREGATES, query, record_sample
+
+# Unaligned, so queries starting here are answered from the raw samples
+BEFORE_FIRST_SAMPLE = '2022-12-31T23:59:59'
+
+
+@pytest.fixture
+def conn(db_path):
+    with connection(db_path) as conn:
+        start = datetime(2023, 1, 1, 6)
+        with conn:
+            for i in range(800):
+                record_sample(conn, 'revenue', (i * 37) % 101 - 20, start + timedelta(hours=23 * i))
+        yield conn
+
+
+def assert_same_points(rollup, raw):
+    assert [point['period'] for point in rollup] == [point['period'] for point in raw]
+    for a, b in zip(rollup, raw):
+        assert a['samples'] == b['samples']
+        assert a['value'] == pytest.approx(b['value'])
+
+
+@pytest.mark.parametrize('agg', list(AGGREGATES))
+@pytest.mark.parametrize('step, source', [
+    ('year', 'metric_rollups_yearly'),
+    ('quarter', 'metric_rollups_monthly'),
+    ('month', 'metric_rollups_monthly'),
+    ('week', 'metric_rollups_daily'),
+    ('day', 'metric_rollups_daily'),
+])
+def test_rollups_match_raw_samples(conn, step, source, agg):
+    rollup = query(conn, 'revenue', step=step, agg=agg)
+    raw = query(conn, 'revenue', start=BEFORE_FIRST_SAMPLE, step=step, agg=agg)
+
+    assert rollup['source'] == source
+    assert raw['source'] == 'metric_samples'
+    assert_same_points(rollup['points'], raw['points'])
+
+
+def test_rollups_follow_replaced_and_deleted_samples(conn):
+    with conn:
+        record_sample(conn, 'revenue', 1000, datetime(2023, 1, 1, 6))
+        conn.execute("DELETE FROM metric_samples WHERE recorded_at LIKE '2023-02-%'")
+
+    for agg in ('sum', 'max', 'count', 'last'):
+        rollup = query(conn, 'revenue', step='month', agg=agg)
+        raw = query(conn, 'revenue', start=BEFORE_FIRST_SAMPLE, step='month', agg=agg)
+        assert_same_points(rollup['points'], raw['points'])
+    assert '2023-02' not in [point['period'] for point in rollup['points']]
+
+
+def test_aligned_range_uses_coarsest_rollup(conn):
+    assert query(conn, 'revenue', '2023-01-01', '2024-01-01', step='month')['source'] == 'metric_rollups_monthly'
+    assert query(conn, 'revenue', '2023-01-15', '2024-01-01', step='month')['source'] == 'metric_rollups_daily'
+    assert query(conn, 'revenue', '2023-01-15T12:00', step='month')['source'] == 'metric_samples'
+
+
+def test_step_is_chosen_from_max_points(conn):
+    assert query(conn, 'revenue', max_points=1000)['step'] == 'day'
+    assert query(conn, 'revenue', max_points=30)['step'] == 'month'
+    assert len(query(conn, 'revenue', max_points=30)['points']) <= 30
+
+
+def test_query_rejects_bad_arguments(conn):
+    with pytest.raises(ValidationError):
+        query(conn, 'revenue', agg='median')
+    with pytest.raises(ValidationError):
+        query(conn, 'revenue', step='hour')
+    with pytest.raises(ValidationError):
+        query(conn, 'revenue', '2024-01-01', '2023-01-01')
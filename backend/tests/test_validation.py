@@ -0,0 +1,54 @@
+import pytest
+
+from project_store import MAX_INTEGER, ValidationError, validate_project
+
+from conftest import make_project
+
+
+def test_values_are_coerced_to_column_types():
+    values = validate_project(make_project(budget="1000", units="10", units_sold=5, start_date="2024-3-1"))
+    assert values['budget'] == 1000.0
+    assert values['units'] == 10
+    assert values['start_date'] == "2024-03-01"
+
+
+@pytest.mark.parametrize('overrides', [
+    {"units": MAX_INTEGER + 1},
+    {"units": 1e20},
+    {"progress": float('inf')},
+    {"budget": 1e400},
+    {"budget": "nan"},
+    {"start_date": "not a date"},
+    {"end_date": "2024-02-30"},
+    {"units": 10, "units_sold": 11},
+    {"latitude": 91},
+    {"longitude": -181},
+    {"units": "ten"},
+])
+def test_unstorable_values_are_rejected(overrides):
+    with pytest.raises(ValidationError):
+        validate_project(make_project(**overrides))
+
+
+def test_missing_required_fields_are_listed():
+    with pytest.raises(ValidationError, match='budget, units'):
+        validate_project({"name": "x", "type": "t", "status": "s", "location": "l"})
+
+
+def test_partial_payload_only_checks_given_fields():
+    assert validate_project({"progress": 50}, partial=True) == {"progress": 50}
+    with pytest.raises(ValidationError):
+        validate_project({"name": None}, partial=True)
+    with pytest.raises(ValidationError):
+        validate_project({"unknown": 1}, partial=True)
+
+
+@pytest.mark.parametrize('payload', [
+    '{"name": "x", "type": "t", "status": "s", "location": "l", "budget": 1e400, "units": 1}',
+    '{"name": "x", "type": "t", "status": "s", "location": "l", "budget": 1, "units": 100000000000000000000}',
+    '{"name": "x", "type": "t", "status": "s", "location": "l", "budget": 1, "units": 1, "start_date": "soon"}',
+])
+def test_create_endpoint_rejects_unstorable_values(client, auth_headers, payload):
+    response = client.post('/api/projects', data=payload,
+                           headers={**auth_headers, 'Content-Type': 'application/json'})
+    assert response.status_code == 400
@@ -0,0 +1,93 @@
+import pytest
+
+from project_store import MAX_INTEGER, ValidationError, VersionConflict, parse_project_id
+
+from conftest import make_project
+
+
+def test_guarded_update_applies_only_to_the_expected_version(store):
+    project = store.create(make_project())
+    updated = store.update(project['id'], {"progress": 80}, expected_version=1)
+    assert updated['version'] == 2
+
+    with pytest.raises(VersionConflict) as conflict:
+        store.update(project['id'], {"progress": 90}, expected_version=1)
+    assert conflict.value.current['version'] == 2
+    assert store.get(project['id'])['progress'] == 80
+
+
+def test_guarded_delete_keeps_a_changed_project(store):
+    project = store.create(make_project())
+    store.update(project['id'], {"progress": 80})
+
+    with pytest.raises(VersionConflict):
+        store.delete(project['id'], expected_version=1)
+    assert store.delete(project['id'], expected_version=2) is True
+    assert store.delete(project['id'], expected_version=2) is False
+
+
+def test_update_many_writes_nothing_on_conflict(store):
+    first = store.create(make_project())
+    second = store.create(make_project(name="Second"))
+    store.update(second['id'], {"progress": 10})
+
+    with pytest.raises(VersionConflict) as conflict:
+        store.update_many([
+            {"id": first['id'], "version": 1, "progress": 50},
+            {"id": second['id'], "version": 1, "progress": 60},
+            {"id": 999, "progress": 70},
+        ])
+    assert conflict.value.current == [
+        {"id": second['id'], "expected_version": 1, "current_version": 2},
+        {"id": 999, "expected_version": None, "current_version": None},
+    ]
+    assert store.get(first['id'])['version'] == 1
+
+    updated = store.update_many([{"id": first['id'], "version": 1, "progress": 50}])
+    assert updated == [{"id": first['id'], "version": 2}]
+
+
+@pytest.mark.parametrize('value', [0, -1, 'abc', None, MAX_INTEGER + 1, 10 ** 30, float('inf')])
+def test_parse_project_id_rejects_out_of_range_values(value):
+    with pytest.raises(ValidationError):
+        parse_project_id(value)
+
+
+def test_parse_project_id_accepts_the_largest_rowid():
+    assert parse_project_id(str(MAX_INTEGER)) == MAX_INTEGER
+
+
+@pytest.fixture
+def project(client, auth_headers):
+    response = client.post('/api/projects', json=make_project(), headers=auth_headers)
+    return response.get_json()['data']
+
+
+def test_if_match_guards_updates(client, auth_headers, project):
+    url = f"/api/projects/{project['id']}"
+    etag = client.get(url, headers=auth_headers).headers['ETag']
+
+    response = client.put(url, json={"progress": 1}, headers={**auth_headers, 'If-Match': etag})
+    assert response.status_code == 200
+
+    response = client.put(url, json={"progress": 2}, headers={**auth_headers, 'If-Match': etag})
+    assert response.status_code == 409
+    assert response.get_json()['data']['version'] == project['version'] + 1
+
+
+@pytest.mark.parametrize('if_match', ['"{id}-99999999999999999999999"', '"{id}-x"', '"{id}-0"'])
+def test_invalid_if_match_version_is_rejected(client, auth_headers, project, if_match):
+    response = client.put(f"/api/projects/{project['id']}", json={"progress": 1},
+                          headers={**auth_headers, 'If-Match': if_match.format(id=project['id'])})
+    assert response.status_code == 400
+
+
+def test_oversized_version_in_payload_is_rejected(client, auth_headers, project):
+    body = '{"progress": 1, "version": 99999999999999999999999}'
+    response = client.put(f"/api/projects/{project['id']}", data=body,
+                          headers={**auth_headers, 'Content-Type': 'application/json'})
+    assert response.status_code == 400
+
+
+def test_oversized_project_id_in_path_is_not_found(client, auth_headers):
+    assert client.get('/api/projects/99999999999999999999999', headers=auth_headers).status_code == 404
@@ -0,0 +1,207 @@
+"""
+Time-series store for Al Fozan Insights Platform
+Metric samples live in metric_samples, clustered on (metric_type,
+recorded_at), and triggers keep daily, monthly and yearly rollups of them.
+A range query is answered from the coarsest table whose buckets line up
+with both the requested step and the range bounds, so a five-year monthly
+chart reads sixty rollup rows instead of every sample.
+"""
+
+from datetime import datetime
+
+from downsample import METHODS, downsample
+from project_store import ValidationError
+
+TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+# Tables from coarsest to finest: (name, timestamp column, bucket length).
+# Raw samples are the last resort.
+YEARLY = ('metric_rollups_yearly', 'bucket', 4)
+MONTHLY = ('metric_rollups_monthly', 'bucket', 7)
+DAILY = ('metric_rollups_daily', 'bucket', 10)
+RAW = ('metric_samples', 'recorded_at', None)
+
+# step -> (SQL grouping a timestamp column into the step, tables fine enough for it)
+STEPS = {
+    'year': ("substr({col}, 1, 4)", (YEARLY, MONTHLY, DAILY, RAW)),
+    'quarter': ("substr({col}, 1, 4) || '-Q' || ((CAST(substr({col}, 6, 2) AS INTEGER) + 2) / 3)",
+                (MONTHLY, DAILY, RAW)),
+    'month': ("substr({col}, 1, 7)", (MONTHLY, DAILY, RAW)),
+    'week': ("date(substr({col}, 1, 10), 'weekday 0', '-6 days')", (DAILY, RAW)),
+    'day': ("substr({col}, 1, 10)", (DAILY, RAW)),
+    'raw': ("{col}", (RAW,)),
+}
+
+# Approximate step lengths in days, used to pick a step for max_points
+STEP_DAYS = {'day': 1, 'week': 7, 'month': 30.44, 'quarter': 91.31, 'year': 365.25}
+
+# agg -> (expression over raw samples, expression over a rollup)
+AGGREGATES = {
+    'avg': ('AVG(value)', 'SUM(total) / SUM(sample_count)'),
+    'sum': ('SUM(value)', 'SUM(total)'),
+    'min': ('MIN(value)', 'MIN(minimum)'),
+    'max': ('MAX(value)', 'MAX(maximum)'),
+    'count': ('COUNT(*)', 'SUM(sample_count)'),
+    # A lone max() makes SQLite take the bare column from the latest row
+    'last': ('value, MAX(recorded_at)', 'last_value, MAX(last_at)'),
+}
+
+DEFAULT_MAX_POINTS = 500
+
+
+def parse_timestamp(value, name):
+    """Normalise an ISO date or datetime to the stored timestamp format"""
+    try:
+        return datetime.fromisoformat(value).strftime(TIMESTAMP_FORMAT)
+    except (TypeError, ValueError):
+        raise ValidationError(f"Invalid timestamp for '{name}': {value!r}")
+
+
+def record_sample(conn, metric_type, value, recorded_at=None):
+    """Store one sample, replacing any sample of the metric at the same time"""
+    recorded_at = (recorded_at or datetime.now()).strftime(TIMESTAMP_FORMAT)
+    conn.execute("""
+        INSERT INTO metric_samples (metric_type, recorded_at, value) VALUES (?, ?, ?)
+        ON CONFLICT(metric_type, recorded_at) DO UPDATE SET value = excluded.value
+    """, (metric_type, recorded_at, float(value)))
+
+
+def is_aligned(timestamp, length):
+    """Whether `timestamp` falls on the start of a bucket `length` characters long"""
+    if timestamp is None:
+        return True
+    return timestamp[length:] == '0000-01-01 00:00:00'[length:]
+
+
+def choose_table(step, start, end):
+    """Return the coarsest table that can answer `step` over [start, end)"""
+    for table in STEPS[step][1]:
+        length = table[2]
+        if length is None or (is_aligned(start, length) and is_aligned(end, length)):
+            return table
+
+
+def choose_step(conn, metric_type, start, end, max_points):
+    """Return the finest step that keeps the series within `max_points` points"""
+    if start is None or end is None:
+        row = conn.execute(
+            'SELECT MIN(recorded_at), MAX(recorded_at) FROM metric_samples WHERE metric_type = ?',
+            (metric_type,)
+        ).fetchone()
+        if row[0] is None:
+            return 'day'
+        start = start or row[0]
+        end = end or row[1]
+
+    days = (datetime.strptime(end, TIMESTAMP_FORMAT) - datetime.strptime(start, TIMESTAMP_FORMAT)).total_seconds() / 86400
+    for step, step_days in STEP_DAYS.items():
+        if days / step_days <= max_points:
+            return step
+    return 'year'
+
+
+def query(conn, metric_type, start=None, end=None, step=None, agg='avg', max_points=DEFAULT_MAX_POINTS):
+    """Read `metric_type` over [start, end) aggregated per `step`
+
+    `start` and `end` are ISO dates or datetimes and either may be omitted.
+    Without a step the finest one giving at most `max_points` points is
+    used. Returns a dict describing the series and the table it came from.
+    """
+    if agg not in AGGREGATES:
+        raise ValidationError(f"Unknown aggregate: {agg}; expected one of {', '.join(AGGREGATES)}")
+    if step is not None and step not in STEPS:
+        raise ValidationError(f"Unknown step: {step}; expected one of {', '.join(STEPS)}")
+
+    start = parse_timestamp(start, 'start') if start else None
+    end = parse_timestamp(end, 'end') if end else None
+    if start and end and start >= end:
+        raise ValidationError("'start' must be before 'end'")
+
+    step = step or choose_step(conn, metric_type, start, end, max_points)
+    table, column, length = choose_table(step, start, end)
+
+    conditions = ['metric_type = ?']
+    params = [metric_type]
+    # Aligned bounds are compared as bucket prefixes so the range stays a
+    # primary key range scan on the rollup
+    if start:
+        conditions.append(f'{column} >= ?')
+        params.append(start[:length] if length else start)
+    if end:
+        conditions.append(f'{column} < ?')
+        params.append(end[:length] if length else end)
+
+    group = STEPS[step][0].format(col=column)
+    value = AGGREGATES[agg][0 if length is None else 1]
+    samples = 'COUNT(*)' if length is None else 'SUM(sample_count)'
+    rows = conn.execute(f"""
+        SELECT {group} AS period, {samples}, {value}
+        FROM {table}
+        WHERE {' AND '.join(conditions)}
+        GROUP BY period
+        ORDER BY period
+    """, params).fetchall()
+
+    return {
+        "metric": metric_type,
+        "step": step,
+        "agg": agg,
+        "start": start,
+        "end": end,
+        "source": table,
+        "points": [{"period": row[0], "value": row[2], "samples": row[1]} for row in rows]
+    }
+
+
+def add_months(month, count):
+    """Shift a 'YYYY-MM' string by `count` months"""
+    index = int(month[:4]) * 12 + int(month[5:7]) - 1 + count
+    return f"{index // 12:04d}-{index % 12 + 1:02d}"
+
+
+def monthly_trends(conn, months=12, points=None, method='lttb'):
+    """Return the last `months` months of revenue, units sold and new projects
+
+    Revenue and units sold are the last reading of each month, taken from
+    the monthly rollups; new projects are counted by start date through its
+    index. The window ends at the latest month with recorded revenue. With
+    `points` the series is reduced to about that many months, chosen by
+    `method` on the revenue line, so long histories render at a fixed cost.
+    """
+    if method not in METHODS:
+        raise ValidationError(f"Unknown downsampling method: {method}; expected one of {', '.join(METHODS)}")
+
+    row = conn.execute(
+        "SELECT MAX(bucket) FROM metric_rollups_monthly WHERE metric_type = 'revenue'"
+    ).fetchone()
+    if row[0] is None:
+        return []
+    end = add_months(row[0], 1)
+    start = add_months(end, -months)
+
+    def series(metric_type):
+        return dict(conn.execute("""
+            SELECT bucket, last_value FROM metric_rollups_monthly
+            WHERE metric_type = ? AND bucket >= ? AND bucket < ?
+        """, (metric_type, start, end)).fetchall())
+
+    revenue = series('revenue')
+    units_sold = series('units_sold')
+    new_projects = dict(conn.execute("""
+        SELECT substr(start_date, 1, 7) AS month, COUNT(*) FROM projects
+        WHERE start_date >= ? AND start_date < ?
+        GROUP BY month
+    """, (start + '-01', end + '-01')).fetchall())
+
+    buckets = [add_months(start, i) for i in range(months)]
+    trends = [{
+        "month": datetime.strptime(bucket, '%Y-%m').strftime('%b %Y'),
+        "revenue": round((revenue.get(bucket) or 0) / 1e6, 1),
+        "units_sold": int(units_sold.get(bucket) or 0),
+        "new_projects": new_projects.get(bucket, 0)
+    } for bucket in buckets]
+
+    if points and points < len(trends):
+        keep = downsample(range(len(trends)), [t['revenue'] for t in trends], points, method)
+        trends = [trends[i] for i in keep]
+    return trends
@@ -75,11 +75,19 @@ export function ProjectCRUD() {
 
   const fetchProjects = async () => {
     try {
-      const response = await fetch("https://real-estate-insights-platform-1.onrender.com/api/projects")
-      const data = await response.json()
-      if (data.success) {
-        setProjects(data.data)
-      }
+      // The API returns projects a page at a time; follow next_cursor to the end
+      const allProjects: Project[] = []
+      let cursor: string | null = null
+      do {
+        const params = new URLSearchParams({ limit: "1000" })
+        if (cursor) params.set("cursor", cursor)
+        const response = await fetch(`https://real-estate-insights-platform-1.onrender.com/api/projects?${params}`)
+        const data = await response.json()
+        if (!data.success) return
+        allProjects.push(...data.data)
+        cursor = data.has_more ? data.next_cursor : null
+      } while (cursor)
+      setProjects(allProjects)
     } catch (error) {
       console.error("Error fetching projects:", error)
       toast({
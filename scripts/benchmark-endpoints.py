@@ -0,0 +1,346 @@
+"""
+Endpoint latency benchmark for the Al Fozan Insights backend
+
+For each dataset size this seeds a database with seed-database.py --scale,
+serves backend/simple_app.py against it the way render.yaml runs it in
+production (gunicorn with threaded workers) and drives every route at each
+concurrency level. Repeated GETs are answered from the response cache, so
+--response-cache off also measures each route with the cache disabled.
+Results (p50/p95/p99 latency, throughput, server RSS) are written as JSON
+and compared with a stored baseline; the script exits with status 1 when a
+route's p95 regresses past the allowed tolerance, or when any request
+failed, since a fast error is not a faster route.
+
+    python scripts/benchmark-endpoints.py --sizes 1000,100000 --concurrency 1,16
+    python scripts/benchmark-endpoints.py --server flask   # dev server, no gunicorn needed
+    python scripts/benchmark-endpoints.py --response-cache on,off --update-baseline
+"""
+
+import argparse
+import json
+import os
+import platform
+import secrets
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from itertools import count
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SEED_SCRIPT = os.path.join(ROOT, 'scripts', 'seed-database.py')
+APP_SCRIPT = os.path.join(ROOT, 'backend', 'simple_app.py')
+DEFAULT_BASELINE = os.path.join(ROOT, 'scripts', 'benchmark-baseline.json')
+
+NEW_PROJECT = {
+    "name": "Benchmark Tower",
+    "type": "Residential",
+    "status": "Planning",
+    "location": "Riyadh",
+    "budget": 1500000000,
+    "progress": 0,
+    "units": 200,
+    "units_sold": 0,
+    "start_date": "2025-01-01",
+    "end_date": "2027-12-31",
+    "manager": "Benchmark"
+}
+
+
+# Production start command from render.yaml, bound to the benchmark port
+GUNICORN_ARGS = ['-m', 'gunicorn', 'backend.simple_app:app', '--worker-class', 'gthread',
+                 '--workers', '2', '--threads', '32', '--pythonpath', ROOT]
+
+SERVERS = ('gunicorn', 'flask')
+
+# Server environment for each --response-cache mode; a cache of 0 bytes
+# stores nothing, so every request runs the route
+CACHE_MODES = {
+    'on': {},
+    'off': {'RESPONSE_CACHE_MAX_BYTES': '0'},
+}
+
+
+class Server:
+    """A backend process serving one benchmark database"""
+
+    def __init__(self, db_path, port, username, password, kind='gunicorn', env=None):
+        self.db_path = db_path
+        self.base_url = f"http://127.0.0.1:{port}"
+        self.token = None
+        env = dict(os.environ, **(env or {}), DATABASE_PATH=db_path, PORT=str(port))
+        # Every worker must share the signing key
+        env.setdefault('JWT_SECRET_KEY', secrets.token_hex(32))
+        if kind == 'gunicorn':
+            command = [sys.executable, *GUNICORN_ARGS, '--bind', f'127.0.0.1:{port}']
+        else:
+            command = [sys.executable, APP_SCRIPT]
+        self.process = subprocess.Popen(
+            command,
+            cwd=os.path.dirname(db_path),
+            env=env,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL
+        )
+        self.wait_until_ready()
+        self.login(username, password)
+
+    def wait_until_ready(self, timeout=120):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError("Backend exited during start-up")
+            try:
+                request(self.base_url, 'POST', '/api/auth/login', {})
+                return
+            except (urllib.error.URLError, ConnectionError):
+                time.sleep(0.2)
+        raise RuntimeError("Backend did not start in time")
+
+    def login(self, username, password):
+        data = json.dumps({"username": username, "password": password}).encode()
+        req = urllib.request.Request(self.base_url + '/api/auth/login', data=data, method='POST')
+        req.add_header('Content-Type', 'application/json')
+        with urllib.request.urlopen(req, timeout=30) as response:
+            self.token = json.load(response)['token']
+
+    def rss_mb(self):
+        """Resident set size of the server and its workers, or None where /proc is unavailable"""
+        pid = self.process.pid
+        try:
+            with open(f"/proc/{pid}/task/{pid}/children") as f:
+                pids = [pid, *map(int, f.read().split())]
+            total_kb = 0
+            for process_id in pids:
+                with open(f"/proc/{process_id}/status") as f:
+                    for line in f:
+                        if line.startswith('VmRSS:'):
+                            total_kb += int(line.split()[1])
+        except OSError:
+            return None
+        return round(total_kb / 1024, 1)
+
+    def stop(self):
+        self.process.terminate()
+        try:
+            self.process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+
+
+def request(base_url, method, path, body=None, token=None):
+    """Send one request and return (status, response size in bytes)"""
+    data = json.dumps(body).encode() if body is not None else None
+    req = urllib.request.Request(base_url + path, data=data, method=method)
+    if token is not None:
+        req.add_header('Authorization', f'Bearer {token}')
+    if data is not None:
+        req.add_header('Content-Type', 'application/json')
+    try:
+        with urllib.request.urlopen(req, timeout=300) as response:
+            return response.status, len(response.read())
+    except urllib.error.HTTPError as e:
+        return e.code, len(e.read())
+
+
+def build_routes(size):
+    """Return {route name: callable(i) -> (method, path, body)} for a dataset of `size` projects"""
+    created = count(size + 1)
+    return {
+        'GET /api/projects': lambda i: ('GET', '/api/projects', None),
+        'GET /api/projects?limit=1000': lambda i: ('GET', '/api/projects?limit=1000', None),
+        'GET /api/projects/<id>': lambda i: ('GET', f'/api/projects/{i % size + 1}', None),
+        'GET /api/analytics': lambda i: ('GET', '/api/analytics', None),
+        'POST /api/export': lambda i: ('POST', '/api/export', {"type": "csv", "stream": True}),
+        'POST /api/projects': lambda i: ('POST', '/api/projects', NEW_PROJECT),
+        'PUT /api/projects/<id>': lambda i: ('PUT', f'/api/projects/{i % size + 1}', {"progress": i % 100}),
+        # Deletes the rows added by the POST run, ids continue after the seeded ones
+        'DELETE /api/projects/<id>': lambda i: ('DELETE', f'/api/projects/{next(created)}', None),
+    }
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def run_load(server, make_request, requests, concurrency):
+    """Issue `requests` requests with `concurrency` workers and summarise the latencies"""
+    def timed(i):
+        method, path, body = make_request(i)
+        started = time.perf_counter()
+        status, size = request(server.base_url, method, path, body, server.token)
+        return time.perf_counter() - started, status, size
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as executor:
+        samples = list(executor.map(timed, range(requests)))
+    elapsed = time.perf_counter() - started
+
+    latencies = sorted(latency * 1000 for latency, _, _ in samples)
+    errors = sum(1 for _, status, _ in samples if status >= 400)
+    return {
+        "requests": requests,
+        "errors": errors,
+        # Latencies that include error responses do not measure the route
+        "valid": errors == 0,
+        "p50_ms": round(percentile(latencies, 0.50), 2),
+        "p95_ms": round(percentile(latencies, 0.95), 2),
+        "p99_ms": round(percentile(latencies, 0.99), 2),
+        "throughput_rps": round(requests / elapsed, 1),
+        "mean_response_bytes": round(sum(size for _, _, size in samples) / requests),
+        "rss_mb": server.rss_mb()
+    }
+
+
+def seed_database(path, size, seed):
+    subprocess.run(
+        [sys.executable, SEED_SCRIPT, '--db', path, '--scale', str(size), '--seed', str(seed), '--overwrite'],
+        check=True,
+        stdout=subprocess.DEVNULL
+    )
+
+
+def result_key(result):
+    return (f"{result['route']} | size={result['size']} | c={result['concurrency']}"
+            f" | cache={result.get('response_cache', 'on')}")
+
+
+def compare_with_baseline(results, baseline, tolerance):
+    """Return a list of regression messages for results slower than the baseline"""
+    previous = {result_key(r): r for r in baseline.get('results', [])}
+    regressions = []
+    for result in results:
+        base = previous.get(result_key(result))
+        if not result['valid'] or base is None or not base.get('valid', True) or not base.get('p95_ms'):
+            continue
+        limit = base['p95_ms'] * (1 + tolerance)
+        if result['p95_ms'] > limit:
+            regressions.append(
+                f"{result_key(result)}: p95 {result['p95_ms']}ms > {limit:.2f}ms "
+                f"(baseline {base['p95_ms']}ms + {tolerance:.0%})"
+            )
+    return regressions
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark the backend API routes")
+    parser.add_argument('--sizes', default='1000,10000,100000', help="comma-separated project counts")
+    # 16 is what production can serve at once: 2 workers with 8 pooled connections each.
+    # Beyond it, 100k-row exports wait on the pool past its timeout and fail.
+    parser.add_argument('--concurrency', default='1,8,16', help="comma-separated concurrency levels")
+    parser.add_argument('--requests', type=int, default=200, help="requests per route and level")
+    parser.add_argument('--routes', help="comma-separated subset of route names to run")
+    parser.add_argument('--seed', type=int, default=42, help="seed for the generated datasets")
+    parser.add_argument('--response-cache', default='on',
+                        help="comma-separated response cache modes to run: on, off (default: on)")
+    parser.add_argument('--port', type=int, default=5055)
+    parser.add_argument('--server', choices=SERVERS, default='gunicorn',
+                        help="serve with gunicorn as in production, or the Flask dev server")
+    parser.add_argument('--username', default='admin', help="account the benchmark logs in as")
+    parser.add_argument('--password', default='admin123')
+    parser.add_argument('--output', default='benchmark-results.json', help="where to write the results")
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE, help="baseline results to compare against")
+    parser.add_argument('--tolerance', type=float, default=0.25, help="allowed p95 slowdown (default: 0.25)")
+    parser.add_argument('--update-baseline', action='store_true', help="store these results as the new baseline")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    sizes = [int(s) for s in args.sizes.split(',')]
+    levels = [int(c) for c in args.concurrency.split(',')]
+    selected = set(args.routes.split(',')) if args.routes else None
+    cache_modes = args.response_cache.split(',')
+    unknown = set(cache_modes) - set(CACHE_MODES)
+    if unknown:
+        raise SystemExit(f"Unknown --response-cache mode: {', '.join(sorted(unknown))}")
+
+    results = []
+    with tempfile.TemporaryDirectory() as workdir:
+        for size in sizes:
+            for mode in cache_modes:
+                # A fresh copy per mode, as the write routes change the data
+                db_path = os.path.join(workdir, f"bench_{size}_cache_{mode}.db")
+                print(f"Seeding {size:,} projects...")
+                seed_database(db_path, size, args.seed)
+
+                server = Server(db_path, args.port, args.username, args.password, args.server, CACHE_MODES[mode])
+                try:
+                    for route, make_request in build_routes(size).items():
+                        if selected and route not in selected:
+                            continue
+                        for concurrency in levels:
+                            result = {"route": route, "size": size, "concurrency": concurrency,
+                                      "response_cache": mode}
+                            result.update(run_load(server, make_request, args.requests, concurrency))
+                            results.append(result)
+                            print(f"  {route:<32} c={concurrency:<4} cache={mode:<3} "
+                                  f"p50={result['p50_ms']:>9.2f}ms p95={result['p95_ms']:>9.2f}ms "
+                                  f"p99={result['p99_ms']:>9.2f}ms "
+                                  f"{result['throughput_rps']:>8.1f} req/s rss={result['rss_mb']}MB"
+                                  + ("" if result['valid'] else f" INVALID: {result['errors']} errors"))
+                finally:
+                    server.stop()
+
+    report = {
+        "generated_at": datetime.now().isoformat(),
+        "server": args.server,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "requests_per_level": args.requests,
+        # Datasets come from seed-database.py --scale <size> --seed <seed>
+        "seed": args.seed,
+        "sizes": sizes,
+        "response_cache": cache_modes,
+        "results": results
+    }
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResults written to {args.output}")
+
+    invalid = [result_key(r) for r in results if not r['valid']]
+    if invalid:
+        print("\nRequests failed; these results are invalid:")
+        for key in invalid:
+            print(f"  {key}")
+        if args.update_baseline:
+            print("Baseline not updated")
+        return 1
+
+    if args.update_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Baseline updated: {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print("No baseline found; run with --update-baseline to create one")
+        return 0
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    if baseline.get('server', 'flask') != args.server:
+        print(f"Baseline was measured with the {baseline.get('server', 'flask')} server; not comparing")
+        return 0
+    if baseline.get('seed', args.seed) != args.seed:
+        print(f"Baseline datasets were generated with seed {baseline['seed']}; not comparing")
+        return 0
+    regressions = compare_with_baseline(results, baseline, args.tolerance)
+    if regressions:
+        print("\nRegressions:")
+        for message in regressions:
+            print(f"  {message}")
+        return 1
+    print("No regressions against baseline")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
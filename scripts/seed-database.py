@@ -2,10 +2,60 @@ import sqlite3
 import json
 from datetime import datetime, timedelta
 import random
+import argparse
+import os
+import time
+from itertools import islice
 
-# Create database connection
-conn = sqlite3.connect('alfozan_insights.db')
-cursor = conn.cursor()
+import numpy as np
+
+DEFAULT_DB_PATH = 'alfozan_insights.db'
+
+# Database connection, opened in __main__
+conn = None
+cursor = None
+
+# Fixed "today" for generated data so a given seed always produces the same database
+REFERENCE_DATE = np.datetime64('2025-01-01')
+# Timestamp given to generated rows that would otherwise default to CURRENT_TIMESTAMP;
+# the API backfills competitor history from the competitors' created_at
+REFERENCE_TIMESTAMP = f"{REFERENCE_DATE} 00:00:00"
+
+LOCATIONS = ['Riyadh', 'Jeddah', 'Dammam', 'Mecca', 'Medina', 'Khobar', 'Tabuk', 'Abha', 'Taif', 'Buraidah']
+PROJECT_TYPES = ['Residential', 'Commercial', 'Industrial', 'Mixed']
+MANAGERS = [
+    'Ahmed Al-Rashid', 'Fatima Al-Zahra', 'Omar Al-Mutairi', 'Sarah Al-Mahmoud', 'Khalid Al-Otaibi',
+    'Noura Al-Qahtani', 'Faisal Al-Harbi', 'Reem Al-Shehri', 'Yousef Al-Dosari', 'Layla Al-Ghamdi'
+]
+COMPETITOR_ACTIVITIES = [
+    'Launched new residential project in', 'Expanded into commercial real estate in',
+    'Completed luxury hotel project in', 'Announced partnership with international firm in',
+    'Started sustainable housing initiative in', 'Acquired land bank in'
+]
+
+# Rows drawn per project generator; changing it changes the generated data
+PROJECT_CHUNK_SIZE = 10000
+
+# Bulk-load settings: no rollback journal or fsync while loading; a failed
+# load leaves an unusable file and should simply be rerun
+BULK_LOAD_PRAGMAS = (
+    'PRAGMA journal_mode = OFF',
+    'PRAGMA synchronous = OFF',
+    'PRAGMA locking_mode = EXCLUSIVE',
+    'PRAGMA temp_store = MEMORY',
+    'PRAGMA cache_size = -262144',
+)
+
+# Same index names as backend/schema.py, so the API treats them as existing
+INDEXES = (
+    'CREATE INDEX IF NOT EXISTS idx_projects_location ON projects(location)',
+    'CREATE INDEX IF NOT EXISTS idx_projects_type ON projects(type)',
+    'CREATE INDEX IF NOT EXISTS idx_projects_status ON projects(status)',
+    'CREATE INDEX IF NOT EXISTS idx_projects_location_type_status ON projects(location, type, status)',
+    'CREATE INDEX IF NOT EXISTS idx_projects_status_start_date ON projects(status, start_date)',
+    'CREATE INDEX IF NOT EXISTS idx_projects_start_date ON projects(start_date)',
+    'CREATE INDEX IF NOT EXISTS idx_projects_end_date ON projects(end_date)',
+)
 
 # Create tables
 def create_tables():
@@ -104,30 +154,132 @@ def seed_analytics():
     # Revenue data for last 12 months
     months = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec']
     
-    for i, month in enumerate(months):
+    rows = []
+    for month in months:
         # Revenue data
         revenue = random.randint(120, 200) * 1000000  # 120M to 200M SAR
-        cursor.execute('''
-        INSERT INTO analytics (metric_type, metric_value, period, category)
-        VALUES (?, ?, ?, ?)
-        ''', ('revenue', revenue, f'2024-{month}', 'financial'))
+        rows.append(('revenue', revenue, f'2024-{month}', 'financial'))
         
         # Units sold data
         units_sold = random.randint(35, 65)
-        cursor.execute('''
-        INSERT INTO analytics (metric_type, metric_value, period, category)
-        VALUES (?, ?, ?, ?)
-        ''', ('units_sold', units_sold, f'2024-{month}', 'sales'))
+        rows.append(('units_sold', units_sold, f'2024-{month}', 'sales'))
         
         # Market share data
         market_share_value = 17 + random.uniform(-1, 1)  # Around 17% with some variation
-        cursor.execute('''
-        INSERT INTO analytics (metric_type, metric_value, period, category)
-        VALUES (?, ?, ?, ?)
-        ''', ('market_share', market_share_value, f'2024-{month}', 'market'))
+        rows.append(('market_share', market_share_value, f'2024-{month}', 'market'))
+    
+    cursor.executemany('''
+    INSERT INTO analytics (metric_type, metric_value, period, category)
+    VALUES (?, ?, ?, ?)
+    ''', rows)
     
     print("Analytics data seeded successfully")
 
+# Generate projects; each chunk of PROJECT_CHUNK_SIZE rows is drawn from its
+# own generator seeded with (seed, chunk index), so the rows depend only on
+# the seed and their position, not on how they are batched for insertion
+def generate_projects(seed, count):
+    for chunk, offset in enumerate(range(0, count, PROJECT_CHUNK_SIZE)):
+        rng = np.random.default_rng([seed, chunk])
+        size = min(PROJECT_CHUNK_SIZE, count - offset)
+        ids = np.arange(offset + 1, offset + size + 1)
+        locations = rng.integers(0, len(LOCATIONS), size)
+        types = rng.integers(0, len(PROJECT_TYPES), size)
+        
+        # Projects start within the eight years before REFERENCE_DATE and run 1-5 years
+        start = REFERENCE_DATE - rng.integers(0, 8 * 365, size).astype('timedelta64[D]')
+        duration = rng.integers(365, 5 * 365, size)
+        end = start + duration.astype('timedelta64[D]')
+        elapsed = (REFERENCE_DATE - start).astype(int)
+        progress = np.clip(elapsed * 100 // duration, 0, 100)
+        status = np.where(progress >= 100, 'Completed', np.where(progress > 10, 'In Progress', 'Planning'))
+        
+        units = rng.integers(20, 800, size)
+        units_sold = (units * np.clip(progress / 100 * rng.uniform(0.5, 1.1, size), 0, 1)).astype(int)
+        budget = np.round(units * rng.uniform(2e6, 9e6, size), -3)
+        managers = rng.integers(0, len(MANAGERS), size)
+        
+        location_names = np.array(LOCATIONS)[locations]
+        type_names = np.array(PROJECT_TYPES)[types]
+        names = [f"{location} {project_type} Project {i}"
+                 for location, project_type, i in zip(location_names, type_names, ids.tolist())]
+        
+        start_dates = start.astype(str).tolist()
+        yield from zip(
+            names, type_names.tolist(), status.tolist(), location_names.tolist(), budget.tolist(),
+            progress.tolist(), units.tolist(), units_sold.tolist(),
+            start_dates, end.astype(str).tolist(), np.array(MANAGERS)[managers].tolist(),
+            [f"{d} 00:00:00" for d in start_dates]
+        )
+
+# Generate competitors
+def generate_competitors(rng, count):
+    shares = rng.dirichlet(np.ones(count)) * 100
+    digital = rng.integers(30, 100, count)
+    changes = rng.integers(-8, 9, count)
+    for i in range(count):
+        name = f"Competitor {i + 1}"
+        activity = f"{COMPETITOR_ACTIVITIES[i % len(COMPETITOR_ACTIVITIES)]} {LOCATIONS[i % len(LOCATIONS)]}"
+        change = int(changes[i])
+        yield (name, float(shares[i]), int(digital[i]), f"competitor{i + 1}.com.sa", activity,
+               'up' if change >= 0 else 'down', f"{change:+d}%", REFERENCE_TIMESTAMP)
+
+# Generate monthly analytics history ending at REFERENCE_DATE
+def generate_analytics(rng, years, scale):
+    last_month = REFERENCE_DATE.astype('datetime64[M]')
+    months = np.arange(last_month - np.timedelta64(years * 12, 'M'), last_month)
+    # Portfolio-wide figures grow with the number of projects
+    revenue = rng.uniform(120, 200, len(months)) * 1e6 * max(1, scale / 5)
+    units_sold = rng.integers(35, 65, len(months)) * max(1, scale // 5)
+    market_share = 17 + rng.uniform(-1, 1, len(months))
+    for month, rev, sold, share in zip(months.tolist(), revenue.tolist(), units_sold.tolist(), market_share.tolist()):
+        period = month.strftime('%Y-%b')
+        recorded_at = month.strftime('%Y-%m-01 00:00:00')
+        yield ('revenue', rev, period, 'financial', recorded_at)
+        yield ('units_sold', sold, period, 'sales', recorded_at)
+        yield ('market_share', share, period, 'market', recorded_at)
+
+# Seed a synthetic dataset of `scale` projects
+def seed_scale(scale, seed, years, batch_size):
+    # For competitors and analytics; projects draw from per-chunk generators
+    rng = np.random.default_rng(seed)
+    for pragma in BULK_LOAD_PRAGMAS:
+        cursor.execute(pragma)
+    
+    started = time.perf_counter()
+    print(f"Generating {scale:,} projects (seed {seed})...")
+    cursor.execute('BEGIN')
+    projects = generate_projects(seed, scale)
+    while batch := list(islice(projects, batch_size)):
+        cursor.executemany('''
+        INSERT INTO projects (name, type, status, location, budget, progress, units, units_sold, start_date, end_date, manager, created_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', batch)
+    
+    competitor_count = max(5, scale // 1000)
+    print(f"Generating {competitor_count:,} competitors...")
+    cursor.executemany('''
+    INSERT INTO competitors (name, market_share, digital_presence, website, recent_activity, trend, change_percentage, created_at)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    ''', generate_competitors(rng, competitor_count))
+    
+    print(f"Generating {years} years of analytics history...")
+    cursor.executemany('''
+    INSERT INTO analytics (metric_type, metric_value, period, category, recorded_at)
+    VALUES (?, ?, ?, ?, ?)
+    ''', generate_analytics(rng, years, scale))
+    cursor.execute('COMMIT')
+    loaded = time.perf_counter()
+    
+    # Indexes are cheaper to build once over sorted data than to maintain per insert
+    print("Building indexes...")
+    for statement in INDEXES:
+        cursor.execute(statement)
+    cursor.execute('ANALYZE')
+    cursor.execute('PRAGMA journal_mode = WAL')
+    
+    print(f"Loaded in {loaded - started:.1f}s, indexed in {time.perf_counter() - loaded:.1f}s")
+
 # Generate sample reports
 def generate_reports():
     print("Generating reports...")
@@ -179,25 +331,48 @@ def generate_reports():
     
     print("\nDatabase seeded and reports generated successfully!")
 
+def parse_args():
+    parser = argparse.ArgumentParser(description="Create and seed the Al Fozan Insights database")
+    parser.add_argument('--db', default=DEFAULT_DB_PATH, help="database file to create")
+    parser.add_argument('--scale', type=int, help="generate N synthetic projects instead of the demo data")
+    parser.add_argument('--seed', type=int, default=42, help="random seed for --scale (default: 42)")
+    parser.add_argument('--years', type=int, default=5, help="years of analytics history for --scale (default: 5)")
+    parser.add_argument('--batch-size', type=int, default=50000, help="rows per insert batch for --scale")
+    parser.add_argument('--overwrite', action='store_true', help="replace an existing database file")
+    return parser.parse_args()
+
 # Main execution
 if __name__ == "__main__":
+    args = parse_args()
     print("Starting Al Fozan Insights Database Setup...")
     
+    if args.scale is not None and os.path.exists(args.db):
+        if not args.overwrite:
+            raise SystemExit(f"{args.db} already exists; pass --overwrite to replace it")
+        os.remove(args.db)
+    
+    conn = sqlite3.connect(args.db, isolation_level=None if args.scale is not None else '')
+    cursor = conn.cursor()
+    
     try:
         create_tables()
-        seed_projects()
-        seed_competitors()
-        seed_analytics()
-        generate_reports()
+        if args.scale is not None:
+            seed_scale(args.scale, args.seed, args.years, args.batch_size)
+        else:
+            seed_projects()
+            seed_competitors()
+            seed_analytics()
+            generate_reports()
         
         # Commit changes and close connection
         conn.commit()
         conn.close()
         
         print("\nDatabase setup completed successfully!")
-        print("Database file: alfozan_insights.db")
+        print(f"Database file: {args.db}")
         
     except Exception as e:
         print(f"Error occurred: {e}")
-        conn.rollback()
+        if conn.in_transaction:
+            conn.rollback()
         conn.close()